@@ -1,4 +1,7 @@
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,7 +10,7 @@ from datetime import timedelta
 from flask import Flask, redirect, url_for, render_template
 from flask_login import LoginManager, current_user
 from models import User
-from db import close_connection, init_db, get_db
+from db import close_connection, init_db, get_db, query_stats, repeated_queries
 from werkzeug.security import generate_password_hash
 # Blueprint Imports
 from routes.auth import auth_bp
@@ -21,14 +24,15 @@ from routes.classrooms import classrooms_bp
 from routes.staff import staff_bp
 from routes.schools import schools_bp
 from routes.webhooks import webhooks_bp
+from routes.jobs import jobs_bp
 from flask_mail import Message
 from flask_babel import _
 from flask import session, request
-from extensions import mail, babel, csrf, login_manager
+from extensions import mail, babel, csrf, login_manager, cache
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['DATABASE'] = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'student_os.db')
+app.config['DATABASE'] = os.getenv('DATABASE', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'student_os.db'))
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['UNIVERSITY_NAME'] = 'GLOBAL UNIVERSITY OF OS'
@@ -49,8 +53,12 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = app.config['MAIL_USERNAME']
 
+# Cache: shared across workers when CACHE_URL points at a Redis-compatible server
+app.config['CACHE_URL'] = os.getenv('CACHE_URL')
+
 # Extensions Setup
 mail.init_app(app)
+cache.init_app(app)
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -60,7 +68,7 @@ login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get(user_id)
+    return User.get_cached(user_id)
 
 def get_locale():
     # If the user has a preferred language in their session, use it
@@ -75,6 +83,24 @@ csrf.init_app(app)
 # Teardown
 app.teardown_appcontext(close_connection)
 
+# Statement shapes repeated more often than this in one request are logged as likely N+1 loops.
+QUERY_REPEAT_WARN = int(os.getenv('DB_QUERY_REPEAT_WARN', '10'))
+QUERY_LOG = os.getenv('DB_QUERY_LOG', 'false').lower() == 'true'
+
+@app.after_request
+def report_query_stats(response):
+    """Per-request DB cost: Server-Timing header, optional log line, N+1 warnings."""
+    stats = query_stats()
+    if not stats['count']:
+        return response
+    db_ms = stats['time'] * 1000
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{stats["count"]} queries"')
+    if QUERY_LOG or app.debug:
+        print(f"[DB] {request.method} {request.path} -> {stats['count']} queries, {db_ms:.1f} ms")
+    for shape, runs in repeated_queries(QUERY_REPEAT_WARN):
+        print(f"[WARN] Possible N+1 in {request.endpoint}: ran {runs}x -> {shape[:200]}")
+    return response
+
 # Register Blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(dashboard_bp)
@@ -87,44 +113,33 @@ app.register_blueprint(classrooms_bp)
 app.register_blueprint(staff_bp)
 app.register_blueprint(schools_bp)
 app.register_blueprint(webhooks_bp)
+app.register_blueprint(jobs_bp)
 
 @app.context_processor
 def inject_school_context():
     from db import get_db, db_cursor
-    db = get_db()
-    
-    # Identify school from subdomain first
-    host = request.host.split(':')[0]
-    parts = host.split('.')
-    
+    from helpers import get_school, get_school_by_slug, subdomain_slug
+
+    # Identify school from subdomain first (e.g., slug.localhost or slug.studentos.com)
     school = None
-    # Check for subdomain (e.g., slug.localhost or slug.studentos.com)
-    if len(parts) > 1:
-        potential_slug = parts[0]
-        # Ignore common prefixes or TLD-only checks if needed
-        if potential_slug not in ['www', 'app', 'localhost', '127']:
-            with db_cursor(db) as cursor:
-                cursor.execute('SELECT * FROM schools WHERE slug = %s', (potential_slug,))
-                school = cursor.fetchone()
-    
+    slug = subdomain_slug(request.host)
+    if slug:
+        school = get_school_by_slug(slug)
+
     # If no subdomain match, use the user's school if logged in
     if not school and current_user.is_authenticated:
-        with db_cursor(db) as cursor:
-            cursor.execute('SELECT * FROM schools WHERE id = %s', (current_user.school_id,))
-            school = cursor.fetchone()
-            
+        school = get_school(current_user.school_id)
+
     # Ultimate fallback to school ID 1
     if not school:
-        with db_cursor(db) as cursor:
-            cursor.execute('SELECT * FROM schools WHERE id = 1')
-            school = cursor.fetchone()
-        
+        school = get_school(1)
+
     unread_count = 0
     try:
         if current_user.is_authenticated:
-            with db_cursor(db) as cursor:
-                cursor.execute('SELECT COUNT(*) FROM messages WHERE recipient_id = %s AND is_read = 0 AND school_id = %s', (current_user.id, current_user.school_id))
-                unread_count = cursor.fetchone()[0]
+            from helpers import get_unread_count
+            with db_cursor(get_db()) as cursor:
+                unread_count = get_unread_count(cursor, current_user.id, current_user.school_id)
     except Exception as e:
         print(f"Unread count error: {e}")
         
@@ -262,31 +277,77 @@ def seed_demo_data(db):
                            (user_id, c_id, random.randint(75, 98), 'Assignment'))
     
     db.commit()
+    from school_stats import refresh_all_school_stats
+    refresh_all_school_stats(db)
     print("Demo data seeded successfully.")
 
-# Thread-safe initialization
-_db_initialized = False
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending database migrations. Run this before starting the web workers."""
+    init_db(app, raise_errors=True)
+
+@app.cli.command('reconcile-unread')
+def reconcile_unread_command():
+    """Recompute unread message counters from the messages table (run periodically)."""
+    from helpers import reconcile_unread_counters
+    db = get_db()
+    fixed = reconcile_unread_counters(db)
+    print(f"[OK] Reconciled unread counters ({fixed} corrected).")
+
+@app.cli.command('refresh-stats')
+def refresh_stats_command():
+    """Recompute the school_stats dashboard rollup for every school (run on a schedule)."""
+    from school_stats import refresh_all_school_stats
+    count = refresh_all_school_stats(get_db())
+    print(f"[OK] Refreshed dashboard stats for {count} school(s).")
+
+@app.cli.command('worker')
+def worker_command():
+    """Run background jobs (report batches, Excel exports) until stopped; see jobs.py."""
+    from jobs import run_worker
+    run_worker(app)
+
+@app.cli.command('init')
+def init_command():
+    """Run one-time startup initialization (migrations, admin bootstrap, demo seed)."""
+    startup_init()
 
-@app.before_request
-def safe_init():
-    global _db_initialized
-    if not _db_initialized:
-        # Avoid running in debug reloader's main process or if already initialized
-        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not app.debug:
-            print("[INIT] Performing one-time startup initialization...")
-            startup_init()
-        _db_initialized = True
+# One-time initialization runs once per deploy -- from gunicorn's on_starting hook
+# (see gunicorn.conf.py), `flask --app app init`, or `python app.py` -- never inside
+# a request. The lock keeps concurrent callers (threads, or processes on the same
+# host) from racing on schema creation and the admin bootstrap; instances on other
+# hosts are serialized by a PostgreSQL advisory lock in startup_init.
+_init_lock = threading.Lock()
+
+@contextmanager
+def _startup_lock():
+    with _init_lock:
+        try:
+            import fcntl
+        except ImportError:
+            # Windows dev machines: the thread lock is all we can offer.
+            yield
+            return
+        lock_path = os.path.join(tempfile.gettempdir(), 'student_os_init.lock')
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 def startup_init():
     """Initializes the database and default data safely."""
-    with app.app_context():
+    with _startup_lock(), app.app_context():
+        print("[INIT] Performing one-time startup initialization...")
         # Create tables
         try:
             init_db(app)
             
             db = get_db()
-            from db import db_cursor
-            with db_cursor(db) as cursor:
+            from db import db_cursor, advisory_lock, LOCK_STARTUP
+            # The file lock covers one host; this covers instances sharing a PostgreSQL database.
+            with advisory_lock(db, LOCK_STARTUP), db_cursor(db) as cursor:
                 # 0. Ensure at least one school exists (Genesis School)
                 cursor.execute('SELECT id FROM schools WHERE id = 1')
                 if not cursor.fetchone():
@@ -345,5 +406,9 @@ def startup_init():
 
 # Perform one-time initialization before starting the app (Locally)
 if __name__ == '__main__':
+    # The debug reloader re-executes this file in a child process; only the
+    # parent initializes.
+    if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        startup_init()
     app.run(host='0.0.0.0', port=5000, debug=True)
 
@@ -0,0 +1,162 @@
+"""
+How many slow, I/O-bound requests one gunicorn worker can hold: the default
+gthread worker vs GUNICORN_WORKER_CLASS=gevent.
+
+The server is the real app plus one benchmark-only route that does the kind
+of waiting the app's slow paths do: an HTTP call to an upstream that takes
+`--delay-ms` to answer (like the Brevo API), or, with `--io pg` and
+DATABASE_URL set, `SELECT pg_sleep()` through the pooled psycopg2 connection
+(exercising psycogreen). The upstream runs in its own process so it is never
+the bottleneck. For each worker class and concurrency level, that many
+clients hit the route in a loop; throughput tops out at roughly
+slots / delay, where slots is threads (gthread) or worker_connections (gevent).
+
+    python benchmarks/bench_async_workers.py [--concurrency 10,50,200] [--delay-ms 200] [--seconds 10] [--io http|pg]
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_app():
+    """gunicorn entry point (bench_async_workers:bench_app()): the app plus /_bench/slow."""
+    sys.path.insert(0, ROOT)
+    from app import app
+    from db import db_cursor
+
+    upstream = os.environ['BENCH_UPSTREAM_URL']
+    delay = int(os.environ['BENCH_DELAY_MS']) / 1000
+    use_pg = os.environ.get('BENCH_IO') == 'pg'
+
+    @app.route('/_bench/slow')
+    def bench_slow():
+        if use_pg:
+            with db_cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(%s)', (delay,))
+        else:
+            import requests
+            requests.get(upstream, timeout=30)
+        return 'ok'
+
+    return app
+
+
+def serve_upstream(port, delay):
+    class Slow(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.request_queue_size = 1024
+    ThreadingHTTPServer.daemon_threads = True
+    ThreadingHTTPServer(('127.0.0.1', port), Slow).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(worker_class, args, upstream_port, db_path):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.threads), PORT=str(port),
+               GUNICORN_WORKER_CLASS=worker_class, GUNICORN_WORKER_CONNECTIONS=str(args.worker_connections),
+               DATABASE=db_path, SECRET_KEY='bench', SEED_DEMO='false', ADMIN_PASSWORD='bench-admin',
+               BENCH_UPSTREAM_URL=f'http://127.0.0.1:{upstream_port}/', BENCH_DELAY_MS=str(args.delay_ms),
+               BENCH_IO=args.io, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'bench_async_workers:bench_app()'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/keep-alive', timeout=1)
+            return server, port
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'gunicorn ({worker_class}) did not come up')
+
+
+def load(port, concurrency, seconds):
+    url = f'http://127.0.0.1:{port}/_bench/slow'
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = time.time() + seconds
+
+    def client():
+        local, failed = [], 0
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(url, timeout=60).read()
+                local.append(time.perf_counter() - start)
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    # Requests still queued at the deadline finish afterwards; count them against the real elapsed time.
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1e3 if latencies else 0.0
+    return len(latencies) / elapsed, p(0.5), p(0.95), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', default='10,50,200', help='comma-separated client counts')
+    parser.add_argument('--delay-ms', type=int, default=200, help='time each request spends waiting on I/O')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=4, help='gthread threads per worker')
+    parser.add_argument('--worker-connections', type=int, default=500, help='gevent greenlets per worker')
+    parser.add_argument('--io', choices=['http', 'pg'], default='http')
+    args = parser.parse_args()
+    if args.io == 'pg' and not os.getenv('DATABASE_URL'):
+        parser.error('--io pg needs DATABASE_URL')
+
+    upstream_port = free_port()
+    upstream = multiprocessing.Process(target=serve_upstream, args=(upstream_port, args.delay_ms / 1000), daemon=True)
+    upstream.start()
+
+    print(f"1 worker, {args.delay_ms} ms of {args.io} I/O per request, {args.seconds:g}s per run")
+    with tempfile.TemporaryDirectory() as tmp:
+        for worker_class, slots in [('gthread', args.threads), ('gevent', args.worker_connections)]:
+            server, port = start_server(worker_class, args, upstream_port, os.path.join(tmp, f'{worker_class}.db'))
+            try:
+                for concurrency in [int(c) for c in args.concurrency.split(',')]:
+                    rps, p50, p95, errors = load(port, concurrency, args.seconds)
+                    print(f"  {worker_class:<7} ({slots:>3} slots) x {concurrency:>4} clients: {rps:7.1f} req/s  "
+                          f"p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  {errors} errors")
+            finally:
+                server.terminate()
+                server.wait(30)
+    upstream.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Batch report card generation: the previous per-student loop vs the grouped
+prefetch rendered inline and across a process pool.
+
+Builds a throwaway SQLite school with N students (6 courses, 5 grades per
+course, 40 attendance days, one remark each) and times:
+
+  previous  3 queries + 1 render per student, every PDF kept in a BytesIO ZIP
+  inline    load_report_cards (grouped queries) + render_report_cards(workers=1)
+  pool      the same with --workers processes (default: one per CPU)
+
+For the streamed paths it also reports when the first ZIP bytes were ready,
+which is when a browser starts receiving the download. Process pools only
+help with more than one CPU.
+
+    python benchmarks/bench_batch_reports.py [--students 200,2000] [--workers N]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+UNIVERSITY = 'BENCH UNIVERSITY'
+
+
+def build(db, students):
+    from db import db_cursor
+    ids = range(100, 100 + students)
+    with db_cursor(db) as cursor:
+        cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'head', 'x', 'principal', 1)")
+        cursor.bulk_insert('users', ('id', 'username', 'password_hash', 'role', 'school_id'),
+                           [(i, f's{i}', 'x', 'student', 1) for i in ids])
+        cursor.bulk_insert('courses', ('id', 'name', 'teacher_id', 'school_id'),
+                           [(c, f'Course {c}', 2, 1) for c in range(1, 7)])
+        cursor.bulk_insert('grades', ('student_id', 'course_id', 'score', 'grade_type', 'school_id'),
+                           [(i, c, (i * c + k) % 100, 'Exam', 1) for i in ids for c in range(1, 7) for k in range(5)])
+        cursor.bulk_insert('attendance', ('student_id', 'course_id', 'date', 'status', 'school_id'),
+                           [(i, 1, f'2026-01-{d:02d}', 'Present' if (i + d) % 5 else 'Absent', 1)
+                            for i in ids for d in range(1, 41)])
+        cursor.bulk_insert('remarks', ('student_id', 'teacher_id', 'term', 'remarks', 'improvement_areas', 'school_id'),
+                           [(i, 2, 'Term 1', 'Consistent effort.', 'Revise algebra.', 1) for i in ids])
+    db.commit()
+    db.execute('ANALYZE')
+
+
+def previous(db, school_id=1):
+    """The loop download_batch_reports ran before."""
+    from db import db_cursor
+    from reports import generate_student_report_card
+    with db_cursor(db, stream=True) as student_cursor, db_cursor(db) as cursor:
+        student_cursor.execute("SELECT * FROM users WHERE role = 'student' AND school_id = %s", (school_id,))
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w') as zf:
+            for student in student_cursor:
+                cursor.execute('''
+                    SELECT c.name, AVG(g.score) as avg_score
+                    FROM grades g JOIN courses c ON g.course_id = c.id
+                    WHERE g.student_id = %s AND g.school_id = %s GROUP BY c.id, c.name
+                ''', (student['id'], school_id))
+                grades_data = cursor.fetchall()
+                cursor.execute('''
+                    SELECT status, COUNT(*) as count FROM attendance WHERE student_id = %s AND school_id = %s GROUP BY status
+                ''', (student['id'], school_id))
+                attendance_summary = cursor.fetchall()
+                cursor.execute('SELECT * FROM remarks WHERE student_id = %s AND school_id = %s ORDER BY created_at DESC',
+                               (student['id'], school_id))
+                remarks_row = cursor.fetchone()
+                remarks_data = dict(remarks_row) if remarks_row else {}
+                pdf_buffer = generate_student_report_card(UNIVERSITY, student, grades_data, attendance_summary, remarks_data)
+                zf.writestr(f"Report_Card_{student['username']}.pdf", pdf_buffer.getvalue())
+    return zip_buffer.getbuffer().nbytes
+
+
+def streamed(db, workers, school_id=1):
+    from reports import iter_zip, render_report_cards
+    from routes.academic import load_report_cards
+    start = time.perf_counter()
+    cards = load_report_cards(db, school_id)
+    first, size = None, 0
+    for chunk in iter_zip(render_report_cards(UNIVERSITY, cards, workers=workers)):
+        if chunk and first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', default='200,2000')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE'] = os.path.join(tmp, 'startup.db')
+        os.environ.setdefault('SEED_DEMO', 'false')
+        from app import app
+        from db import connect_sqlite, init_db
+
+        print(f"{os.cpu_count()} CPUs; total time (time to first ZIP bytes)")
+        for students in [int(n) for n in args.students.split(',')]:
+            app.config['DATABASE'] = os.path.join(tmp, f'bench_{students}.db')
+            init_db(app)
+            db = connect_sqlite(app.config['DATABASE'])
+            build(db, students)
+
+            results = []
+            with app.app_context():
+                start = time.perf_counter()
+                previous(db)
+                elapsed = time.perf_counter() - start
+                results.append(f"previous {elapsed:6.2f}s (at end)")
+                for label, workers in [('inline', 1), (f'pool x{args.workers}', args.workers)]:
+                    start = time.perf_counter()
+                    first, _ = streamed(db, workers)
+                    elapsed = time.perf_counter() - start
+                    results.append(f"{label} {elapsed:6.2f}s ({first:5.2f}s)")
+            db.close()
+            print(f"  {students:>5} students: " + "  |  ".join(results))
+
+
+if __name__ == '__main__':
+    main()
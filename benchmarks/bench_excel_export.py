@@ -0,0 +1,137 @@
+"""
+Time and peak Python memory of the classroom Excel export as classes grow.
+
+Builds a throwaway SQLite database with one classroom of N students (8
+courses, 4 grades per cell) and writes its export to a temporary file with
+routes.classrooms.write_classroom_workbook, the body of the export job. For
+comparison it also runs the previous approach (one AVG query per cell into
+an in-memory Workbook, then a walk over every cell for widths). Each export
+runs twice, once timed and once under tracemalloc; peak memory is
+tracemalloc's, so it covers Python objects (openpyxl cells), not SQLite's
+own page cache.
+
+    python benchmarks/bench_excel_export.py [--students 100,1000,5000] [--courses 8]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build(db, students, courses):
+    from db import db_cursor
+    ids = range(100, 100 + students)
+    with db_cursor(db) as cursor:
+        cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'head', 'x', 'principal', 1)")
+        cursor.execute("INSERT INTO classrooms (id, name, teacher_id, school_id) VALUES (1, 'Grade 9 A', 2, 1)")
+        cursor.bulk_insert('users', ('id', 'username', 'password_hash', 'role', 'school_id'),
+                           [(i, f's{i}', 'x', 'student', 1) for i in ids])
+        cursor.bulk_insert('student_details', ('user_id', 'full_name', 'admission_number', 'classroom_id', 'school_id'),
+                           [(i, f'Student {i}', f'ADM{i}', 1, 1) for i in ids])
+        cursor.bulk_insert('courses', ('id', 'name', 'teacher_id', 'school_id'),
+                           [(c, f'Course {c}', 2, 1) for c in range(1, courses + 1)])
+        cursor.bulk_insert('enrollments', ('student_id', 'course_id', 'school_id'),
+                           [(i, c, 1) for i in ids for c in range(1, courses + 1)])
+        cursor.bulk_insert('grades', ('student_id', 'course_id', 'score', 'grade_type', 'school_id'),
+                           [(i, c, (i * c + k) % 100, 'Exam', 1) for i in ids for c in range(1, courses + 1) for k in range(4)])
+    db.commit()
+    db.execute('ANALYZE')
+
+
+def legacy_export(db, classroom_id, school_id=1):
+    """The per-cell queries and in-memory workbook the route used before."""
+    from db import db_cursor
+    from openpyxl import Workbook
+    from openpyxl.styles import Border, Side
+    from openpyxl.utils import get_column_letter
+    with db_cursor(db) as cursor:
+        cursor.execute('''
+            SELECT DISTINCT c.id, c.name FROM courses c
+            JOIN enrollments e ON c.id = e.course_id JOIN student_details sd ON e.student_id = sd.user_id
+            WHERE sd.classroom_id = %s AND c.school_id = %s ORDER BY c.name
+        ''', (classroom_id, school_id))
+        course_list = [dict(c) for c in cursor.fetchall()]
+        cursor.execute('''
+            SELECT u.id, sd.full_name, sd.admission_number FROM student_details sd JOIN users u ON sd.user_id = u.id
+            WHERE sd.classroom_id = %s AND sd.school_id = %s ORDER BY sd.full_name
+        ''', (classroom_id, school_id))
+        student_data = []
+        for s in cursor.fetchall():
+            s_dict = dict(s)
+            s_dict['grades'] = {}
+            for c in course_list:
+                cursor.execute('SELECT COALESCE(ROUND(AVG(score), 1), 0) FROM grades '
+                               'WHERE student_id = %s AND course_id = %s AND school_id = %s', (s['id'], c['id'], school_id))
+                s_dict['grades'][c['id']] = cursor.fetchone()[0]
+            student_data.append(s_dict)
+    wb = Workbook()
+    ws = wb.active
+    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    for row_num, s in enumerate(student_data, 8):
+        ws.cell(row=row_num, column=1, value=s['admission_number']).border = border
+        ws.cell(row=row_num, column=2, value=s['full_name']).border = border
+        for i, c in enumerate(course_list):
+            ws.cell(row=row_num, column=3 + i, value=s['grades'][c['id']]).border = border
+    for col in ws.columns:
+        ws.column_dimensions[get_column_letter(col[0].column)].width = 20
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getbuffer().nbytes
+
+
+def measure(fn):
+    # tracemalloc slows allocation-heavy code several-fold, so time and
+    # memory come from separate runs.
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', default='100,1000,5000')
+    parser.add_argument('--courses', type=int, default=8)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE'] = os.path.join(tmp, 'startup.db')
+        os.environ.setdefault('SEED_DEMO', 'false')
+        from app import app
+        from db import connect_sqlite, init_db
+        from routes.classrooms import write_classroom_workbook
+
+        print(f"{args.courses} courses, 4 grades per cell; time / peak traced memory / file size")
+        for students in [int(n) for n in args.students.split(',')]:
+            app.config['DATABASE'] = os.path.join(tmp, f'bench_{students}.db')
+            init_db(app)
+            db = connect_sqlite(app.config['DATABASE'])
+            build(db, students, args.courses)
+
+            def streamed():
+                with tempfile.TemporaryFile() as output:
+                    write_classroom_workbook(db, 1, 1, output)
+                    return output.tell()
+
+            with app.app_context():
+                elapsed, peak, size = measure(streamed)
+                line = f"  {students:>6} students: streaming {elapsed:6.2f}s {peak / 2**20:7.1f} MiB {size / 1024:7.0f} KiB"
+                if not args.skip_legacy:
+                    l_elapsed, l_peak, _ = measure(lambda: legacy_export(db, 1))
+                    line += f"  | previous {l_elapsed:6.2f}s {l_peak / 2**20:7.1f} MiB"
+            db.close()
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Lockout accuracy of the login throttle under parallel workers.
+
+Forks `workers` processes (like gunicorn workers) that hammer reserve_attempt()
+on one shared SQLite database: a handful of targeted accounts, each attacked
+from every worker at once, plus a credential-stuffing stream of one-off keys.
+Reports how many attempts each targeted key was allowed (the limit is
+LOGIN_MAX_ATTEMPTS, however many workers there are; the old per-worker dict
+allowed up to workers x limit), throughput, and the table size, which stays
+bounded by the keys seen within one window.
+
+    python benchmarks/bench_login_throttle.py [--workers 8] [--targets 20] [--attempts 50] [--stuffing 2000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect_sqlite, db_cursor
+from login_throttle import LOCKOUT_SECONDS, MAX_ATTEMPTS, reserve_attempt
+from migrations import run_migrations
+
+
+def worker(db_path, worker_id, targets, attempts, stuffing, results):
+    db = connect_sqlite(db_path)
+    allowed = {t: 0 for t in range(targets)}
+    for i in range(attempts):
+        for t in range(targets):
+            allowed[t] += reserve_attempt(db, f'victim{t}:203.0.113.7')
+    # Unique usernames, each tried once: the case that grew the old dict without bound.
+    # Half the stream is stamped a window ago, so the sweep has something to delete.
+    old = time.time() - LOCKOUT_SECONDS - 1
+    for i in range(stuffing):
+        reserve_attempt(db, f'stuffed{worker_id}_{i}:198.51.100.{i % 250}', now=old if i % 2 else None)
+    db.close()
+    results.put(allowed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--targets', type=int, default=20, help='accounts attacked from every worker')
+    parser.add_argument('--attempts', type=int, default=50, help='attempts per target per worker')
+    parser.add_argument('--stuffing', type=int, default=2000, help='one-off keys per worker')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        db = connect_sqlite(db_path)
+        run_migrations(db)
+        db.close()
+
+        ctx = multiprocessing.get_context('fork')
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(db_path, w, args.targets, args.attempts, args.stuffing, results))
+                 for w in range(args.workers)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        per_worker = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        db = connect_sqlite(db_path)
+        with db_cursor(db) as cursor:
+            cursor.execute('SELECT COUNT(*) FROM login_attempts')
+            rows = cursor.fetchone()[0]
+        db.close()
+
+    allowed = [sum(r[t] for r in per_worker) for t in range(args.targets)]
+    total = args.workers * (args.targets * args.attempts + args.stuffing)
+    print(f"{args.workers} workers, {total} attempts in {elapsed:.2f}s ({total / elapsed:.0f} attempts/s)")
+    print(f"  allowed per targeted key: min {min(allowed)}, max {max(allowed)} "
+          f"(limit {MAX_ATTEMPTS}; a per-worker dict allows up to {args.workers * MAX_ATTEMPTS})")
+    print(f"  login_attempts rows after the run: {rows} "
+          f"(of {args.targets + args.workers * args.stuffing} keys seen; stale windows swept)")
+
+
+if __name__ == '__main__':
+    main()
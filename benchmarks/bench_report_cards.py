@@ -0,0 +1,80 @@
+"""
+Report cards rendered per second, with styles rebuilt per card vs reused.
+
+  rebuilt  a new ReportCardRenderer for every card -- the stylesheet,
+           paragraph/table styles and fixed flowables built each time, as
+           generate_student_report_card did before
+  reused   one renderer for every card (get_renderer), as the single-card
+           route and each batch worker now do
+
+Single mode renders one card at a time in a loop (the per-request cost);
+batch mode renders --cards distinct students through render_report_cards
+in-process, as a batch job does on one CPU.
+
+    python benchmarks/bench_report_cards.py [--cards 500] [--courses 6]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+UNIVERSITY = 'GLOBAL UNIVERSITY OF OS'
+
+
+def make_cards(count, courses):
+    return [{
+        'student': {'username': f's{i}', 'role': 'student'},
+        'grades': [{'name': f'Course {c}', 'avg_score': round((i * c) % 100 + 0.5, 1)} for c in range(1, courses + 1)],
+        'attendance': [{'status': 'Present', 'count': 30 + i % 7}, {'status': 'Absent', 'count': i % 5}],
+        'remarks': {'term': 'Term 1', 'remarks': 'Consistent effort in class.', 'improvement_areas': 'Revise algebra.'},
+    } for i in range(count)]
+
+
+def rate(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cards', type=int, default=500)
+    parser.add_argument('--courses', type=int, default=6)
+    args = parser.parse_args()
+
+    from reports import ReportCardRenderer, get_renderer, render_report_cards
+    cards = make_cards(args.cards, args.courses)
+    card = cards[0]
+    args_of = lambda c: (c['student'], c['grades'], c['attendance'], c['remarks'])
+
+    # Warm up imports, font metrics and the cached renderer.
+    for c in cards[:20]:
+        get_renderer(UNIVERSITY).render(*args_of(c))
+
+    def single_rebuilt():
+        for _ in range(args.cards):
+            ReportCardRenderer(UNIVERSITY).render(*args_of(card))
+
+    def single_reused():
+        for _ in range(args.cards):
+            get_renderer(UNIVERSITY).render(*args_of(card))
+
+    def batch_rebuilt():
+        for c in cards:
+            ReportCardRenderer(UNIVERSITY).render(*args_of(c))
+
+    def batch_reused():
+        for _ in render_report_cards(UNIVERSITY, cards, workers=1):
+            pass
+
+    print(f"{args.cards} cards, {args.courses} courses each (cards/s, best of 3)")
+    for label, rebuilt, reused in [('single', single_rebuilt, single_reused), ('batch', batch_rebuilt, batch_reused)]:
+        before = max(rate(rebuilt, args.cards) for _ in range(3))
+        after = max(rate(reused, args.cards) for _ in range(3))
+        print(f"  {label:<6}  rebuilt {before:6.1f}  reused {after:6.1f}  ({(after / before - 1) * 100:+.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
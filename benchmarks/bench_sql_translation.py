@@ -0,0 +1,72 @@
+"""
+Micro-benchmark: cost of the SQLite dialect rewrite per CursorWrapper.execute.
+
+Compares the old per-call rewrite (str.replace + re.sub/re.search on every
+execute) with the cached translate_for_sqlite().
+
+    python benchmarks/bench_sql_translation.py [iterations]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import translate_for_sqlite
+
+# A representative slice of the static queries the routes issue.
+QUERIES = [
+    ('SELECT * FROM users WHERE id = %s', True),
+    ('SELECT * FROM schools WHERE slug = %s', True),
+    ('SELECT COUNT(*) FROM messages WHERE recipient_id = %s AND is_read = 0 AND school_id = %s', True),
+    ('INSERT INTO users (username, password_hash, role, school_id) VALUES (%s, %s, %s, %s) RETURNING id', True),
+    ("SELECT id, name FROM courses WHERE name ILIKE %s AND school_id = %s", True),
+    ('''
+        SELECT c.name, AVG(g.score) as avg_score
+        FROM grades g
+        JOIN courses c ON g.course_id = c.id
+        WHERE g.student_id = %s AND g.school_id = %s
+        GROUP BY c.id, c.name
+    ''', True),
+    ('SELECT * FROM schools WHERE id = 1', False),
+]
+
+
+def legacy_translate(query, has_params):
+    """The rewrite CursorWrapper.execute used to run on every call."""
+    if has_params:
+        query = query.replace('%s', '?')
+    query = re.sub(r'\s+ILIKE\s+', ' LIKE ', query, flags=re.IGNORECASE)
+    returning_id = False
+    if re.search(r'\s+RETURNING\s+id', query, flags=re.IGNORECASE):
+        query = re.sub(r'\s+RETURNING\s+id', '', query, flags=re.IGNORECASE)
+        returning_id = True
+    return query, returning_id
+
+
+def run(translate, iterations):
+    for _ in range(iterations):
+        for query, has_params in QUERIES:
+            translate(query, has_params)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    calls = iterations * len(QUERIES)
+
+    for query, has_params in QUERIES:
+        assert translate_for_sqlite(query, has_params) == legacy_translate(query, has_params)
+
+    before = min(timeit.repeat(lambda: run(legacy_translate, iterations), number=1, repeat=3))
+    after = min(timeit.repeat(lambda: run(translate_for_sqlite, iterations), number=1, repeat=3))
+
+    print(f"{calls} translations per run")
+    print(f"  per-call rewrite : {before / calls * 1e6:7.3f} us/execute")
+    print(f"  cached rewrite   : {after / calls * 1e6:7.3f} us/execute")
+    print(f"  speed-up         : {before / after:7.1f}x")
+    print(f"  cache            : {translate_for_sqlite.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
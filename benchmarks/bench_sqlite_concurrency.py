@@ -0,0 +1,102 @@
+"""
+Concurrent read/write load test for the SQLite connection profiles.
+
+Each thread behaves like a gunicorn request thread: open a connection via
+connect_sqlite(), run one read (a dashboard-style aggregate) or one write
+(insert a grade and commit), close it. Runs the same mix against a fresh
+database once per profile and reports throughput plus lock errors.
+
+    python benchmarks/bench_sqlite_concurrency.py [threads] [seconds] [write_ratio]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect_sqlite, SQLITE_PROFILES
+
+STUDENTS = 200
+COURSES = 10
+
+
+def prepare(db_path):
+    db = sqlite3.connect(db_path)
+    db.executescript('''
+        CREATE TABLE grades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER, course_id INTEGER, score REAL, school_id INTEGER
+        );
+        CREATE INDEX idx_grades_student_course ON grades (student_id, course_id, school_id);
+    ''')
+    db.executemany('INSERT INTO grades (student_id, course_id, score, school_id) VALUES (?, ?, ?, 1)',
+                   [(s, c, random.uniform(40, 100)) for s in range(STUDENTS) for c in range(COURSES)])
+    db.commit()
+    db.close()
+
+
+def run_profile(profile, threads, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        prepare(db_path)
+
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.time() + seconds
+
+        def worker():
+            rng = random.Random()
+            local = {'reads': 0, 'writes': 0, 'locked': 0}
+            while time.time() < deadline:
+                db = None
+                try:
+                    db = connect_sqlite(db_path, profile)
+                    student = rng.randrange(STUDENTS)
+                    if rng.random() < write_ratio:
+                        db.execute('INSERT INTO grades (student_id, course_id, score, school_id) VALUES (?, ?, ?, 1)',
+                                   (student, rng.randrange(COURSES), rng.uniform(40, 100)))
+                        db.commit()
+                        local['writes'] += 1
+                    else:
+                        db.execute('SELECT course_id, AVG(score) FROM grades WHERE student_id = ? AND school_id = 1 '
+                                   'GROUP BY course_id', (student,)).fetchall()
+                        local['reads'] += 1
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    local['locked'] += 1
+                finally:
+                    if db is not None:
+                        db.close()
+            with lock:
+                for key, value in local.items():
+                    counts[key] += value
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return counts
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    write_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+
+    print(f"{threads} threads, {seconds:g}s per profile, {write_ratio:.0%} writes")
+    for profile in SQLITE_PROFILES:
+        c = run_profile(profile, threads, seconds, write_ratio)
+        total = c['reads'] + c['writes']
+        print(f"  {profile:<10}: {total / seconds:8.0f} ops/s "
+              f"({c['reads'] / seconds:.0f} reads/s, {c['writes'] / seconds:.0f} writes/s, "
+              f"{c['locked']} 'database is locked' errors)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Latency of the student dashboard data fetch: the old five queries plus GPA in
+Python vs the single STUDENT_DASHBOARD_QUERY round trip.
+
+Builds a throwaway SQLite database with one heavy student (many courses,
+long grade and attendance histories) among a school of ordinary ones. SQLite
+runs in-process, so `--rtt-ms` adds a modelled network round trip per query
+to approximate a remote PostgreSQL.
+
+    python benchmarks/bench_student_dashboard.py [--courses 40] [--history 250] [--rtt-ms 0.5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect_sqlite, db_cursor
+from helpers import calculate_gpa
+from migrations import run_migrations
+from routes.dashboard import student_dashboard_payload
+
+STUDENT = 1000
+SCHOOL = 1
+
+
+def build(db, courses, history, others):
+    rng = random.Random(7)
+    with db_cursor(db) as cursor:
+        cursor.execute("INSERT INTO schools (id, name, slug) VALUES (1, 'Bench', 'bench')")
+        cursor.bulk_insert('users', ('id', 'username', 'password_hash', 'role', 'school_id'),
+                           [(1, 'teacher', 'x', 'teacher', SCHOOL)] +
+                           [(sid, f's{sid}', 'x', 'student', SCHOOL) for sid in range(STUDENT, STUDENT + others + 1)])
+        cursor.bulk_insert('courses', ('id', 'name', 'teacher_id', 'school_id'),
+                           [(c, f'Course {c}', 1, SCHOOL) for c in range(1, courses + 1)])
+        cursor.bulk_insert('enrollments', ('student_id', 'course_id', 'school_id'),
+                           [(STUDENT, c, SCHOOL) for c in range(1, courses + 1)])
+        for sid in range(STUDENT, STUDENT + others + 1):
+            # The benchmarked student gets the full history; the rest a tenth of it.
+            n = history if sid == STUDENT else max(1, history // 10)
+            cursor.bulk_insert('grades', ('student_id', 'course_id', 'score', 'grade_type', 'school_id'),
+                               [(sid, c, rng.uniform(40, 100), 'Exam', SCHOOL)
+                                for c in range(1, courses + 1) for _ in range(n)])
+            cursor.bulk_insert('attendance', ('student_id', 'course_id', 'date', 'status', 'school_id'),
+                               [(sid, c, f'2025-{1 + d % 12:02d}-{1 + d % 28:02d}',
+                                 rng.choice(['Present', 'Present', 'Present', 'Absent', 'Late']), SCHOOL)
+                                for c in range(1, courses + 1) for d in range(n)])
+        cursor.bulk_insert('notifications', ('user_id', 'message', 'school_id'),
+                           [(STUDENT, f'note {i}', SCHOOL) for i in range(200)])
+        cursor.bulk_insert('assignments', ('course_id', 'title', 'due_date', 'school_id'),
+                           [(c, f'HW {c}.{i}', '2026-01-01', SCHOOL) for c in range(1, courses + 1) for i in range(5)])
+    db.commit()
+
+
+def legacy_fetch(cursor, student_id, school_id):
+    """The five per-section queries the dashboard used to run, with GPA in Python."""
+    cursor.execute('SELECT * FROM notifications WHERE user_id = %s AND school_id = %s ORDER BY created_at DESC LIMIT 5',
+                   (student_id, school_id))
+    cursor.fetchall()
+    cursor.execute('''
+        SELECT c.name, AVG(g.score) as avg_score FROM grades g JOIN courses c ON g.course_id = c.id
+        WHERE g.student_id = %s AND g.school_id = %s GROUP BY c.id, c.name
+    ''', (student_id, school_id))
+    values = [round(g['avg_score'], 1) for g in cursor.fetchall()]
+    cursor.execute('''
+        SELECT cl.name FROM classrooms cl JOIN student_details sd ON sd.classroom_id = cl.id
+        WHERE sd.user_id = %s AND sd.school_id = %s
+    ''', (student_id, school_id))
+    cursor.fetchone()
+    cursor.execute('SELECT status, COUNT(*) as count FROM attendance WHERE student_id = %s AND school_id = %s GROUP BY status',
+                   (student_id, school_id))
+    cursor.fetchall()
+    cursor.execute('''
+        SELECT a.title, c.name as course_name, a.due_date FROM assignments a
+        JOIN courses c ON a.course_id = c.id JOIN enrollments e ON c.id = e.course_id
+        WHERE e.student_id = %s AND a.school_id = %s ORDER BY a.created_at DESC LIMIT 5
+    ''', (student_id, school_id))
+    cursor.fetchall()
+    return round(sum(calculate_gpa(v) for v in values) / len(values), 2) if values else 0.0
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=40)
+    parser.add_argument('--history', type=int, default=250, help='grades and attendance rows per course')
+    parser.add_argument('--others', type=int, default=200, help='other students in the school')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='modelled round trip per query')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = connect_sqlite(os.path.join(tmp, 'bench.db'))
+        run_migrations(db)
+        build(db, args.courses, args.history, args.others)
+        # As init_db does after a migration; without stats SQLite ignores the covering indexes.
+        db.execute('ANALYZE')
+
+        with db_cursor(db) as cursor:
+            new_gpa = student_dashboard_payload(cursor, STUDENT, SCHOOL)['gpa']
+            old_gpa = legacy_fetch(cursor, STUDENT, SCHOOL)
+            cursor.execute('SELECT COUNT(*) FROM grades')
+            grades = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM attendance')
+            attendance = cursor.fetchone()[0]
+
+            old_p50, old_p95 = timed(lambda: legacy_fetch(cursor, STUDENT, SCHOOL), args.repeat)
+            new_p50, new_p95 = timed(lambda: student_dashboard_payload(cursor, STUDENT, SCHOOL), args.repeat)
+        db.close()
+
+    rtt = args.rtt_ms / 1000
+    print(f"{grades} grades, {attendance} attendance rows; student {STUDENT} has "
+          f"{args.courses * args.history} of each. GPA old={old_gpa} new={new_gpa}")
+    print(f"  5 queries + Python GPA : p50 {old_p50 * 1e3:6.2f} ms  p95 {old_p95 * 1e3:6.2f} ms"
+          f"  (+{5 * args.rtt_ms:.1f} ms RTT -> {(old_p50 + 5 * rtt) * 1e3:6.2f} ms)")
+    print(f"  1 query, GPA in SQL    : p50 {new_p50 * 1e3:6.2f} ms  p95 {new_p95 * 1e3:6.2f} ms"
+          f"  (+{args.rtt_ms:.1f} ms RTT -> {(new_p50 + rtt) * 1e3:6.2f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Requests/sec as gunicorn workers scale.
+
+For each worker count, starts the real server (gunicorn -c gunicorn.conf.py)
+on a throwaway demo-seeded SQLite database, logs `--clients` sessions in as
+demo students, then has each client request the dashboard in a loop for
+`--seconds`. Reports throughput, latency and errors per worker count.
+
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--clients 16] [--seconds 10] [--threads 4]
+
+Set DATABASE_URL to benchmark against PostgreSQL instead (the database must
+be disposable: the demo data is seeded into it).
+"""
+import argparse
+import http.cookiejar
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUDENTS = ['alice', 'bob', 'charlie', 'david']
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, threads, port, db_path):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads), PORT=str(port),
+               DATABASE=db_path, SECRET_KEY='bench', FLASK_ENV='development', SEED_DEMO='true',
+               ADMIN_PASSWORD='bench-admin')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/keep-alive', timeout=1)
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not come up')
+
+
+def login(base, username):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    page = opener.open(f'{base}/login').read().decode()
+    token = _CSRF_RE.search(page)
+    form = {'username': username, 'password': 'password', 'role': 'student'}
+    if token:
+        form['csrf_token'] = token.group(1)
+    if not opener.open(f'{base}/login', urllib.parse.urlencode(form).encode()).geturl().endswith('/dashboard'):
+        raise RuntimeError(f'could not log in as {username}')
+    return opener
+
+
+def run(workers, threads, clients, seconds):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(workers, threads, port, os.path.join(tmp, 'bench.db'))
+        try:
+            # Logged in one at a time: the login throttle counts concurrent attempts per (user, ip).
+            openers = [login(base, STUDENTS[i % len(STUDENTS)]) for i in range(clients)]
+            latencies, errors = [], [0]
+            lock = threading.Lock()
+            deadline = time.time() + seconds
+
+            def client(opener):
+                local, failed = [], 0
+                while time.time() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        with opener.open(f'{base}/dashboard', timeout=30) as response:
+                            response.read()
+                        local.append(time.perf_counter() - start)
+                    except (urllib.error.URLError, ConnectionError):
+                        failed += 1
+                with lock:
+                    latencies.extend(local)
+                    errors[0] += failed
+
+            pool = [threading.Thread(target=client, args=(o,)) for o in openers]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+        finally:
+            server.terminate()
+            server.wait(30)
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1e3 if latencies else 0.0
+    return len(latencies) / seconds, p(0.5), p(0.95), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent logged-in clients')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.threads} threads/worker, "
+          f"{args.seconds:g}s per run, GET /dashboard")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        rps, p50, p95, errors = run(workers, args.threads, args.clients, args.seconds)
+        print(f"  {workers:>2} worker(s): {rps:7.1f} req/s  p50 {p50:6.1f} ms  p95 {p95:6.1f} ms  {errors} errors")
+
+
+if __name__ == '__main__':
+    main()
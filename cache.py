@@ -0,0 +1,269 @@
+"""
+Caching for hot, rarely-changing lookups.
+
+TTLCache is a small in-process LRU. Each gunicorn worker holds its own copy,
+so writers must call the owning module's invalidate helper; other workers
+converge within the TTL.
+
+Cache (the `cache` extension in extensions.py) puts the same get/set/delete/
+incr API in front of a backend chosen by CACHE_URL: a TTLCache by default,
+or a Redis-compatible server (Redis, Valkey, KeyDB) shared by every worker.
+Keys can be namespaced by school_id.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+
+class TTLCache:
+    """
+    Thread-safe LRU mapping whose entries expire `ttl` seconds after being
+    set (ttl=None: only evicted by size).
+    """
+
+    def __init__(self, ttl=300, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def _expires_at(self, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        return float('inf') if ttl is None else time.monotonic() + ttl
+
+    def _store(self, key, value, expires_at):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        expires_at = self._expires_at(ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+
+    def incr(self, key, delta=1, ttl=None):
+        """Add delta to an integer entry (missing counts as 0) and return it; ttl applies on creation."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                value, expires_at = entry[0] + delta, entry[1]
+            else:
+                value, expires_at = delta, self._expires_at(ttl)
+            self._store(key, value, expires_at)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix=None):
+        """Drop every entry, or only string keys starting with prefix."""
+        with self._lock:
+            if prefix is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]:
+                del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+def _encode_json(value):
+    # Database rows carry these (PostgreSQL's timestamps, dates and AVG()s).
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    raise TypeError(f'{type(value).__name__} values cannot be cached')
+
+
+def _decode_json(obj):
+    if len(obj) == 1:
+        (tag, value), = obj.items()
+        if tag == '__datetime__':
+            return datetime.fromisoformat(value)
+        if tag == '__date__':
+            return date.fromisoformat(value)
+        if tag == '__decimal__':
+            return Decimal(value)
+    return obj
+
+
+def dumps(value):
+    """JSON for the shared cache; datetimes, dates and Decimals round-trip, tuples come back as lists."""
+    return json.dumps(value, default=_encode_json, separators=(',', ':'))
+
+
+def loads(raw):
+    return json.loads(raw, object_hook=_decode_json)
+
+
+class RedisBackend:
+    """
+    Backend for a Redis-compatible server, shared by every worker and host.
+
+    Values are stored as JSON (see dumps()), so nothing read back from the
+    server is ever unpickled; counters written by incr() are plain integers,
+    as INCRBY requires, which read back as JSON ints too. Server errors never
+    fail a request: reads miss, writes are dropped, and the first error after
+    a healthy period is logged.
+    """
+
+    def __init__(self, url, ttl=300):
+        import redis
+        self._errors_cls = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._healthy = True
+
+    def _failed(self, e):
+        self.errors += 1
+        if self._healthy:
+            print(f"[WARN] Cache server unavailable, serving uncached: {e}")
+        self._healthy = False
+
+    def _ok(self):
+        self._healthy = True
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(key)
+        except self._errors_cls as e:
+            self._failed(e)
+            return default
+        self._ok()
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.client.set(key, dumps(value), ex=ttl)
+            self._ok()
+        except self._errors_cls as e:
+            self._failed(e)
+
+    def incr(self, key, delta=1, ttl=None):
+        """INCRBY, setting the expiry only when this call created the key. None if the server is down."""
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            pipe = self.client.pipeline()
+            if ttl is not None:
+                pipe.set(key, 0, ex=ttl, nx=True)
+            pipe.incrby(key, delta)
+            value = pipe.execute()[-1]
+            self._ok()
+            return value
+        except self._errors_cls as e:
+            self._failed(e)
+            return None
+
+    def delete(self, key):
+        try:
+            self.client.delete(key)
+            self._ok()
+        except self._errors_cls as e:
+            self._failed(e)
+
+    def clear(self, prefix=None):
+        try:
+            keys = list(self.client.scan_iter(match=f'{prefix or ""}*', count=500))
+            if keys:
+                self.client.delete(*keys)
+            self._ok()
+        except self._errors_cls as e:
+            self._failed(e)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+class Cache:
+    """
+    get/set/delete/incr with TTLs and per-school namespaces, in front of the
+    backend selected by CACHE_URL (e.g. redis://localhost:6379/0). Without
+    it, or if the redis package is missing, entries live in this worker.
+    """
+
+    def __init__(self, app=None):
+        self.prefix = 'student_os'
+        self.backend = TTLCache(ttl=300, maxsize=4096)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('CACHE_URL', os.getenv('CACHE_URL'))
+        ttl = int(app.config.get('CACHE_DEFAULT_TTL', os.getenv('CACHE_DEFAULT_TTL', '300')))
+        self.prefix = app.config.get('CACHE_KEY_PREFIX', os.getenv('CACHE_KEY_PREFIX', 'student_os'))
+        self.backend = None
+        if url:
+            try:
+                self.backend = RedisBackend(url, ttl)
+                print("[OK] Cache backend: shared server (CACHE_URL).")
+            except ImportError:
+                print("[WARN] CACHE_URL is set but the redis package is not installed; caching per worker.")
+        if self.backend is None:
+            self.backend = TTLCache(ttl=ttl, maxsize=int(app.config.get('CACHE_MAXSIZE', os.getenv('CACHE_MAXSIZE', '4096'))))
+        app.extensions['cache'] = self
+
+    @property
+    def shared(self):
+        """True when entries are visible to every worker, not just this one."""
+        return isinstance(self.backend, RedisBackend)
+
+    def key(self, key, school_id=None):
+        if school_id is None:
+            return f'{self.prefix}:{key}'
+        return f'{self.prefix}:school:{school_id}:{key}'
+
+    def get(self, key, default=None, school_id=None):
+        return self.backend.get(self.key(key, school_id), default)
+
+    def set(self, key, value, ttl=None, school_id=None):
+        self.backend.set(self.key(key, school_id), value, ttl)
+
+    def delete(self, key, school_id=None):
+        self.backend.delete(self.key(key, school_id))
+
+    def incr(self, key, delta=1, ttl=None, school_id=None):
+        return self.backend.incr(self.key(key, school_id), delta, ttl)
+
+    def clear(self, school_id=None):
+        """Drop this app's entries, or only one school's."""
+        prefix = self.key('', school_id) if school_id is not None else f'{self.prefix}:'
+        self.backend.clear(prefix)
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats['backend'] = 'shared' if self.shared else 'worker'
+        return stats
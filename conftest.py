@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def initialized_app(tmp_path_factory):
+    """
+    Point the app at a throwaway SQLite database and run the one-time startup
+    initialization on it, as gunicorn's on_starting hook does in production.
+    """
+    from app import app, startup_init
+
+    original = app.config['DATABASE']
+    app.config['DATABASE'] = str(tmp_path_factory.mktemp('db') / 'student_os.db')
+    startup_init()
+    try:
+        yield app
+    finally:
+        app.config['DATABASE'] = original
+
+
+@pytest.fixture
+def app_db(tmp_path, initialized_app):
+    """The Flask app pointed at a fresh, fully migrated SQLite database and an empty upload folder."""
+    from db import init_db
+    from extensions import cache
+    from helpers import school_cache
+    from models import identity_cache
+
+    app = initialized_app
+    original = app.config['DATABASE'], app.config['UPLOAD_FOLDER']
+    app.config['DATABASE'] = str(tmp_path / 'test.db')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    init_db(app)
+    # In-process caches would otherwise leak rows from the previous database.
+    school_cache.clear()
+    identity_cache.clear()
+    cache.clear()
+    try:
+        yield app
+    finally:
+        app.config['DATABASE'], app.config['UPLOAD_FOLDER'] = original
+
+
+@pytest.fixture
+def school(app_db, monkeypatch):
+    """app_db with school 1 ('Greenwood') and the config login_client() needs."""
+    from db import db_cursor, get_db
+
+    monkeypatch.setitem(app_db.config, 'SECRET_KEY', 'test')
+    monkeypatch.setitem(app_db.config, 'SESSION_COOKIE_SECURE', False)
+    monkeypatch.setitem(app_db.config, 'WTF_CSRF_ENABLED', False)
+    with app_db.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO schools (id, name, slug) VALUES (1, 'Greenwood', 'greenwood')")
+        db.commit()
+    return app_db
+
+
+def login_client(app, user_id):
+    """A test client signed in as user_id (use with the `school` fixture)."""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
@@ -0,0 +1,40 @@
+"""
+How many CPUs the app may really use, for sizing gunicorn workers and the
+report-card pool. os.cpu_count() reports the host's cores; inside a
+container the affinity mask and the cgroup CPU quota are what count.
+
+Standard library only: gunicorn.conf.py imports it in the master, which
+must not load ssl before gevent workers patch it.
+"""
+import math
+import os
+
+
+def available_cpus(cgroup_root='/sys/fs/cgroup'):
+    """CPUs this process can use: the affinity mask, capped by the cgroup quota (rounded up)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS, Windows
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(cgroup_root)
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def cgroup_cpu_quota(root='/sys/fs/cgroup'):
+    """The cgroup CPU limit in CPUs (v2 cpu.max, else v1 cfs quota), or None when unlimited."""
+    try:
+        with open(os.path.join(root, 'cpu.max')) as f:
+            quota, period = f.read().split()
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, 'cpu', 'cpu.cfs_quota_us')) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, 'cpu', 'cpu.cfs_period_us')) as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
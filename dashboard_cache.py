@@ -0,0 +1,110 @@
+"""
+Cached dashboard widget data (chart series, stat cards, activity and
+notification lists), keyed dash:{school}:{role}:{user} in the school's
+namespace of the `cache` extension.
+
+Entries are never invalidated in place. Each key embeds version tokens,
+and write paths replace them after committing, so the next read misses and
+rebuilds:
+
+- a student's dashboard depends on their own version;
+- staff dashboards (teacher, principal, admin) aggregate over the school,
+  so they also depend on the school's version.
+
+What each write bumps:
+
+- grades and attendance: the student and the school;
+- a notification: only its recipient;
+- a submission: the course's teacher (their recent submissions);
+- a new assignment: the course's enrolled students (their recent activity);
+- enrollments and course changes: the students concerned and the school;
+- classroom assignment: the students concerned (their classroom name);
+- admissions and staff changes: the school (user and head counts).
+
+With a shared backend (CACHE_URL)
+a bump reaches every worker at once; per worker, others converge within
+DASHBOARD_CACHE_TTL.
+"""
+import os
+import threading
+import uuid
+
+from extensions import cache
+
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '120'))
+
+# Versions outlive the entries that embed them. A missing version is replaced
+# by a fresh random token rather than restarting a counter, so it can't
+# match an older entry that is still cached.
+VERSION_TTL = DASHBOARD_CACHE_TTL * 2
+
+# The shared invalidation counter restarts after this many seconds.
+INVALIDATIONS_WINDOW = 24 * 3600
+
+_stats_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def dashboard_key(role, user_id):
+    """The key within the school's namespace, i.e. dash:{school}:{role}:{user}."""
+    return f'dash:{role}:{user_id}'
+
+
+def _version(scope, school_id):
+    version = cache.get(scope, school_id=school_id)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        cache.set(scope, version, ttl=VERSION_TTL, school_id=school_id)
+    return version
+
+
+def _versioned_key(school_id, role, user_id, locale):
+    version = _version(f'dashver:user:{user_id}', school_id)
+    if role != 'student':
+        version += '.' + _version('dashver:school', school_id)
+    return f'{dashboard_key(role, user_id)}:{locale}:{version}'
+
+
+def _count(hit):
+    global _hits, _misses
+    with _stats_lock:
+        if hit:
+            _hits += 1
+        else:
+            _misses += 1
+
+
+def get_dashboard(school_id, role, user_id, locale, build):
+    """Cached widget data for one user's dashboard, calling build() on a miss."""
+    key = _versioned_key(school_id, role, user_id, locale)
+    data = cache.get(key, school_id=school_id)
+    _count(data is not None)
+    if data is None:
+        data = build()
+        cache.set(key, data, ttl=DASHBOARD_CACHE_TTL, school_id=school_id)
+    return data
+
+
+def bump_dashboard_version(school_id, user_id=None, school_wide=True, user_ids=()):
+    """
+    Mark dashboards stale after a committed write. Pass the affected user
+    (e.g. the graded student), or several as user_ids; school_wide=False
+    limits it to those users, for writes like notifications that don't show
+    up in staff aggregates.
+    """
+    if user_id is not None:
+        user_ids = [user_id, *user_ids]
+    for uid in user_ids:
+        cache.delete(f'dashver:user:{uid}', school_id=school_id)
+    if school_wide:
+        cache.delete('dashver:school', school_id=school_id)
+    cache.incr('dashboard:invalidations', ttl=INVALIDATIONS_WINDOW)
+
+
+def dashboard_cache_stats():
+    """This worker's hit/miss counts plus invalidations (across workers on a shared backend)."""
+    with _stats_lock:
+        stats = {'hits': _hits, 'misses': _misses}
+    stats['invalidations'] = cache.get('dashboard:invalidations', 0)
+    return stats
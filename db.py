@@ -1,12 +1,304 @@
 import os
+import time
+import uuid
+import threading
 import psycopg2
 import sqlite3
 import re
-from psycopg2.extras import DictCursor
-from flask import g, current_app
+from psycopg2.extras import DictCursor, execute_batch, execute_values
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from flask import g, current_app, has_app_context
 from contextlib import contextmanager
+from functools import lru_cache
 
-def get_db():
+
+def _postgres_url(env='DATABASE_URL'):
+    """Return the PostgreSQL URL in `env` (normalised for psycopg2), or None."""
+    db_url = os.getenv(env)
+    if not db_url or 'postgres' not in db_url:
+        return None
+    if db_url.startswith('postgres://'):
+        db_url = db_url.replace('postgres://', 'postgresql://', 1)
+    return db_url
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of PostgreSQL connections, shared by all request threads.
+
+    Connections are health-checked on checkout (a closed socket is always
+    replaced; one that sat idle longer than `ping_after` seconds is pinged
+    with SELECT 1) and recycled once they have served `max_uses` requests
+    or are older than `max_age` seconds.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, max_uses=1000, max_age=1800,
+                 ping_after=30, timeout=10):
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []    # LIFO stack of idle connections
+        self._meta = {}    # id(conn) -> {'created': ts, 'uses': n, 'returned': ts}
+        self._in_use = 0
+        self._counters = {
+            'created': 0, 'checkouts': 0, 'waits': 0, 'timeouts': 0,
+            'recycled': 0, 'discarded': 0, 'failed_health_checks': 0,
+        }
+
+        for _ in range(minconn):
+            conn = self._new_connection()
+            self._meta[id(conn)]['returned'] = time.time()
+            self._idle.append(conn)
+
+    def _new_connection(self):
+        conn = self._connect()
+        now = time.time()
+        with self._cond:
+            self._meta[id(conn)] = {'created': now, 'uses': 0, 'returned': now}
+            self._counters['created'] += 1
+        return conn
+
+    def _count(self, counter):
+        with self._cond:
+            self._counters[counter] += 1
+
+    def _close(self, conn):
+        with self._cond:
+            self._meta.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, conn):
+        meta = self._meta.get(id(conn))
+        if meta is None:
+            return True
+        return meta['uses'] >= self.max_uses or time.time() - meta['created'] > self.max_age
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        meta = self._meta.get(id(conn))
+        if meta and time.time() - meta['returned'] < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        deadline = time.time() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.maxconn:
+                    conn = None
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s "
+                                      f"(pool max {self.maxconn})")
+                self._counters['waits'] += 1
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+
+        # Connecting and pinging happen outside the lock so one slow
+        # handshake doesn't stall every other thread's checkout.
+        try:
+            if conn is not None and self._is_expired(conn):
+                self._count('recycled')
+                self._close(conn)
+                conn = None
+            elif conn is not None and not self._is_healthy(conn):
+                self._count('failed_health_checks')
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._meta[id(conn)]['uses'] += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        keep = not discard and not conn.closed
+        if keep and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            # Never hand the next request a connection mid-transaction.
+            try:
+                conn.rollback()
+            except Exception:
+                keep = False
+
+        with self._cond:
+            if keep and self._is_expired(conn):
+                self._counters['recycled'] += 1
+                keep = False
+            elif not keep:
+                self._counters['discarded'] += 1
+            self._in_use -= 1
+            if keep:
+                self._meta[id(conn)]['returned'] = time.time()
+                self._idle.append(conn)
+            self._cond.notify()
+        if not keep:
+            self._close(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._counters,
+                size=self._in_use + len(self._idle),
+                idle=len(self._idle),
+                in_use=self._in_use,
+                min=self.minconn,
+                max=self.maxconn,
+            )
+
+
+# One pool per role: False -> primary (DATABASE_URL), True -> replica (DATABASE_READ_URL).
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _replica_url():
+    """The read replica URL, only honoured when the primary is PostgreSQL too."""
+    if not _postgres_url():
+        return None
+    return _postgres_url('DATABASE_READ_URL')
+
+
+def _connect_replica(db_url):
+    conn = psycopg2.connect(db_url, cursor_factory=DictCursor, connect_timeout=10)
+    # A write routed here by mistake fails loudly instead of hitting a replica.
+    conn.set_session(readonly=True)
+    return conn
+
+
+def get_pool(readonly=False):
+    """Return this process's PostgreSQL pool, creating it on first use (or after a fork)."""
+    db_url = _replica_url() if readonly else _postgres_url()
+    if not db_url:
+        return None
+    with _pool_lock:
+        pool = _pools.get(readonly)
+        # A forked worker must not share sockets with its parent: start afresh.
+        if pool is None or pool.pid != os.getpid():
+            if readonly:
+                connect = lambda: _connect_replica(db_url)
+            else:
+                connect = lambda: psycopg2.connect(db_url, cursor_factory=DictCursor, connect_timeout=10)
+            pool = _pools[readonly] = ConnectionPool(
+                connect,
+                minconn=int(os.getenv('DB_POOL_MIN', '1')),
+                maxconn=int(os.getenv('DB_POOL_MAX', '10')),
+                max_uses=int(os.getenv('DB_POOL_MAX_USES', '1000')),
+                max_age=int(os.getenv('DB_POOL_MAX_AGE', '1800')),
+                ping_after=int(os.getenv('DB_POOL_PING_AFTER', '30')),
+                timeout=int(os.getenv('DB_POOL_TIMEOUT', '10')),
+            )
+            role = 'read replica' if readonly else 'PostgreSQL'
+            print(f"[OK] {role} connection pool ready (min={pool.minconn}, max={pool.maxconn})")
+        return pool
+
+
+def close_pool():
+    """Close this process's pools, e.g. in the gunicorn master before workers fork."""
+    with _pool_lock:
+        for pool in _pools.values():
+            if pool.pid == os.getpid():
+                pool.closeall()
+        _pools.clear()
+
+
+def pool_stats(readonly=False):
+    """Counters for sizing the pool; None when running on SQLite (or without a replica)."""
+    pool = _pools.get(readonly)
+    if pool is None or pool.pid != os.getpid():
+        return None
+    return pool.stats()
+
+
+# PRAGMAs applied to every SQLite connection, in order. busy_timeout goes
+# first so the switch to WAL itself waits out a concurrent writer.
+SQLITE_PROFILES = {
+    'production': [
+        ('busy_timeout', 'SQLITE_BUSY_TIMEOUT', '5000'),
+        ('journal_mode', 'SQLITE_JOURNAL_MODE', 'WAL'),
+        ('synchronous', 'SQLITE_SYNCHRONOUS', 'NORMAL'),
+        ('mmap_size', 'SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+        ('cache_size', 'SQLITE_CACHE_SIZE', '-20000'),
+        ('temp_store', 'SQLITE_TEMP_STORE', 'MEMORY'),
+    ],
+    # SQLite's own defaults: rollback journal, no mmap.
+    'default': [],
+}
+
+# Rows sampled per index when init_db refreshes planner stats after a migration;
+# bounds ANALYZE to milliseconds even on a large database.
+SQLITE_ANALYSIS_LIMIT = int(os.getenv('SQLITE_ANALYSIS_LIMIT', '1000'))
+
+
+def sqlite_pragmas(profile=None):
+    """[(pragma, value)] for the profile named by SQLITE_PROFILE (production unless set)."""
+    profile = profile or os.getenv('SQLITE_PROFILE', 'production')
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}; expected one of {sorted(SQLITE_PROFILES)}")
+    return [(pragma, os.getenv(env, default)) for pragma, env, default in SQLITE_PROFILES[profile]]
+
+
+def connect_sqlite(db_path, profile=None):
+    """Open a SQLite connection with Row results and the configured PRAGMA profile."""
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    for pragma, value in sqlite_pragmas(profile):
+        if pragma == 'journal_mode':
+            # Persistent in the file: only switch (which needs a lock) when it differs.
+            if db.execute('PRAGMA journal_mode').fetchone()[0].lower() == value.lower():
+                continue
+        db.execute(f"PRAGMA {pragma} = {value}")
+    return db
+
+
+def get_db(readonly=False):
+    """
+    The request's database connection.
+
+    With readonly=True the request gets a connection to the read replica
+    (DATABASE_READ_URL) when one is configured. Once the request has written
+    through the primary it sticks to the primary, so it always reads its own
+    writes. Without a replica this is the primary connection.
+    """
     if not current_app:
         # Fallback for initialization outside of request context
         db_url = os.getenv('DATABASE_URL')
@@ -16,228 +308,346 @@ def get_db():
                     db_url = db_url.replace('postgres://', 'postgresql://', 1)
                 return psycopg2.connect(db_url, cursor_factory=DictCursor)
             except: pass
-        db_path = os.getenv('DATABASE', 'student_os.db')
-        db = sqlite3.connect(db_path)
-        db.row_factory = sqlite3.Row
-        return db
+        return connect_sqlite(os.getenv('DATABASE', 'student_os.db'))
+
+    if readonly and not g.get('_db_wrote') and _replica_url():
+        db = g.get('_read_database')
+        if db is not None:
+            return db
+        try:
+            db = g._read_database = get_pool(readonly=True).getconn()
+            return db
+        except Exception as e:
+            print(f"[WARN] Read replica unavailable, using primary: {e}")
 
     db = getattr(g, '_database', None)
     if db is None:
-        db_url = os.getenv('DATABASE_URL')
-        if db_url and ('postgres' in db_url):
+        db_url = _postgres_url()
+        if db_url:
             try:
-                if db_url.startswith('postgres://'):
-                    db_url = db_url.replace('postgres://', 'postgresql://', 1)
-                db = g._database = psycopg2.connect(db_url, cursor_factory=DictCursor, connect_timeout=10)
-                print("[OK] Successfully connected to PostgreSQL")
+                db = g._database = get_pool().getconn()
             except Exception as e:
                 print(f"[ERROR] Postgres connection failed: {e}")
                 db_url = None
         
         if not db_url:
-            db_path = current_app.config.get('DATABASE', 'student_os.db')
-            db = g._database = sqlite3.connect(db_path)
-            db.row_factory = sqlite3.Row
+            db = g._database = connect_sqlite(current_app.config.get('DATABASE', 'student_os.db'))
             
     return db
 
-@contextmanager
-def db_cursor(db):
-    cursor = db.cursor()
-    is_sqlite = hasattr(db, 'row_factory') 
-    
-    class CursorWrapper:
-        def __init__(self, cursor, is_sqlite):
-            self.cursor = cursor
-            self.is_sqlite = is_sqlite
-        
-        def execute(self, query, params=None):
+_ILIKE_RE = re.compile(r'\s+ILIKE\s+', flags=re.IGNORECASE)
+_RETURNING_ID_RE = re.compile(r'\s+RETURNING\s+id', flags=re.IGNORECASE)
+
+
+@lru_cache(maxsize=int(os.getenv('SQL_TRANSLATION_CACHE_SIZE', '1024')))
+def translate_for_sqlite(query, has_params):
+    """
+    Rewrite a PostgreSQL-flavoured query for SQLite.
+
+    Returns (query, returning_id). Routes only ever pass a few hundred
+    distinct static strings, so each one is rewritten once and served from
+    the LRU after that.
+    """
+    if has_params:
+        query = query.replace('%s', '?')
+    query = _ILIKE_RE.sub(' LIKE ', query)
+
+    returning_id = False
+    if _RETURNING_ID_RE.search(query):
+        query = _RETURNING_ID_RE.sub('', query)
+        returning_id = True
+    return query, returning_id
+
+
+_READ_ONLY_RE = re.compile(r'\s*(SELECT|WITH|SHOW|EXPLAIN)\b', flags=re.IGNORECASE)
+
+
+@lru_cache(maxsize=int(os.getenv('SQL_TRANSLATION_CACHE_SIZE', '1024')))
+def is_write_query(query):
+    """True unless the statement is a plain read (SELECT/WITH/SHOW/EXPLAIN)."""
+    return not _READ_ONLY_RE.match(query)
+
+
+def _note_write():
+    """Pin the rest of the request to the primary so it reads its own writes."""
+    if has_app_context():
+        g._db_wrote = True
+
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=int(os.getenv('SQL_TRANSLATION_CACHE_SIZE', '1024')))
+def query_fingerprint(query):
+    """Statement shape: literals and IN-lists collapsed, whitespace normalised."""
+    shape = _STRING_LITERAL_RE.sub('?', query)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('(...)', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+def _record_query(query, elapsed):
+    """Add one statement to the current app context's query stats (see query_stats)."""
+    if not has_app_context():
+        return
+    stats = g.get('_db_stats')
+    if stats is None:
+        stats = g._db_stats = {'count': 0, 'time': 0.0, 'shapes': {}}
+    stats['count'] += 1
+    stats['time'] += elapsed
+    shape = query_fingerprint(query)
+    stats['shapes'][shape] = stats['shapes'].get(shape, 0) + 1
+
+
+def query_stats():
+    """{'count', 'time' (seconds), 'shapes': {fingerprint: runs}} for this request."""
+    return g.get('_db_stats') or {'count': 0, 'time': 0.0, 'shapes': {}}
+
+
+def repeated_queries(threshold):
+    """[(fingerprint, runs)] for statement shapes run more than `threshold` times, worst first."""
+    shapes = query_stats()['shapes']
+    return sorted(((q, n) for q, n in shapes.items() if n > threshold), key=lambda item: -item[1])
+
+
+class CursorWrapper:
+    def __init__(self, cursor, is_sqlite, itersize=1000, on_write=None):
+        self.cursor = cursor
+        self.is_sqlite = is_sqlite
+        self.itersize = itersize
+        self.on_write = on_write
+
+    def execute(self, query, params=None):
+        start = time.perf_counter()
+        try:
+            return self._execute(query, params)
+        finally:
+            _record_query(query, time.perf_counter() - start)
+
+    def _execute(self, query, params):
+        if self.is_sqlite:
+            query, returning_id = translate_for_sqlite(query, params is not None)
+            try:
+                res = self.cursor.execute(query, params or ())
+                if returning_id:
+                    self.last_row_id = self.cursor.lastrowid
+                return res
+            except Exception as e:
+                print(f"DEBUG: SQLite Execution Error: {e} | Query: {query}")
+                raise e
+
+        if self.on_write and is_write_query(query):
+            self.on_write()
+        if params:
+            return self.cursor.execute(query, params)
+        return self.cursor.execute(query)
+
+    def executemany(self, query, seq_of_params):
+        """Run one statement for many parameter tuples in as few round trips as the backend allows."""
+        start = time.perf_counter()
+        try:
             if self.is_sqlite:
-                if params is not None:
-                    query = query.replace('%s', '?')
-                query = re.sub(r'\s+ILIKE\s+', ' LIKE ', query, flags=re.IGNORECASE)
-                
-                returning_id = False
-                if re.search(r'\s+RETURNING\s+id', query, flags=re.IGNORECASE):
-                    query = re.sub(r'\s+RETURNING\s+id', '', query, flags=re.IGNORECASE)
-                    returning_id = True
-                
-                try:
-                    res = self.cursor.execute(query, params or ())
-                    if returning_id:
-                        self.last_row_id = self.cursor.lastrowid
-                    return res
-                except Exception as e:
-                    print(f"DEBUG: SQLite Execution Error: {e} | Query: {query}")
-                    raise e
-            
-            if params:
-                return self.cursor.execute(query, params)
-            return self.cursor.execute(query)
-            
-        def fetchone(self):
-            if self.is_sqlite and hasattr(self, 'last_row_id'):
-                row_id = self.last_row_id
-                delattr(self, 'last_row_id')
-                class MockRow(dict):
-                    def __getitem__(self, key):
-                        if key == 0 or key == 'id': return row_id
-                        return super().__getitem__(key)
-                return MockRow({'id': row_id})
-            return self.cursor.fetchone()
-            
-        def fetchall(self):
-            return self.cursor.fetchall()
-            
-        def __getattr__(self, name):
-            return getattr(self.cursor, name)
+                return self.cursor.executemany(translate_for_sqlite(query, True)[0], seq_of_params)
+            if self.on_write:
+                self.on_write()
+            # psycopg2's own executemany is one round trip per row; execute_batch pages them.
+            return execute_batch(self.cursor, query, seq_of_params)
+        finally:
+            _record_query(query, time.perf_counter() - start)
+
+    def bulk_insert(self, table, columns, rows, returning=None, page_size=500):
+        """
+        Insert many rows into `table` at once.
+
+        With returning='id' the generated ids are returned in the same order
+        as `rows`, mirroring the single-row `INSERT ... RETURNING id` idiom.
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return []
+        column_list = ', '.join(columns)
+        start = time.perf_counter()
+        try:
+            return self._bulk_insert(table, column_list, len(columns), rows, returning, page_size)
+        finally:
+            _record_query(f"INSERT INTO {table} ({column_list}) VALUES ...", time.perf_counter() - start)
+
+    def _bulk_insert(self, table, column_list, width, rows, returning, page_size):
+        if self.is_sqlite:
+            if returning not in (None, 'id'):
+                raise ValueError("SQLite bulk_insert can only return 'id'")
+            query = f"INSERT INTO {table} ({column_list}) VALUES ({', '.join('?' * width)})"
+            if not returning:
+                self.cursor.executemany(query, rows)
+                return []
+            # SQLite runs in-process, so per-row execution costs no round trip
+            # and is the only way to read back each lastrowid in order.
+            ids = []
+            for row in rows:
+                self.cursor.execute(query, row)
+                ids.append(self.cursor.lastrowid)
+            return ids
+
+        if self.on_write:
+            self.on_write()
+        query = f"INSERT INTO {table} ({column_list}) VALUES %s"
+        if returning:
+            query += f" RETURNING {returning}"
+        result = execute_values(self.cursor, query, rows, page_size=page_size, fetch=bool(returning))
+        return [r[0] for r in result] if returning else []
+
+    def fetchone(self):
+        if self.is_sqlite and hasattr(self, 'last_row_id'):
+            row_id = self.last_row_id
+            delattr(self, 'last_row_id')
+            class MockRow(dict):
+                def __getitem__(self, key):
+                    if key == 0 or key == 'id': return row_id
+                    return super().__getitem__(key)
+            return MockRow({'id': row_id})
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def __iter__(self):
+        """Yield result rows without materialising the whole result set."""
+        if not self.is_sqlite:
+            # A named psycopg2 cursor pulls `itersize` rows per round trip.
+            return iter(self.cursor)
+        return self._iter_chunks()
+
+    def _iter_chunks(self):
+        while True:
+            rows = self.cursor.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+@contextmanager
+def db_cursor(db=None, stream=False, itersize=1000, readonly=False):
+    """
+    Yield a CursorWrapper for `db` (default: the request's get_db(readonly)).
+
+    With stream=True the cursor is meant to be iterated (`for row in cursor`)
+    so exports and batch jobs run in constant memory: on PostgreSQL it is a
+    named server-side cursor fetching `itersize` rows at a time, on SQLite
+    rows are read in `itersize` chunks. A streaming cursor runs exactly one
+    query and must be consumed before the transaction is committed.
 
+    Writes through a PostgreSQL cursor pin the rest of the request to the
+    primary (see get_db).
+    """
+    if db is None:
+        db = get_db(readonly=readonly)
+    is_sqlite = hasattr(db, 'row_factory')
+    if stream and not is_sqlite:
+        cursor = db.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = itersize
+    else:
+        cursor = db.cursor()
     try:
-        yield CursorWrapper(cursor, is_sqlite)
+        yield CursorWrapper(cursor, is_sqlite, itersize, on_write=None if is_sqlite else _note_write)
     finally:
         cursor.close()
 
+# Advisory lock namespaces: the first key of PostgreSQL's two-int lock functions.
+LOCK_MIGRATIONS = 1
+LOCK_STARTUP = 2
+LOCK_EXAM_ANALYSIS = 3
+
+
+@contextmanager
+def advisory_lock(db, namespace, key=0):
+    """
+    Serialize a section across every worker and instance sharing the
+    PostgreSQL database (a session-level advisory lock, held across commits).
+    Enter it between transactions: taking the lock commits.
+
+    On SQLite this is a no-op; writes are already serialized per database
+    file, and startup on one host is guarded by app._startup_lock.
+    """
+    if hasattr(db, 'row_factory'):
+        yield
+        return
+    with db.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s, %s)', (namespace, key))
+    db.commit()
+    try:
+        yield
+    finally:
+        db.rollback()
+        with db.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', (namespace, key))
+        db.commit()
+
+
+def advisory_xact_lock(cursor, namespace, key=0):
+    """Like advisory_lock, held until the cursor's transaction commits or rolls back."""
+    if not cursor.is_sqlite:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', (namespace, key))
+
+
 def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
+    g.pop('_db_wrote', None)
+    read_db = g.pop('_read_database', None)
+    if read_db is not None:
+        get_pool(readonly=True).putconn(read_db)
+    db = g.pop('_database', None)
+    if db is None:
+        return
+    if isinstance(db, sqlite3.Connection):
         db.close()
+    else:
+        get_pool().putconn(db)
+
+def init_db(app, raise_errors=False):
+    """
+    Brings the database schema up to date.
 
-def init_db(app):
-    """Initializes the database and runs migrations if necessary."""
+    On an up-to-date database this costs a single schema_migrations lookup.
+    Returns the migration versions applied. With raise_errors=True (the
+    `flask migrate` command) failures propagate so a deploy can abort.
+    """
     # Create a dedicated connection for initialization to avoid 'g' outside request context
-    db_url = os.getenv('DATABASE_URL')
+    db_url = _postgres_url()
     db = None
-    if db_url and ('postgres' in db_url):
+    if db_url:
         try:
-            if db_url.startswith('postgres://'):
-                db_url = db_url.replace('postgres://', 'postgresql://', 1)
             db = psycopg2.connect(db_url, cursor_factory=DictCursor, connect_timeout=10)
         except Exception as e:
             print(f"[ERROR] Initialization connection failed: {e}")
+            if raise_errors:
+                raise
     
     if not db:
-        db_path = app.config.get('DATABASE', 'student_os.db')
-        db = sqlite3.connect(db_path)
-        db.row_factory = sqlite3.Row
+        db = connect_sqlite(app.config.get('DATABASE', 'student_os.db'))
 
-    is_sqlite = hasattr(db, 'row_factory')
-    
+    from migrations import run_migrations
     try:
-        # Fast-path check
-        with db_cursor(db) as cursor:
-            if is_sqlite:
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='schools'")
-            else:
-                cursor.execute("SELECT 1 FROM information_schema.tables WHERE table_name='schools'")
-            
-            if cursor.fetchone():
-                print("[INFO] Database schema already exists, skipping full creation.")
-            else:
-                print("[START] Creating database schema...")
-                with app.open_resource('schema.sql', mode='r') as f:
-                    sql_script = f.read()
-                    if is_sqlite:
-                        sql_script = sql_script.replace('SERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
-                        for statement in sql_script.split(';'):
-                            if statement.strip():
-                                try:
-                                    cursor.execute(statement)
-                                except Exception as e:
-                                    print(f"[WARN] Schema statement skipped: {e}")
-                    else:
-                        cursor.execute(sql_script)
+        applied = run_migrations(db)
+        if applied:
+            print(f"[OK] Applied {len(applied)} database migration(s).")
+            if isinstance(db, sqlite3.Connection):
+                # SQLite has no autovacuum-style ANALYZE; without stats the planner
+                # picks the school_id-only indexes over the covering ones.
+                db.execute(f'PRAGMA analysis_limit = {SQLITE_ANALYSIS_LIMIT}')
+                db.execute('ANALYZE')
                 db.commit()
-
-        # Migration system
-        print("[MIGRATE] Checking for required migrations...")
-
-        # Universal: account email linking + verification table (any role, incl. admin)
-        with db_cursor(db) as cursor:
-            if is_sqlite:
-                cursor.execute('''CREATE TABLE IF NOT EXISTS user_emails (
-                    user_id INTEGER PRIMARY KEY,
-                    email TEXT NOT NULL,
-                    is_verified INTEGER DEFAULT 0,
-                    verification_token TEXT,
-                    token_created_at TIMESTAMP,
-                    verified_at TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )''')
-            else:
-                cursor.execute('''CREATE TABLE IF NOT EXISTS user_emails (
-                    user_id INTEGER PRIMARY KEY REFERENCES users(id),
-                    email TEXT NOT NULL,
-                    is_verified BOOLEAN DEFAULT FALSE,
-                    verification_token TEXT,
-                    token_created_at TIMESTAMP,
-                    verified_at TIMESTAMP
-                )''')
-        db.commit()
-
-        with db_cursor(db) as cursor:
-            if is_sqlite:
-                cursor.execute("PRAGMA table_info(student_details)")
-                cols = [row[1] for row in cursor.fetchall()]
-                if 'classroom_id' not in cols:
-                    cursor.execute("ALTER TABLE student_details ADD COLUMN classroom_id INTEGER REFERENCES classrooms(id)")
-                
-                tables = ['users', 'courses', 'classrooms', 'enrollments', 'grades', 'attendance', 
-                         'assignments', 'submissions', 'notifications', 'messages', 'remarks', 
-                         'student_details', 'teacher_details', 'exam_assets', 'predicted_topics', 
-                         'predicted_questions', 'revision_plans', 'schools']
-                
-                for table in tables:
-                    cursor.execute(f"PRAGMA table_info({table})")
-                    current_cols = [row[1] for row in cursor.fetchall()]
-                    if 'school_id' not in current_cols and table != 'schools':
-                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN school_id INTEGER DEFAULT 1 REFERENCES schools(id)")
-                    if 'created_at' not in current_cols:
-                        try:
-                            cursor.execute(f"ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP")
-                            cursor.execute(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
-                        except: pass
-            else:
-                tables = ['users', 'courses', 'classrooms', 'enrollments', 'grades', 'attendance', 
-                         'assignments', 'submissions', 'notifications', 'messages', 'remarks', 
-                         'student_details', 'teacher_details', 'exam_assets', 'predicted_topics', 
-                         'predicted_questions', 'revision_plans']
-                
-                migration_sql = "DO $$ BEGIN "
-                migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='student_details' AND column_name='classroom_id') THEN ALTER TABLE student_details ADD COLUMN classroom_id INTEGER REFERENCES classrooms(id); END IF; "
-                for table in tables:
-                    migration_sql += f"IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table}' AND column_name='school_id') THEN ALTER TABLE {table} ADD COLUMN school_id INTEGER DEFAULT 1 REFERENCES schools(id); END IF; "
-                    migration_sql += f"IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table}' AND column_name='created_at') THEN ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP; END IF; "
-                migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='created_at') THEN ALTER TABLE schools ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP; END IF; "
-                migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='teacher_details' AND column_name='status') THEN ALTER TABLE teacher_details ADD COLUMN status TEXT DEFAULT 'Active'; END IF; "
-                migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='enabled_features') THEN ALTER TABLE schools ADD COLUMN enabled_features TEXT DEFAULT 'classrooms,admissions,staff_management,courses,grades,attendance,exam_predictor,messages,group_chat'; END IF; "
-                migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='academic_session') THEN ALTER TABLE schools ADD COLUMN academic_session TEXT DEFAULT '2023-24'; END IF; "
-                migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='support_email') THEN ALTER TABLE schools ADD COLUMN support_email TEXT; END IF; "
-                migration_sql += "UPDATE schools SET enabled_features = 'classrooms,admissions,staff_management,courses,grades,attendance,exam_predictor,messages,group_chat' WHERE enabled_features IS NULL OR enabled_features = 'exam_predictor,group_chat'; "
-                migration_sql += " END $$;"
-                cursor.execute(migration_sql)
-        
-        # SQLite migration for enabled_features
-        if is_sqlite:
-            with db_cursor(db) as cursor:
-                cursor.execute("PRAGMA table_info(schools)")
-                cols = [row[1] for row in cursor.fetchall()]
-                if 'enabled_features' not in cols:
-                    cursor.execute("ALTER TABLE schools ADD COLUMN enabled_features TEXT DEFAULT 'classrooms,admissions,staff_management,courses,grades,attendance,exam_predictor,messages,group_chat'")
-                if 'academic_session' not in cols:
-                    cursor.execute("ALTER TABLE schools ADD COLUMN academic_session TEXT DEFAULT '2023-24'")
-                if 'support_email' not in cols:
-                    cursor.execute("ALTER TABLE schools ADD COLUMN support_email TEXT")
-                
-                # Data Migration to ensure existing schools have all features active
-                cursor.execute("UPDATE schools SET enabled_features = 'classrooms,admissions,staff_management,courses,grades,attendance,exam_predictor,messages,group_chat' WHERE enabled_features IS NULL OR enabled_features = 'exam_predictor,group_chat'")
-
-        
-        db.commit()
-        print("[OK] Database migrations complete.")
+        else:
+            print("[OK] Database schema is up to date.")
+        return applied
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"[WARN] Initialization/Migration failed: {e}")
+        return []
     finally:
-        if db:
-            db.close()
-
-
+        db.close()
@@ -2,8 +2,10 @@ from flask_mail import Mail
 from flask_babel import Babel
 from flask_wtf.csrf import CSRFProtect
 from flask_login import LoginManager
+from cache import Cache
 
 mail = Mail()
 babel = Babel()
 csrf = CSRFProtect()
 login_manager = LoginManager()
+cache = Cache()
@@ -1,6 +1,110 @@
 import os
+import threading
+
+from cpu_limits import available_cpus
 
 # Render sets the PORT environment variable to 10000 by default
 port = os.getenv("PORT", "10000")
 bind = f"0.0.0.0:{port}"
-workers = 1
+
+# Workers scale with the CPUs the container may use (its cgroup quota and
+# affinity, not the host's core count): gunicorn's 2 x CPUs + 1, capped at
+# GUNICORN_MAX_WORKERS because each worker is a full copy of the app (~100 MB)
+# with its own pool of up to DB_POOL_MAX PostgreSQL connections. WEB_CONCURRENCY
+# pins an exact count, as on Render/Heroku; set it on small-memory plans.
+#
+# The login throttle, migrations and job queue are shared through the
+# database, but some caches are per worker: a write is seen at once only by
+# the worker that made it, and by the others once their entry expires --
+# school rows within SCHOOL_CACHE_TTL, and signed-in users (role changes,
+# deletions) and dashboard widgets within USER_CACHE_TTL/DASHBOARD_CACHE_TTL
+# unless CACHE_URL puts them on a shared server.
+workers = int(os.getenv("WEB_CONCURRENCY", min(2 * available_cpus() + 1,
+                                               int(os.getenv("GUNICORN_MAX_WORKERS", "8")))))
+# Threads overlap DB and mail I/O within a worker.
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# GUNICORN_WORKER_CLASS=gevent runs each request in a greenlet instead: one
+# worker then holds up to worker_connections requests waiting on PostgreSQL,
+# SMTP or the Brevo API (requires gevent and psycogreen; threads is ignored).
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Recycle workers now and then so slow leaks (PDF/Excel libraries) can't accumulate.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    # Migrations, admin bootstrap and optional demo seeding run once here, in
+    # the master, before any worker forks -- so no request ever pays for them.
+    if worker_class == "gevent":
+        # Importing the app here would load ssl and psycopg2 into the master
+        # before gevent can patch them in the workers; initialize in a child.
+        import subprocess
+        import sys
+        subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init"], check=False)
+        return
+    from app import startup_init
+    from db import close_pool
+    startup_init()
+    # Don't let workers inherit the master's sockets; each builds its own pool.
+    close_pool()
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        # gevent patches sockets, so SMTP and HTTP calls already yield; psycopg2
+        # is C code and needs a wait callback to do the same.
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        if not os.getenv("DATABASE_URL"):
+            server.log.warning("gevent workers on SQLite: queries block the whole worker; use PostgreSQL.")
+
+
+# Background job workers (jobs.py) started alongside the web workers, for
+# single-container deploys with no separate `worker` process. They must see
+# the same UPLOAD_FOLDER as the web workers, which holds the finished files.
+# The master restarts any that exit, so a crash doesn't stall the queue.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "0"))
+JOB_WORKER_CHECK_INTERVAL = 5
+_job_processes = []
+_stopping = threading.Event()
+_job_lock = threading.Lock()
+
+
+def _start_job_worker():
+    import subprocess
+    import sys
+    return subprocess.Popen([sys.executable, "-m", "flask", "--app", "app", "worker"])
+
+
+def _supervise_job_workers(server):
+    # Checking only every few seconds also spaces out restarts of a worker that keeps crashing.
+    while not _stopping.wait(JOB_WORKER_CHECK_INTERVAL):
+        with _job_lock:
+            for i, process in enumerate(_job_processes):
+                if process.poll() is not None and not _stopping.is_set():
+                    # No exit code: the master reaps every child, so Popen only sees that it's gone.
+                    server.log.warning(f"Job worker {process.pid} exited; restarting it.")
+                    _job_processes[i] = _start_job_worker()
+
+
+def when_ready(server):
+    if not JOB_WORKERS:
+        return
+    for _ in range(JOB_WORKERS):
+        _job_processes.append(_start_job_worker())
+    threading.Thread(target=_supervise_job_workers, args=(server,), daemon=True).start()
+
+
+def on_exit(server):
+    # SIGTERM lets each worker finish the job in hand; unfinished ones are retried later.
+    with _job_lock:
+        _stopping.set()
+    for process in _job_processes:
+        process.terminate()
+    for process in _job_processes:
+        try:
+            process.wait(timeout)
+        except Exception:
+            process.kill()
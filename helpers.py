@@ -1,6 +1,8 @@
 import os
+from functools import lru_cache
 from werkzeug.utils import secure_filename
 import time
+from cache import TTLCache
 
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
 
@@ -29,6 +31,8 @@ def add_notification(db, user_id, message, n_type='info', school_id=1):
         cursor.execute('INSERT INTO notifications (user_id, message, type, school_id) VALUES (%s, %s, %s, %s)',
                    (user_id, message, n_type, school_id))
     db.commit()
+    from dashboard_cache import bump_dashboard_version
+    bump_dashboard_version(school_id, user_id, school_wide=False)
     
 def generate_credentials(full_name, role='student'):
     import secrets
@@ -110,3 +114,120 @@ def send_verification_email(user, email, token):
         mail.send(msg)
     except Exception as e:
         print(f"[Email Verification] Failed to send email to {email}: {e}")
+
+
+# --- Unread message counters ------------------------------------------------
+# unread_counters holds one row per (user, school). Callers adjust it with the
+# same cursor, inside the same transaction, as the messages write it mirrors.
+
+def add_unread(cursor, user_id, school_id, delta=1):
+    """Add `delta` to a recipient's unread counter (recipient 0, group chat, has none)."""
+    if not int(user_id):
+        return
+    cursor.execute('''
+        INSERT INTO unread_counters (user_id, school_id, unread) VALUES (%s, %s, %s)
+        ON CONFLICT (user_id, school_id) DO UPDATE SET unread = unread_counters.unread + excluded.unread
+    ''', (user_id, school_id, delta))
+
+
+def remove_unread(cursor, user_id, school_id, count):
+    """Subtract `count` messages just marked read, never going below zero."""
+    if count <= 0:
+        return
+    cursor.execute(
+        'UPDATE unread_counters SET unread = CASE WHEN unread > %s THEN unread - %s ELSE 0 END WHERE user_id = %s AND school_id = %s',
+        (count, count, user_id, school_id))
+
+
+def get_unread_count(cursor, user_id, school_id):
+    """A user's unread direct messages: one primary-key lookup."""
+    cursor.execute('SELECT unread FROM unread_counters WHERE user_id = %s AND school_id = %s', (user_id, school_id))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def reconcile_unread_counters(db):
+    """
+    Recompute every counter from the messages table and fix any that drifted.
+    Returns the number of counters corrected.
+    """
+    from db import db_cursor
+    with db_cursor(db) as cursor:
+        cursor.execute('''
+            SELECT recipient_id, school_id, COUNT(*) FROM messages
+            WHERE is_read = %s AND recipient_id != 0
+            GROUP BY recipient_id, school_id
+        ''', (False,))
+        actual = {(r[0], r[1]): r[2] for r in cursor.fetchall()}
+        cursor.execute('SELECT user_id, school_id, unread FROM unread_counters')
+        stored = {(r[0], r[1]): r[2] for r in cursor.fetchall()}
+
+        drifted = [(key, count) for key, count in actual.items() if stored.get(key) != count]
+        drifted += [(key, 0) for key, count in stored.items() if key not in actual and count != 0]
+        for (user_id, school_id), count in drifted:
+            cursor.execute('''
+                INSERT INTO unread_counters (user_id, school_id, unread) VALUES (%s, %s, %s)
+                ON CONFLICT (user_id, school_id) DO UPDATE SET unread = excluded.unread
+            ''', (user_id, school_id, count))
+    db.commit()
+    return len(drifted)
+
+
+# --- School (tenant) resolution -------------------------------------------
+
+# Keys: ('id', school_id) -> school dict, ('slug', slug) -> school id, or
+# NO_SCHOOL for a slug that doesn't exist (so stray subdomains don't query).
+school_cache = TTLCache(ttl=int(os.getenv('SCHOOL_CACHE_TTL', '300')), maxsize=1024)
+NO_SCHOOL = 0
+
+
+def _load_school(column, value):
+    from db import get_db, db_cursor
+    with db_cursor(get_db()) as cursor:
+        cursor.execute(f'SELECT * FROM schools WHERE {column} = %s', (value,))
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def get_school(school_id):
+    """The schools row for `school_id` as a dict (None if missing), cached for SCHOOL_CACHE_TTL."""
+    if not school_id:
+        return None
+    school = school_cache.get(('id', school_id))
+    if school is None:
+        school = _load_school('id', school_id)
+        if school:
+            school_cache.set(('id', school_id), school)
+    return school
+
+
+def get_school_by_slug(slug):
+    """The school whose subdomain slug is `slug`, or None. Misses are cached too."""
+    school_id = school_cache.get(('slug', slug))
+    if school_id is None:
+        school = _load_school('slug', slug)
+        if not school:
+            school_cache.set(('slug', slug), NO_SCHOOL)
+            return None
+        school_cache.set(('id', school['id']), school)
+        school_cache.set(('slug', slug), school['id'])
+        return school
+    return get_school(school_id) if school_id != NO_SCHOOL else None
+
+
+def invalidate_school(school_id=None, slug=None):
+    """Drop cached lookups after a write to the schools table."""
+    if school_id is not None:
+        school_cache.delete(('id', int(school_id)))
+    if slug is not None:
+        school_cache.delete(('slug', slug))
+
+
+@lru_cache(maxsize=256)
+def subdomain_slug(host):
+    """'slug' from 'slug.studentos.com[:port]', or None for bare/reserved hosts."""
+    parts = host.split(':')[0].split('.')
+    # Ignore common prefixes or TLD-only checks if needed
+    if len(parts) > 1 and parts[0] not in ['www', 'app', 'localhost', '127']:
+        return parts[0]
+    return None
@@ -0,0 +1,268 @@
+"""
+Background jobs for work too slow for a request: whole-school report ZIPs
+and Excel exports.
+
+Jobs live in the `jobs` table, so any number of worker processes (the
+`worker` Procfile entry, `flask --app app worker`, or JOB_WORKERS started by
+gunicorn) can share one queue. A route enqueues a job and returns its id at
+once; the browser polls /jobs/<id>/status and downloads the artifact, a
+file under UPLOAD_FOLDER/jobs, when it is done.
+
+Claiming a job sets run_after to a lease deadline (the longest job timeout
+plus a grace period), so a worker that dies mid-job only delays it: once
+the lease runs out another worker picks it up again. A job that raises or
+runs past its timeout is retried with exponential backoff until it has used
+max_attempts, then it is marked failed. Finished jobs and their files are
+swept after JOB_ARTIFACT_TTL seconds.
+
+Job kinds are registered where their work lives:
+
+    @job_kind('classroom_excel')
+    def classroom_excel_job(payload, output):
+        ...write the file to output...
+        return 'Grades.xlsx'   # download name
+"""
+import json
+import os
+import signal
+import socket
+import time
+from contextlib import contextmanager
+
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', '600'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))          # doubled after each failure
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+JOB_ARTIFACT_TTL = int(os.getenv('JOB_ARTIFACT_TTL', str(24 * 3600)))
+# Extra lease time on top of the timeout before another worker may take a job over.
+LEASE_GRACE = 60
+
+# kind -> (handler, timeout)
+JOB_KINDS = {}
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def job_kind(name, timeout=None):
+    """Register handler(payload, output) -> download name as the job kind `name`."""
+    def register(handler):
+        JOB_KINDS[name] = (handler, timeout or JOB_TIMEOUT)
+        return handler
+    return register
+
+
+def artifact_dir(app):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def artifact_path(app, job_id):
+    return os.path.join(artifact_dir(app), f'job_{job_id}')
+
+
+def enqueue(db, kind, payload, user_id, school_id, max_attempts=None):
+    """Queue a job and commit. Returns its id."""
+    from db import db_cursor
+    if kind not in JOB_KINDS:
+        raise ValueError(f'unknown job kind: {kind}')
+    now = time.time()
+    with db_cursor(db) as cursor:
+        cursor.execute('''
+            INSERT INTO jobs (kind, payload, status, attempts, max_attempts, run_after, user_id, school_id, created_at)
+            VALUES (%s, %s, 'queued', 0, %s, %s, %s, %s, %s)
+            RETURNING id
+        ''', (kind, json.dumps(payload), max_attempts or JOB_MAX_ATTEMPTS, now, user_id, school_id, now))
+        job_id = cursor.fetchone()[0]
+    db.commit()
+    return job_id
+
+
+def get_job(db, job_id):
+    from db import db_cursor
+    with db_cursor(db) as cursor:
+        cursor.execute('SELECT * FROM jobs WHERE id = %s', (job_id,))
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def claim_job(db, worker_id, now=None):
+    """
+    Take the oldest runnable job -- queued and due, or running with an
+    expired lease -- and commit the claim. Returns the job row or None.
+    """
+    from db import db_cursor
+    now = time.time() if now is None else now
+    is_sqlite = hasattr(db, 'row_factory')
+    # SQLite serialises writers, so the UPDATE alone is atomic there.
+    skip_locked = '' if is_sqlite else 'FOR UPDATE SKIP LOCKED'
+    # One lease for every kind: long enough for the slowest to hit its own timeout first.
+    lease = max([timeout for _, timeout in JOB_KINDS.values()] + [JOB_TIMEOUT]) + LEASE_GRACE
+    with db_cursor(db) as cursor:
+        cursor.execute(f'''
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = %s, run_after = %s
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status IN ('queued', 'running') AND run_after <= %s
+                ORDER BY run_after, id LIMIT 1 {skip_locked}
+            )
+            RETURNING *
+        ''', (worker_id, now + lease, now))
+        row = cursor.fetchone()
+        job = dict(row) if row else None
+    db.commit()
+    return job
+
+
+def _finish(db, job_id, **fields):
+    """Update the job row and commit. Returns False if the row is gone (its user was deleted)."""
+    from db import db_cursor
+    columns = ', '.join(f'{name} = %s' for name in fields)
+    with db_cursor(db) as cursor:
+        cursor.execute(f'UPDATE jobs SET {columns} WHERE id = %s', (*fields.values(), job_id))
+        updated = cursor.rowcount
+    db.commit()
+    return updated > 0
+
+
+@contextmanager
+def _time_limit(seconds):
+    """Raise JobTimeout in the block after `seconds` (main thread on Unix; otherwise a no-op)."""
+    try:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    except (AttributeError, ValueError):
+        # No SIGALRM (Windows) or not the main thread: the lease still bounds the job.
+        yield
+        return
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout('job ran past its timeout')
+
+
+def run_job(app, db, job):
+    """Run one claimed job, then record it as done, queued for a retry, or failed."""
+    job_id = job['id']
+    if job['attempts'] > job['max_attempts']:
+        # Reclaimed after its last attempt's lease ran out: that worker died or hung.
+        _finish(db, job_id, status='failed', error='worker lost; no attempts left', finished_at=time.time())
+        print(f"[ERROR] Job {job_id} ({job['kind']}) failed: worker lost")
+        return False
+
+    handler, timeout = JOB_KINDS[job['kind']]
+    path = artifact_path(app, job_id)
+    partial = path + '.part'
+    started = time.time()
+    try:
+        with _time_limit(timeout), open(partial, 'wb') as output:
+            download_name = handler(json.loads(job['payload']), output)
+        os.replace(partial, path)
+    except Exception as e:
+        db.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        error = f'{type(e).__name__}: {e}'
+        if job['attempts'] < job['max_attempts']:
+            delay = JOB_RETRY_DELAY * 2 ** (job['attempts'] - 1)
+            _finish(db, job_id, status='queued', run_after=time.time() + delay, error=error)
+            print(f"[WARN] Job {job_id} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay}s: {error}")
+        else:
+            _finish(db, job_id, status='failed', error=error, finished_at=time.time())
+            print(f"[ERROR] Job {job_id} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+        return False
+
+    if not _finish(db, job_id, status='done', artifact=os.path.basename(path), download_name=download_name,
+                   error=None, finished_at=time.time()):
+        # Deleted with its user while it ran; the file would never be swept.
+        os.remove(path)
+        return False
+    print(f"[OK] Job {job_id} ({job['kind']}) done in {time.time() - started:.1f}s")
+    return True
+
+
+def sweep_jobs(app, db, now=None):
+    """Delete finished jobs older than JOB_ARTIFACT_TTL along with their files. Returns the count."""
+    from db import db_cursor
+    now = time.time() if now is None else now
+    cutoff = now - JOB_ARTIFACT_TTL
+    # Selected first: on SQLite, db_cursor treats RETURNING id as an INSERT's lastrowid.
+    with db_cursor(db) as cursor:
+        cursor.execute("SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < %s", (cutoff,))
+        expired = [row[0] for row in cursor.fetchall()]
+        if expired:
+            cursor.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < %s", (cutoff,))
+    db.commit()
+    remove_artifacts(app, expired)
+    return len(expired)
+
+
+def remove_artifacts(app, job_ids):
+    """Remove the files of deleted jobs. Call it only once the delete has committed."""
+    for job_id in job_ids:
+        path = artifact_path(app, job_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def delete_user_jobs(cursor, user_id, school_id):
+    """
+    Delete a user's jobs ahead of deleting the user: jobs.user_id references
+    users, and nobody else may download them. Returns the deleted job ids;
+    pass them to remove_artifacts() after the caller commits, so a rollback
+    doesn't leave rows pointing at missing files.
+    """
+    cursor.execute('SELECT id FROM jobs WHERE user_id = %s AND school_id = %s', (user_id, school_id))
+    job_ids = [row[0] for row in cursor.fetchall()]
+    if job_ids:
+        cursor.execute('DELETE FROM jobs WHERE user_id = %s AND school_id = %s', (user_id, school_id))
+    return job_ids
+
+
+def work_once(app, worker_id=None):
+    """Claim and run at most one job. Returns False when the queue had nothing due."""
+    from db import get_db
+    # A fresh app context per job hands the connection back to the pool in between.
+    with app.app_context():
+        db = get_db()
+        job = claim_job(db, worker_id or f'{socket.gethostname()}:{os.getpid()}')
+        if job is None:
+            return False
+        run_job(app, db, job)
+        return True
+
+
+def run_worker(app, poll_interval=None):
+    """Process jobs until SIGTERM/SIGINT; the job in progress is allowed to finish."""
+    from db import get_db
+    poll_interval = JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"[INFO] Job worker {worker_id} started ({', '.join(sorted(JOB_KINDS))}).")
+    last_sweep = 0.0
+    while not stopping:
+        try:
+            if work_once(app, worker_id):
+                continue
+            if time.time() - last_sweep > 60:
+                with app.app_context():
+                    sweep_jobs(app, get_db())
+                last_sweep = time.time()
+        except Exception as e:
+            # Database unreachable and the like: back off rather than spin.
+            print(f"[ERROR] Job worker: {e}")
+        time.sleep(poll_interval)
+    print(f"[INFO] Job worker {worker_id} stopped.")
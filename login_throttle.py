@@ -0,0 +1,52 @@
+"""
+Brute-force guard for the login form, shared by every gunicorn worker.
+
+Attempts are counted per (username, ip) in the login_attempts table, in
+fixed windows of LOGIN_LOCKOUT_SECONDS starting at the first attempt. Each
+attempt is counted by one atomic upsert *before* the password is checked,
+so concurrent requests in different workers can't race past the limit: at
+most LOGIN_MAX_ATTEMPTS passwords are tried per key per window. A
+successful login clears the key.
+
+Expired windows are deleted whenever a new one opens, so the table only
+ever holds keys attempted within the last window.
+"""
+import os
+import time
+
+MAX_ATTEMPTS = int(os.getenv('LOGIN_MAX_ATTEMPTS', '5'))
+LOCKOUT_SECONDS = int(os.getenv('LOGIN_LOCKOUT_SECONDS', '300'))  # 5 minutes
+
+
+def reserve_attempt(db, key, now=None):
+    """
+    Count one login attempt for key and commit. Returns False when the key
+    has already used its MAX_ATTEMPTS for the current window.
+    """
+    from db import db_cursor
+    now = time.time() if now is None else now
+    window_start = now - LOCKOUT_SECONDS
+    with db_cursor(db) as cursor:
+        cursor.execute('''
+            INSERT INTO login_attempts (attempt_key, attempts, first_attempt_at)
+            VALUES (%s, 1, %s)
+            ON CONFLICT (attempt_key) DO UPDATE SET
+                attempts = CASE WHEN login_attempts.first_attempt_at < %s THEN 1
+                                ELSE login_attempts.attempts + 1 END,
+                first_attempt_at = CASE WHEN login_attempts.first_attempt_at < %s THEN excluded.first_attempt_at
+                                        ELSE login_attempts.first_attempt_at END
+            RETURNING attempts
+        ''', (key, now, window_start, window_start))
+        attempts = cursor.fetchone()[0]
+        if attempts == 1:
+            # A new window: sweep the ones that have run out.
+            cursor.execute('DELETE FROM login_attempts WHERE first_attempt_at < %s', (window_start,))
+    db.commit()
+    return attempts <= MAX_ATTEMPTS
+
+
+def clear_attempts(db, key):
+    from db import db_cursor
+    with db_cursor(db) as cursor:
+        cursor.execute('DELETE FROM login_attempts WHERE attempt_key = %s', (key,))
+    db.commit()
@@ -0,0 +1,320 @@
+"""
+Versioned schema migrations.
+
+Each step is (version, name, apply_fn) and must be idempotent. Applied
+versions are recorded in `schema_migrations`; on startup a single
+`MAX(version)` lookup decides which steps (if any) still need to run.
+
+Run them ahead of a deploy with:
+
+    flask --app app migrate
+"""
+import os
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+DEFAULT_FEATURES = 'classrooms,admissions,staff_management,courses,grades,attendance,exam_predictor,messages,group_chat'
+
+# Tables that gained school_id / created_at after the first release.
+SCHOOL_SCOPED_TABLES = ['users', 'courses', 'classrooms', 'enrollments', 'grades', 'attendance',
+                        'assignments', 'submissions', 'notifications', 'messages', 'remarks',
+                        'student_details', 'teacher_details', 'exam_assets', 'predicted_topics',
+                        'predicted_questions', 'revision_plans']
+
+# (index name, table, columns) -- every hot query filters on school_id plus
+# one of the owning ids, so the owning id leads and school_id follows.
+SCHOOL_SCOPED_INDEXES = [
+    ('idx_users_school_role', 'users', 'school_id, role'),
+    ('idx_classrooms_teacher', 'classrooms', 'teacher_id, school_id'),
+    ('idx_courses_teacher', 'courses', 'teacher_id, school_id'),
+    ('idx_courses_school', 'courses', 'school_id'),
+    ('idx_enrollments_course', 'enrollments', 'course_id, student_id'),
+    ('idx_grades_student_course', 'grades', 'student_id, course_id, school_id'),
+    ('idx_grades_course', 'grades', 'course_id'),
+    ('idx_grades_school_recorded', 'grades', 'school_id, date_recorded'),
+    ('idx_attendance_student_course_date', 'attendance', 'student_id, course_id, date, school_id'),
+    ('idx_attendance_course', 'attendance', 'course_id'),
+    ('idx_attendance_school_status', 'attendance', 'school_id, status'),
+    ('idx_assignments_course', 'assignments', 'course_id, school_id'),
+    ('idx_submissions_assignment', 'submissions', 'assignment_id, school_id'),
+    ('idx_submissions_student', 'submissions', 'student_id'),
+    ('idx_notifications_user', 'notifications', 'user_id, school_id, created_at'),
+    ('idx_messages_recipient_unread', 'messages', 'recipient_id, is_read, school_id'),
+    ('idx_messages_conversation', 'messages', 'sender_id, recipient_id, school_id'),
+    ('idx_remarks_student', 'remarks', 'student_id, school_id'),
+    ('idx_student_details_classroom', 'student_details', 'classroom_id, school_id'),
+    ('idx_student_details_school', 'student_details', 'school_id'),
+    ('idx_teacher_details_school', 'teacher_details', 'school_id'),
+    ('idx_exam_assets_student', 'exam_assets', 'student_id, school_id'),
+    ('idx_predicted_topics_student', 'predicted_topics', 'student_id, school_id'),
+    ('idx_predicted_questions_topic', 'predicted_questions', 'topic_id'),
+    ('idx_revision_plans_student', 'revision_plans', 'student_id, school_id'),
+]
+
+
+def _sqlite_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _baseline_schema(cursor, is_sqlite):
+    """
+    Version 0: everything init_db used to re-check on every boot.
+
+    Creates the base schema on an empty database, then brings older
+    databases up to date (user_emails, school_id/created_at columns,
+    school settings columns, enabled_features backfill).
+    """
+    if is_sqlite:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='schools'")
+    else:
+        cursor.execute("SELECT 1 FROM information_schema.tables WHERE table_name='schools'")
+
+    if not cursor.fetchone():
+        print("[START] Creating database schema...")
+        with open(SCHEMA_PATH) as f:
+            sql_script = f.read()
+        if is_sqlite:
+            sql_script = sql_script.replace('SERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+            for statement in sql_script.split(';'):
+                if statement.strip():
+                    try:
+                        cursor.execute(statement)
+                    except Exception as e:
+                        print(f"[WARN] Schema statement skipped: {e}")
+        else:
+            cursor.execute(sql_script)
+
+    # Universal: account email linking + verification table (any role, incl. admin)
+    if is_sqlite:
+        cursor.execute('''CREATE TABLE IF NOT EXISTS user_emails (
+            user_id INTEGER PRIMARY KEY,
+            email TEXT NOT NULL,
+            is_verified INTEGER DEFAULT 0,
+            verification_token TEXT,
+            token_created_at TIMESTAMP,
+            verified_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''')
+    else:
+        cursor.execute('''CREATE TABLE IF NOT EXISTS user_emails (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id),
+            email TEXT NOT NULL,
+            is_verified BOOLEAN DEFAULT FALSE,
+            verification_token TEXT,
+            token_created_at TIMESTAMP,
+            verified_at TIMESTAMP
+        )''')
+
+    if is_sqlite:
+        if 'classroom_id' not in _sqlite_columns(cursor, 'student_details'):
+            cursor.execute("ALTER TABLE student_details ADD COLUMN classroom_id INTEGER REFERENCES classrooms(id)")
+
+        for table in SCHOOL_SCOPED_TABLES + ['schools']:
+            current_cols = _sqlite_columns(cursor, table)
+            if 'school_id' not in current_cols and table != 'schools':
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN school_id INTEGER DEFAULT 1 REFERENCES schools(id)")
+            if 'created_at' not in current_cols:
+                try:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP")
+                    cursor.execute(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+                except: pass
+
+        cols = _sqlite_columns(cursor, 'schools')
+        if 'enabled_features' not in cols:
+            cursor.execute(f"ALTER TABLE schools ADD COLUMN enabled_features TEXT DEFAULT '{DEFAULT_FEATURES}'")
+        if 'academic_session' not in cols:
+            cursor.execute("ALTER TABLE schools ADD COLUMN academic_session TEXT DEFAULT '2023-24'")
+        if 'support_email' not in cols:
+            cursor.execute("ALTER TABLE schools ADD COLUMN support_email TEXT")
+    else:
+        migration_sql = "DO $$ BEGIN "
+        migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='student_details' AND column_name='classroom_id') THEN ALTER TABLE student_details ADD COLUMN classroom_id INTEGER REFERENCES classrooms(id); END IF; "
+        for table in SCHOOL_SCOPED_TABLES:
+            migration_sql += f"IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table}' AND column_name='school_id') THEN ALTER TABLE {table} ADD COLUMN school_id INTEGER DEFAULT 1 REFERENCES schools(id); END IF; "
+            migration_sql += f"IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table}' AND column_name='created_at') THEN ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP; END IF; "
+        migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='created_at') THEN ALTER TABLE schools ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP; END IF; "
+        migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='teacher_details' AND column_name='status') THEN ALTER TABLE teacher_details ADD COLUMN status TEXT DEFAULT 'Active'; END IF; "
+        migration_sql += f"IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='enabled_features') THEN ALTER TABLE schools ADD COLUMN enabled_features TEXT DEFAULT '{DEFAULT_FEATURES}'; END IF; "
+        migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='academic_session') THEN ALTER TABLE schools ADD COLUMN academic_session TEXT DEFAULT '2023-24'; END IF; "
+        migration_sql += "IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='schools' AND column_name='support_email') THEN ALTER TABLE schools ADD COLUMN support_email TEXT; END IF; "
+        migration_sql += " END $$;"
+        cursor.execute(migration_sql)
+
+    # Data Migration to ensure existing schools have all features active
+    cursor.execute(f"UPDATE schools SET enabled_features = '{DEFAULT_FEATURES}' WHERE enabled_features IS NULL OR enabled_features = 'exam_predictor,group_chat'")
+
+
+def _create_school_scoped_indexes(cursor, is_sqlite):
+    for name, table, columns in SCHOOL_SCOPED_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def _create_unread_counters(cursor, is_sqlite):
+    """
+    Version 2: per-(user, school) unread message counter, maintained by
+    messages.send_message / messages.chat and backfilled from messages.
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS unread_counters (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        school_id INTEGER NOT NULL REFERENCES schools(id),
+        unread INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, school_id)
+    )''')
+    cursor.execute('DELETE FROM unread_counters')
+    cursor.execute('''
+        INSERT INTO unread_counters (user_id, school_id, unread)
+        SELECT recipient_id, school_id, COUNT(*) FROM messages
+        WHERE is_read = %s AND recipient_id != 0
+        GROUP BY recipient_id, school_id
+    ''', (False,))
+
+
+def _create_school_stats(cursor, is_sqlite):
+    """
+    Version 3: the per-school dashboard rollup (see school_stats.py), backfilled
+    for every school, plus the index behind the "new admissions" feed.
+    """
+    from school_stats import refresh_school_stats
+    cursor.execute('''CREATE TABLE IF NOT EXISTS school_stats (
+        school_id INTEGER PRIMARY KEY REFERENCES schools(id),
+        grade_count INTEGER NOT NULL DEFAULT 0,
+        grade_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+        present_count INTEGER NOT NULL DEFAULT 0,
+        absent_count INTEGER NOT NULL DEFAULT 0,
+        late_count INTEGER NOT NULL DEFAULT 0,
+        teacher_count INTEGER NOT NULL DEFAULT 0,
+        student_count INTEGER NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP
+    )''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_student_details_school_created ON student_details (school_id, created_at)')
+    cursor.execute('SELECT id FROM schools')
+    for row in cursor.fetchall():
+        refresh_school_stats(cursor, row[0])
+
+
+def _create_student_dashboard_indexes(cursor, is_sqlite):
+    """
+    Version 4: covering indexes for the student dashboard payload, so the
+    per-course averages and the attendance split are read from the index alone.
+    """
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_grades_student_scores ON grades (student_id, school_id, course_id, score)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_student_status ON attendance (student_id, school_id, status)')
+
+
+def _create_login_attempts(cursor, is_sqlite):
+    """
+    Version 5: the shared login throttle (see login_throttle.py), replacing
+    the per-worker dict in routes/auth.py. Times are epoch seconds.
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS login_attempts (
+        attempt_key TEXT PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        first_attempt_at DOUBLE PRECISION NOT NULL
+    )''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_login_attempts_first_attempt ON login_attempts (first_attempt_at)')
+
+
+def _create_jobs(cursor, is_sqlite):
+    """
+    Version 6: the background job queue (see jobs.py). run_after is when a
+    queued job is due or a running job's lease ends; times are epoch seconds.
+    """
+    id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT' if is_sqlite else 'id SERIAL PRIMARY KEY'
+    cursor.execute(f'''CREATE TABLE IF NOT EXISTS jobs (
+        {id_column},
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        run_after DOUBLE PRECISION NOT NULL,
+        worker TEXT,
+        artifact TEXT,
+        download_name TEXT,
+        error TEXT,
+        user_id INTEGER REFERENCES users(id),
+        school_id INTEGER REFERENCES schools(id),
+        created_at DOUBLE PRECISION NOT NULL,
+        finished_at DOUBLE PRECISION
+    )''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)')
+
+
+def _widen_school_stats_grade_total(cursor, is_sqlite):
+    """
+    Version 7: school_stats.grade_total as DOUBLE PRECISION on databases that
+    ran version 3 when it declared REAL. That is single precision (about six
+    significant digits) on PostgreSQL, so a school's running score total
+    drifts from the grades it sums. SQLite's REAL is already a double.
+    """
+    if not is_sqlite:
+        cursor.execute('ALTER TABLE school_stats ALTER COLUMN grade_total TYPE DOUBLE PRECISION')
+
+
+MIGRATIONS = [
+    (0, 'baseline_schema', _baseline_schema),
+    (1, 'school_scoped_indexes', _create_school_scoped_indexes),
+    (2, 'unread_counters', _create_unread_counters),
+    (3, 'school_stats', _create_school_stats),
+    (4, 'student_dashboard_indexes', _create_student_dashboard_indexes),
+    (5, 'login_attempts', _create_login_attempts),
+    (6, 'jobs', _create_jobs),
+    (7, 'school_stats_grade_total_double', _widen_school_stats_grade_total),
+]
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+
+def current_version(db):
+    """Highest applied version, or None on a database that predates schema_migrations."""
+    # Probed on the raw cursor so a missing table on first boot isn't logged as an error.
+    cursor = db.cursor()
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_migrations')
+        return cursor.fetchone()[0]
+    except Exception:
+        db.rollback()
+        return None
+    finally:
+        cursor.close()
+
+
+def pending_migrations(db):
+    version = current_version(db)
+    return [m for m in MIGRATIONS if version is None or m[0] > version]
+
+
+def run_migrations(db):
+    """Apply every migration newer than the recorded version. Returns the versions applied."""
+    from db import db_cursor, advisory_lock, LOCK_MIGRATIONS
+    is_sqlite = hasattr(db, 'row_factory')
+
+    if not pending_migrations(db):
+        return []
+
+    # Several instances may deploy at once; the first applies, the rest find nothing pending.
+    with advisory_lock(db, LOCK_MIGRATIONS):
+        pending = pending_migrations(db)
+        if not pending:
+            return []
+
+        with db_cursor(db) as cursor:
+            _ensure_migrations_table(cursor)
+        db.commit()
+
+        applied = []
+        for version, name, apply in pending:
+            print(f"[MIGRATE] Applying {version:04d}_{name}...")
+            with db_cursor(db) as cursor:
+                apply(cursor, is_sqlite)
+                cursor.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (version, name))
+            db.commit()
+            applied.append(version)
+        return applied
@@ -1,5 +1,28 @@
+import os
 from flask_login import UserMixin
 from werkzeug.security import check_password_hash
+from cache import TTLCache
+
+# user id -> the users row fields, so authenticating a request (flask-login's
+# user_loader) normally costs no query. Writers to a user's role, school,
+# password or existence call invalidate_user(). With CACHE_URL the entries
+# live in the shared `cache` extension, so that reaches every worker at once;
+# otherwise each worker keeps its own and the others serve the old row (a
+# deleted or demoted user included) for up to USER_CACHE_TTL seconds.
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+identity_cache = TTLCache(ttl=USER_CACHE_TTL, maxsize=4096)
+
+
+def _shared_cache():
+    from extensions import cache
+    return cache if cache.shared else None
+
+
+def invalidate_user(user_id):
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(f'user:{user_id}')
+    identity_cache.delete(str(user_id))
 
 class User(UserMixin):
     def __init__(self, id, username, password_hash, role, school_id):
@@ -23,6 +46,31 @@ class User(UserMixin):
                 return User(user['id'], user['username'], user['password_hash'], user['role'], user['school_id'])
         return None
 
+    @staticmethod
+    def get_cached(user_id):
+        """
+        User.get through the identity cache (used by the user_loader). The
+        password hash is left out of the cache, so these users can't
+        check_password(); login loads the full row with get_by_username.
+        """
+        shared = _shared_cache()
+        if shared is not None:
+            fields = shared.get(f'user:{user_id}')
+        else:
+            fields = identity_cache.get(str(user_id))
+        if fields is None:
+            user = User.get(user_id)
+            if user is None:
+                return None
+            fields = (user.id, user.username, user.role, user.school_id)
+            if shared is not None:
+                shared.set(f'user:{user_id}', fields, ttl=USER_CACHE_TTL)
+            else:
+                identity_cache.set(str(user_id), fields)
+        # A fresh object per request: nothing mutable is shared between threads.
+        user_id, username, role, school_id = fields
+        return User(user_id, username, None, role, school_id)
+
     @staticmethod
     def get_by_username(username):
         from db import get_db, db_cursor
@@ -4,109 +4,221 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.units import inch
 import io
+import itertools
 import os
+import threading
+import zipfile
+
+from cpu_limits import available_cpus
+
+# Processes used to render large batches of report cards (0 = one per available CPU).
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '0')) or available_cpus()
+# Below this many cards, starting the pool costs more than it saves.
+REPORT_POOL_MIN_CARDS = int(os.getenv('REPORT_POOL_MIN_CARDS', '16'))
+
+class ReportCardRenderer:
+    """
+    Renders report card PDFs for one institution.
+
+    The stylesheet, paragraph and table styles, and the flowables that are
+    the same on every card (title, section headings, signature block) are
+    built once here; render() only builds the student-specific tables.
+    Flowables keep layout state while a document is built, so a renderer
+    must not be shared between threads -- use get_renderer().
+    """
+
+    def __init__(self, university_name):
+        self.university_name = university_name
+        styles = getSampleStyleSheet()
+        self.normal = styles['Normal']
+
+        title_style = ParagraphStyle(
+            'TitleStyle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor("#4F46E5"), # Brand Primary
+            alignment=1, # Center
+            spaceAfter=20
+        )
+        self.header = [
+            Paragraph(university_name, title_style),
+            Paragraph("Official Academic Report Card", styles['Heading2']),
+            Spacer(1, 0.25 * inch),
+        ]
+        self.performance_heading = [Paragraph("Academic Performance", styles['Heading3']), Spacer(1, 0.1 * inch)]
+        self.metrics_heading = [Paragraph("Operational Metrics", styles['Heading3']), Spacer(1, 0.1 * inch)]
+        self.remarks_heading = [Paragraph("Teacher Evaluation & Remarks", styles['Heading3']), Spacer(1, 0.1 * inch)]
+        self.footer = [
+            Spacer(1, 1 * inch),
+            Paragraph("__________________________", styles['Normal']),
+            Paragraph("Dean of Academics Signature", styles['Normal']),
+        ]
+
+        self.info_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TEXTCOLOR', (0,0), (0,-1), colors.grey),
+            ('TEXTCOLOR', (2,0), (2,-1), colors.grey),
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 10),
+        ])
+        self.grades_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#F3F4F6")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#FAFAFA")]),
+        ])
+        self.attendance_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ])
+        self.remarks_style = TableStyle([
+            ('BACKGROUND', (0,0), (-1,-1), colors.HexColor("#F9FAFB")),
+            ('BOX', (0,0), (-1,-1), 1, colors.HexColor("#E5E7EB")),
+            ('PADDING', (0,0), (-1,-1), 20),
+        ])
+
+    def render(self, student_data, grades_data, attendance_summary, remarks_data):
+        """One student's report card as a BytesIO positioned at the start."""
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
+        elements = list(self.header)
+
+        # Student Info Table
+        data = [
+            ["Student Name:", student_data['username'], "Role:", student_data['role'].capitalize()],
+            ["Report Term:", remarks_data.get('term', 'Annual'), "Date Generated:", "Jan 2026"]
+        ]
+        t = Table(data, colWidths=[1.5*inch, 2*inch, 1*inch, 1.5*inch])
+        t.setStyle(self.info_style)
+        elements.append(t)
+        elements.append(Spacer(1, 0.5 * inch))
+
+        # Grades Table
+        elements.extend(self.performance_heading)
+        grade_table_data = [["Course Name", "Subject Mastery", "Status"]]
+        for g in grades_data:
+            grade_table_data.append([g['name'], f"{g['avg_score']}%", "Pass" if g['avg_score'] >= 50 else "Fail"])
+        gt = Table(grade_table_data, colWidths=[3*inch, 2*inch, 1*inch])
+        gt.setStyle(self.grades_style)
+        elements.append(gt)
+        elements.append(Spacer(1, 0.4 * inch))
+
+        # Attendance & Stats
+        elements.extend(self.metrics_heading)
+        total_logs = sum([row['count'] for row in attendance_summary])
+        present_logs = next((row['count'] for row in attendance_summary if row['status'] == 'Present'), 0)
+        attendance_rate = f"{int((present_logs/total_logs)*100)}%" if total_logs > 0 else "N/A"
+        att_data = [
+            ["Attendance Rate:", attendance_rate, "Total Sessions:", str(total_logs)]
+        ]
+        at = Table(att_data, colWidths=[1.5*inch, 1*inch, 1.5*inch, 1*inch])
+        at.setStyle(self.attendance_style)
+        elements.append(at)
+        elements.append(Spacer(1, 0.5 * inch))
+
+        # Teacher Remarks Section
+        elements.extend(self.remarks_heading)
+        remarks_box = [
+            [Paragraph(f"<b>General Remarks:</b><br/>{remarks_data.get('remarks', 'No remarks provided.')}", self.normal)],
+            [Spacer(1, 0.1 * inch)],
+            [Paragraph(f"<b>Areas for Improvement:</b><br/>{remarks_data.get('improvement_areas', 'Continue pushing for excellence.')}", self.normal)]
+        ]
+        rt = Table(remarks_box, colWidths=[6*inch])
+        rt.setStyle(self.remarks_style)
+        elements.append(rt)
+
+        elements.extend(self.footer)
+        doc.build(elements)
+        buffer.seek(0)
+        return buffer
+
+
+_renderers = threading.local()
+
+
+def get_renderer(university_name):
+    """This thread's ReportCardRenderer for `university_name`, built on first use."""
+    cache = getattr(_renderers, 'by_name', None)
+    if cache is None:
+        cache = _renderers.by_name = {}
+    renderer = cache.get(university_name)
+    if renderer is None:
+        renderer = cache[university_name] = ReportCardRenderer(university_name)
+    return renderer
+
 
 def generate_student_report_card(university_name, student_data, grades_data, attendance_summary, remarks_data):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
-    
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Title / Header
-    title_style = ParagraphStyle(
-        'TitleStyle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor("#4F46E5"), # Brand Primary
-        alignment=1, # Center
-        spaceAfter=20
-    )
-    elements.append(Paragraph(university_name, title_style))
-    elements.append(Paragraph("Official Academic Report Card", styles['Heading2']))
-    elements.append(Spacer(1, 0.25 * inch))
-
-    # Student Info Table
-    data = [
-        ["Student Name:", student_data['username'], "Role:", student_data['role'].capitalize()],
-        ["Report Term:", remarks_data.get('term', 'Annual'), "Date Generated:", "Jan 2026"]
-    ]
-    t = Table(data, colWidths=[1.5*inch, 2*inch, 1*inch, 1.5*inch])
-    t.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0,0), (0,-1), colors.grey),
-        ('TEXTCOLOR', (2,0), (2,-1), colors.grey),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 10),
-    ]))
-    elements.append(t)
-    elements.append(Spacer(1, 0.5 * inch))
-
-    # Academic Performance Header
-    elements.append(Paragraph("Academic Performance", styles['Heading3']))
-    elements.append(Spacer(1, 0.1 * inch))
-
-    # Grades Table
-    grade_table_data = [["Course Name", "Subject Mastery", "Status"]]
-    for g in grades_data:
-        grade_table_data.append([g['name'], f"{g['avg_score']}%", "Pass" if g['avg_score'] >= 50 else "Fail"])
-
-    gt = Table(grade_table_data, colWidths=[3*inch, 2*inch, 1*inch])
-    gt.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#F3F4F6")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#FAFAFA")]),
-    ]))
-    elements.append(gt)
-    elements.append(Spacer(1, 0.4 * inch))
-
-    # Attendance & Stats
-    elements.append(Paragraph("Operational Metrics", styles['Heading3']))
-    elements.append(Spacer(1, 0.1 * inch))
-    
-    total_logs = sum([row['count'] for row in attendance_summary])
-    present_logs = next((row['count'] for row in attendance_summary if row['status'] == 'Present'), 0)
-    attendance_rate = f"{int((present_logs/total_logs)*100)}%" if total_logs > 0 else "N/A"
-
-    att_data = [
-        ["Attendance Rate:", attendance_rate, "Total Sessions:", str(total_logs)]
-    ]
-    at = Table(att_data, colWidths=[1.5*inch, 1*inch, 1.5*inch, 1*inch])
-    at.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-    ]))
-    elements.append(at)
-    elements.append(Spacer(1, 0.5 * inch))
-
-    # Teacher Remarks Section
-    elements.append(Paragraph("Teacher Evaluation & Remarks", styles['Heading3']))
-    elements.append(Spacer(1, 0.1 * inch))
-    
-    remarks_box = [
-        [Paragraph(f"<b>General Remarks:</b><br/>{remarks_data.get('remarks', 'No remarks provided.')}", styles['Normal'])],
-        [Spacer(1, 0.1 * inch)],
-        [Paragraph(f"<b>Areas for Improvement:</b><br/>{remarks_data.get('improvement_areas', 'Continue pushing for excellence.')}", styles['Normal'])]
-    ]
-    rt = Table(remarks_box, colWidths=[6*inch])
-    rt.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,-1), colors.HexColor("#F9FAFB")),
-        ('BOX', (0,0), (-1,-1), 1, colors.HexColor("#E5E7EB")),
-        ('PADDING', (0,0), (-1,-1), 20),
-    ]))
-    elements.append(rt)
-
-    # Footer
-    elements.append(Spacer(1, 1 * inch))
-    elements.append(Paragraph("__________________________", styles['Normal']))
-    elements.append(Paragraph("Dean of Academics Signature", styles['Normal']))
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    return get_renderer(university_name).render(student_data, grades_data, attendance_summary, remarks_data)
+
+
+def _render_card(university_name, card):
+    # Runs in pool processes too: each builds its renderer once, on its first card.
+    pdf_buffer = get_renderer(university_name).render(card['student'], card['grades'], card['attendance'], card['remarks'])
+    return f"Report_Card_{card['student']['username']}.pdf", pdf_buffer.getvalue()
+
+
+def render_report_cards(university_name, cards, workers=REPORT_WORKERS):
+    """
+    Yield (filename, pdf_bytes) for each card in `cards` (dicts of student,
+    grades, attendance and remarks) as it finishes rendering. Large batches
+    are spread over a pool of `workers` processes, so entries arrive in
+    completion order rather than input order.
+    """
+    if workers <= 1 or len(cards) < REPORT_POOL_MIN_CARDS:
+        for card in cards:
+            yield _render_card(university_name, card)
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    # spawn rather than fork: a gunicorn worker has threads and open DB sockets.
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        remaining = iter(cards)
+        # Keep a few cards queued per process instead of pickling the whole batch up front.
+        pending = {pool.submit(_render_card, university_name, card) for card in itertools.islice(remaining, workers * 4)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                card = next(remaining, None)
+                if card is not None:
+                    pending.add(pool.submit(_render_card, university_name, card))
+    finally:
+        # Also runs when the client disconnects mid-download.
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _ZipSink:
+    """Write-only file object that collects zipfile's output for iter_zip."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(entries):
+    """Yield a ZIP archive of (name, bytes) entries piece by piece, as each entry arrives."""
+    sink = _ZipSink()
+    # The sink can't seek, so zipfile writes sizes after each entry (data descriptors).
+    with zipfile.ZipFile(sink, 'w') as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, send_from_directory, current_app, send_file, abort
 from flask_login import login_required, current_user
 from db import get_db, db_cursor
+from school_stats import adjust_school_stats, attendance_deltas
+from dashboard_cache import bump_dashboard_version
 from helpers import add_notification
-from reports import generate_student_report_card
-import io
-import zipfile
+from jobs import job_kind
+from routes.jobs import job_response
+from reports import generate_student_report_card, render_report_cards, iter_zip
 
 
 
@@ -25,7 +27,9 @@ def grades():
             cursor.execute('INSERT INTO grades (student_id, course_id, score, grade_type, school_id) VALUES (%s, %s, %s, %s, %s)',
                        (request.form.get('student_id'), request.form.get('course_id'), 
                         request.form.get('score'), request.form.get('grade_type'), current_user.school_id))
+            adjust_school_stats(cursor, current_user.school_id, grade_count=1, grade_total=score)
             db.commit()
+            bump_dashboard_version(current_user.school_id, request.form.get('student_id', type=int))
             flash('Grade added!', 'success')
             
             if request.form.get('redirect_to_course') == 'true':
@@ -70,7 +74,9 @@ def attendance():
             cursor.execute('INSERT INTO attendance (student_id, course_id, date, status, school_id) VALUES (%s, %s, %s, %s, %s)',
                        (request.form.get('student_id'), request.form.get('course_id'), 
                         request.form.get('date'), request.form.get('status'), current_user.school_id))
+            adjust_school_stats(cursor, current_user.school_id, **attendance_deltas(request.form.get('status')))
             db.commit()
+            bump_dashboard_version(current_user.school_id, request.form.get('student_id', type=int))
             flash('Log updated!', 'success')
             return redirect(url_for('academic.attendance'))
 
@@ -148,20 +154,23 @@ def grade_submission(assignment_id, submission_id):
         cursor.execute('UPDATE submissions SET grade = %s, feedback = %s WHERE id = %s AND school_id = %s', (grade, feedback, submission_id, current_user.school_id))
         
         # Sync to main grades table
-        cursor.execute('SELECT id FROM grades WHERE student_id = %s AND course_id = %s AND grade_type = %s AND school_id = %s',
+        cursor.execute('SELECT id, score FROM grades WHERE student_id = %s AND course_id = %s AND grade_type = %s AND school_id = %s',
                                (sub['student_id'], assign['course_id'], f"Assignment: {assign['title']}", current_user.school_id))
         existing = cursor.fetchone()
         
         if existing:
             cursor.execute('UPDATE grades SET score = %s WHERE id = %s AND school_id = %s', (grade, existing['id'], current_user.school_id))
+            adjust_school_stats(cursor, current_user.school_id, grade_total=grade - existing['score'])
         else:
             cursor.execute('INSERT INTO grades (student_id, course_id, score, grade_type, school_id) VALUES (%s, %s, %s, %s, %s)',
                        (sub['student_id'], assign['course_id'], grade, f"Assignment: {assign['title']}", current_user.school_id))
+            adjust_school_stats(cursor, current_user.school_id, grade_count=1, grade_total=grade)
         
         # Add Notification
         add_notification(db, sub['student_id'], f"Your work for '{assign['title']}' has been graded: {grade}%", 'success', current_user.school_id)
         
         db.commit()
+        bump_dashboard_version(current_user.school_id, sub['student_id'])
     flash('Grade assigned and student notified!', 'success')
     return redirect(url_for('academic.view_submissions', assignment_id=assignment_id))
 
@@ -171,7 +180,7 @@ def grade_submission(assignment_id, submission_id):
 def download_student_report(student_id):
     if current_user.role not in ['teacher', 'admin', 'principal']: return redirect(url_for('dashboard.dashboard'))
     
-    db = get_db()
+    db = get_db(readonly=True)
     from db import db_cursor
     with db_cursor(db) as cursor:
         cursor.execute('SELECT * FROM users WHERE id = %s', (student_id,))
@@ -206,47 +215,55 @@ def download_student_report(student_id):
         mimetype='application/pdf'
     )
 
+def load_report_cards(db, school_id):
+    """
+    Report card inputs (student, grades, attendance, latest remarks) for every
+    student in a school, fetched with one grouped query per kind instead of
+    three queries per student.
+    """
+    with db_cursor(db) as cursor:
+        cursor.execute("SELECT id, username, role FROM users WHERE role = 'student' AND school_id = %s ORDER BY id", (school_id,))
+        cards = {s['id']: {'student': dict(s), 'grades': [], 'attendance': [], 'remarks': {}} for s in cursor.fetchall()}
+
+        cursor.execute('''
+            SELECT g.student_id, c.name, AVG(g.score) as avg_score
+            FROM grades g JOIN courses c ON g.course_id = c.id
+            WHERE g.school_id = %s GROUP BY g.student_id, c.id, c.name
+        ''', (school_id,))
+        for row in cursor.fetchall():
+            if row['student_id'] in cards:
+                cards[row['student_id']]['grades'].append(dict(row))
+
+        cursor.execute('''
+            SELECT student_id, status, COUNT(*) as count FROM attendance WHERE school_id = %s GROUP BY student_id, status
+        ''', (school_id,))
+        for row in cursor.fetchall():
+            if row['student_id'] in cards:
+                cards[row['student_id']]['attendance'].append(dict(row))
+
+        # Newest first, so the first row seen per student is the one a single report uses.
+        cursor.execute('SELECT * FROM remarks WHERE school_id = %s ORDER BY student_id, created_at DESC', (school_id,))
+        for row in cursor.fetchall():
+            card = cards.get(row['student_id'])
+            if card is not None and not card['remarks']:
+                card['remarks'] = dict(row)
+    return list(cards.values())
+
+
 @academic_bp.route('/report/batch')
 @login_required
 def download_batch_reports():
     if current_user.role not in ['teacher', 'admin', 'principal']: return redirect(url_for('dashboard.dashboard'))
-    
-    db = get_db()
-    from db import db_cursor
-    with db_cursor(db) as cursor:
-        cursor.execute("SELECT * FROM users WHERE role = 'student' AND school_id = %s", (current_user.school_id,))
-        students = cursor.fetchall()
-        
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zf:
-            for student in students:
-                # Re-fetch data for each
-                cursor.execute('''
-                    SELECT c.name, AVG(g.score) as avg_score 
-                    FROM grades g JOIN courses c ON g.course_id = c.id 
-                    WHERE g.student_id = %s AND g.school_id = %s GROUP BY c.id, c.name
-                ''', (student['id'], current_user.school_id))
-                grades_data = cursor.fetchall()
-                
-                cursor.execute('''
-                    SELECT status, COUNT(*) as count FROM attendance WHERE student_id = %s AND school_id = %s GROUP BY status
-                ''', (student['id'], current_user.school_id))
-                attendance_summary = cursor.fetchall()
-                
-                cursor.execute('SELECT * FROM remarks WHERE student_id = %s AND school_id = %s ORDER BY created_at DESC', (student['id'], current_user.school_id))
-                remarks_row = cursor.fetchone()
-                remarks_data = dict(remarks_row) if remarks_row else {}
+    return job_response('batch_reports', {'school_id': current_user.school_id})
 
-                pdf_buffer = generate_student_report_card(current_app.config['UNIVERSITY_NAME'], student, grades_data, attendance_summary, remarks_data)
-                zf.writestr(f"Report_Card_{student['username']}.pdf", pdf_buffer.getvalue())
 
-    zip_buffer.seek(0)
-    return send_file(
-        zip_buffer,
-        as_attachment=True,
-        download_name="PTM_Batch_Reports.zip",
-        mimetype='application/zip'
-    )
+@job_kind('batch_reports')
+def batch_reports_job(payload, output):
+    cards = load_report_cards(get_db(readonly=True), payload['school_id'])
+    # PDFs render across a process pool and are zipped as each one finishes.
+    for chunk in iter_zip(render_report_cards(current_app.config['UNIVERSITY_NAME'], cards)):
+        output.write(chunk)
+    return 'PTM_Batch_Reports.zip'
 
 @academic_bp.route('/remarks/save', methods=['POST'])
 @login_required
@@ -7,7 +7,11 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from db import get_db, db_cursor
+from dashboard_cache import bump_dashboard_version
 from helpers import generate_credentials
+from jobs import delete_user_jobs, remove_artifacts
+from models import invalidate_user
+from school_stats import adjust_school_stats
 from brevo_mail import send_email
 
 admissions_bp = Blueprint('admissions', __name__)
@@ -106,8 +110,10 @@ def enroll():
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''',
                     (user_id, full_name, email, mobile, dob, gender, address, parent_name, parent_mobile, parent_email, admission_number, classroom_id, current_user.school_id)
                 )
+                adjust_school_stats(cursor, current_user.school_id, student_count=1)
             
             db.commit()
+            bump_dashboard_version(current_user.school_id)
 
             # Auto-link this email to the account and send a verification link,
             # so it's usable for password recovery once confirmed.
@@ -198,6 +204,8 @@ def edit_student(user_id):
                 data.get('parent_email'), data.get('classroom_id') or None, user_id, current_user.school_id
             ))
         db.commit()
+        # Their classroom name, and the principal's admissions feed
+        bump_dashboard_version(current_user.school_id, user_id)
         flash('Student details updated!', 'success')
     except Exception as e:
         db.rollback()
@@ -217,9 +225,16 @@ def delete_student(user_id):
         from db import db_cursor
         with db_cursor(db) as cursor:
             cursor.execute('DELETE FROM student_details WHERE user_id = %s AND school_id = %s', (user_id, current_user.school_id))
+            # Counter and job rows reference users and would block the delete on PostgreSQL
+            cursor.execute('DELETE FROM unread_counters WHERE user_id = %s AND school_id = %s', (user_id, current_user.school_id))
+            job_ids = delete_user_jobs(cursor, user_id, current_user.school_id)
             cursor.execute('DELETE FROM users WHERE id = %s AND school_id = %s', (user_id, current_user.school_id))
+            adjust_school_stats(cursor, current_user.school_id, student_count=-cursor.rowcount)
             cursor.execute('DELETE FROM enrollments WHERE student_id = %s AND school_id = %s', (user_id, current_user.school_id))
         db.commit()
+        remove_artifacts(current_app, job_ids)
+        bump_dashboard_version(current_user.school_id)
+        invalidate_user(user_id)
         flash('Student account deleted successfully.', 'success')
     except Exception as e:
         db.rollback()
@@ -247,64 +262,65 @@ def import_students():
     
     stream = io.StringIO(content, newline=None)
     csv_input = csv.DictReader(stream)
-    
+
+    pending = []
+    for row in csv_input:
+        full_name = row.get('full_name', '').strip()
+        email = row.get('email', '').strip()
+        if not full_name or not email:
+            continue
+
+        username, password = generate_credentials(full_name)
+        pending.append({
+            'full_name': full_name,
+            'email': email,
+            'mobile': row.get('mobile', '').strip() or None,
+            'dob': row.get('dob', '').strip() or None,
+            'gender': row.get('gender', '').strip() or None,
+            'parent_name': row.get('parent_name', '').strip() or None,
+            'parent_email': row.get('parent_email', '').strip() or None,
+            'username': username,
+            'password': password,
+        })
+
+    if not pending:
+        flash('No valid rows found. Each row needs full_name and email.', 'warning')
+        return redirect(url_for('admissions.enroll'))
+
     db = get_db()
-    count = 0
-    errors = []
-    
     try:
         with db_cursor(db) as cursor:
-            for row in csv_input:
-                full_name = row.get('full_name', '').strip()
-                email = row.get('email', '').strip()
-                mobile = row.get('mobile', '').strip()
-                dob = row.get('dob', '').strip()
-                gender = row.get('gender', '').strip()
-                parent_name = row.get('parent_name', '').strip()
-                parent_email = row.get('parent_email', '').strip()
-                
-                if not full_name or not email:
-                    continue
-                
-                username, password = generate_credentials(full_name)
-                hashed_password = generate_password_hash(password)
-                
-                try:
-                    # 1. Create User
-                    cursor.execute(
-                        'INSERT INTO users (username, password_hash, role, school_id) VALUES (%s, %s, %s, %s) RETURNING id',
-                        (username, hashed_password, 'student', current_user.school_id)
-                    )
-                    user_id = cursor.fetchone()[0]
-                    
-                    # 2. Create Student Details
-                    admission_number = f"ADM{user_id:04d}"
-                    cursor.execute(
-                        '''INSERT INTO student_details 
-                        (user_id, full_name, email, mobile, dob, gender, parent_name, parent_email, admission_number, school_id) 
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''',
-                        (user_id, full_name, email, mobile or None, dob or None, gender or None, parent_name or None, parent_email or None, admission_number, current_user.school_id)
-                    )
-                    
-                    # 3. Send Credentials Email
-                    email_body = f"Welcome {full_name}!\n\nYour account is ready.\nUsername: {username}\nPassword: {password}\n\nLogin: {request.host_url}"
-                    # Try sending but don't fail the whole import if one fails
-                    try:
-                        send_email(email, 'Student OS - Your Login Credentials', email_body)
-                    except: pass
-                    
-                    count += 1
-                except Exception as e:
-                    errors.append(f"Row {count+2}: {str(e)}")
-                    
+            # 1. Create Users (ids come back in CSV order)
+            user_ids = cursor.bulk_insert(
+                'users', ('username', 'password_hash', 'role', 'school_id'),
+                [(p['username'], generate_password_hash(p['password']), 'student', current_user.school_id) for p in pending],
+                returning='id'
+            )
+
+            # 2. Create Student Details
+            for p, user_id in zip(pending, user_ids):
+                p['admission_number'] = f"ADM{user_id:04d}"
+            cursor.bulk_insert(
+                'student_details',
+                ('user_id', 'full_name', 'email', 'mobile', 'dob', 'gender', 'parent_name', 'parent_email', 'admission_number', 'school_id'),
+                [(user_id, p['full_name'], p['email'], p['mobile'], p['dob'], p['gender'], p['parent_name'], p['parent_email'], p['admission_number'], current_user.school_id)
+                 for p, user_id in zip(pending, user_ids)]
+            )
+            adjust_school_stats(cursor, current_user.school_id, student_count=len(user_ids))
         db.commit()
-        if errors:
-            flash(f'Imported {count} students with {len(errors)} errors: {", ".join(errors[:3])}...', 'warning')
-        else:
-            flash(f'Successfully imported {count} students!', 'success')
-            
+        bump_dashboard_version(current_user.school_id)
     except Exception as e:
         db.rollback()
         flash(f'Import failed: {str(e)}', 'error')
-        
+        return redirect(url_for('admissions.enroll'))
+
+    # 3. Send Credentials Emails (only once the accounts are committed)
+    for p in pending:
+        email_body = f"Welcome {p['full_name']}!\n\nYour account is ready.\nUsername: {p['username']}\nPassword: {p['password']}\n\nLogin: {request.host_url}"
+        # Try sending but don't fail the whole import if one fails
+        try:
+            send_email(p['email'], 'Student OS - Your Login Credentials', email_body)
+        except: pass
+
+    flash(f'Successfully imported {len(pending)} students!', 'success')
     return redirect(url_for('admissions.enroll'))
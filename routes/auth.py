@@ -1,46 +1,23 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User
-import time
+from models import User, invalidate_user
+from login_throttle import reserve_attempt, clear_attempts
 
 auth_bp = Blueprint('auth', __name__)
 
-# Simple in-memory brute-force guard: tracks failed attempts per (username, ip).
-# Not distributed-safe (fine for a single-dyno deployment); resets on restart.
-_failed_attempts = {}
-MAX_ATTEMPTS = 5
-LOCKOUT_SECONDS = 300  # 5 minutes
-
 def _attempt_key():
     return f"{request.form.get('username', '').lower()}:{request.remote_addr}"
 
-def _is_locked_out(key):
-    entry = _failed_attempts.get(key)
-    if not entry:
-        return False
-    count, first_failed_at = entry
-    if count < MAX_ATTEMPTS:
-        return False
-    if time.time() - first_failed_at > LOCKOUT_SECONDS:
-        _failed_attempts.pop(key, None)
-        return False
-    return True
-
-def _record_failure(key):
-    count, first_failed_at = _failed_attempts.get(key, (0, time.time()))
-    _failed_attempts[key] = (count + 1, first_failed_at)
-
-def _clear_failures(key):
-    _failed_attempts.pop(key, None)
-
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('dashboard.dashboard'))
     
     if request.method == 'POST':
+        from db import get_db
         key = _attempt_key()
-        if _is_locked_out(key):
+        # Counted before the password check so parallel workers can't exceed the limit.
+        if not reserve_attempt(get_db(), key):
             flash('Too many failed attempts. Please try again in a few minutes.', 'error')
             return render_template('login.html'), 429
 
@@ -58,17 +35,15 @@ def login():
                            (user.role.lower() == 'principal' and selected_role.lower() == 'teacher')
             
             if not is_valid_role:
-                _record_failure(key)
                 flash(f'Invalid login. This account is registered as a {user.role.title()}, not a {selected_role.title()}.', 'error')
                 return render_template('login.html')
             
-            _clear_failures(key)
+            clear_attempts(get_db(), key)
             # Login user with remember me option (30 days if checked)
             login_user(user, remember=remember)
             flash(f'Welcome back, {user.username}!', 'success')
             return redirect(url_for('dashboard.dashboard'))
         else:
-            _record_failure(key)
             flash('Invalid username or password', 'error')
             
     return render_template('login.html')
@@ -180,6 +155,7 @@ def reset_password(token):
             cursor.execute('UPDATE users SET password_hash = %s WHERE id = %s',
                        (generate_password_hash(password), user.id))
         db.commit()
+        invalidate_user(user.id)
 
         flash('Your password has been updated. Please log in.', 'success')
         return redirect(url_for('auth.login'))
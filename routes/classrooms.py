@@ -1,6 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file
 from flask_login import login_required, current_user
 from db import get_db, db_cursor
+from school_stats import adjust_school_stats, attendance_deltas
+from dashboard_cache import bump_dashboard_version
+from jobs import job_kind
+from routes.jobs import job_response
 import io
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
@@ -169,17 +173,22 @@ def detail(classroom_id):
             relevant_courses = cursor.fetchall()
             grades_matrix['courses'] = [dict(c) for c in relevant_courses]
 
-            # 2. For each student, get their average grade in each course
+            # 2. Every student's per-course average in one grouped query, pivoted below
+            cursor.execute('''
+                SELECT g.student_id, g.course_id, ROUND(CAST(AVG(g.score) AS NUMERIC), 1) AS avg_score
+                FROM grades g
+                JOIN student_details sd ON sd.user_id = g.student_id
+                WHERE sd.classroom_id = %s AND sd.school_id = %s AND g.school_id = %s
+                GROUP BY g.student_id, g.course_id
+            ''', (classroom_id, current_user.school_id, current_user.school_id))
+            averages = {(row['student_id'], row['course_id']): float(row['avg_score']) for row in cursor.fetchall()}
+
             for student in students:
-                student_grades = {'full_name': student['full_name'], 'admission_number': student['admission_number'], 'scores': {}}
-                for rc in relevant_courses:
-                    cursor.execute('''
-                        SELECT COALESCE(ROUND(AVG(score), 1), 0) FROM grades 
-                        WHERE student_id = %s AND course_id = %s AND school_id = %s
-                    ''', (student['id'], rc['id'], current_user.school_id))
-                    score = cursor.fetchone()[0]
-                    student_grades['scores'][rc['id']] = score
-                grades_matrix['students'].append(student_grades)
+                grades_matrix['students'].append({
+                    'full_name': student['full_name'],
+                    'admission_number': student['admission_number'],
+                    'scores': {rc['id']: averages.get((student['id'], rc['id']), 0) for rc in relevant_courses},
+                })
 
     return render_template('classrooms/detail.html',
                            classroom=dict(classroom),
@@ -224,13 +233,12 @@ def add_students(classroom_id):
             return redirect(url_for('classrooms.detail', classroom_id=classroom_id))
 
         with db_cursor(db) as cursor:
-            # Loop for SQLite + PostgreSQL compatibility
-            for sid in student_int_ids:
-                cursor.execute(
-                    'UPDATE student_details SET classroom_id = %s WHERE user_id = %s AND school_id = %s',
-                    (classroom_id, sid, current_user.school_id)
-                )
+            cursor.executemany(
+                'UPDATE student_details SET classroom_id = %s WHERE user_id = %s AND school_id = %s',
+                [(classroom_id, sid, current_user.school_id) for sid in student_int_ids]
+            )
         db.commit()
+        bump_dashboard_version(current_user.school_id, user_ids=student_int_ids, school_wide=False)
         flash(f'Successfully assigned {len(student_int_ids)} student(s) to the class!', 'success')
     except Exception as e:
         db.rollback()
@@ -303,7 +311,7 @@ def mark_qr_attendance():
             # Mark attendance (UPSERT logic: update if already exists for today/student/course)
             # Check if exists
             cursor.execute(
-                'SELECT id FROM attendance WHERE student_id = %s AND course_id = %s AND date = %s AND school_id = %s',
+                'SELECT id, status FROM attendance WHERE student_id = %s AND course_id = %s AND date = %s AND school_id = %s',
                 (student_id, course_id, today, current_user.school_id)
             )
             existing = cursor.fetchone()
@@ -313,12 +321,15 @@ def mark_qr_attendance():
                     'UPDATE attendance SET status = %s WHERE id = %s AND school_id = %s',
                     ('Present', existing['id'], current_user.school_id)
                 )
+                adjust_school_stats(cursor, current_user.school_id, **attendance_deltas('Present', existing['status']))
             else:
                 cursor.execute(
                     'INSERT INTO attendance (student_id, course_id, date, status, school_id) VALUES (%s, %s, %s, %s, %s)',
                     (student_id, course_id, today, 'Present', current_user.school_id)
                 )
+                adjust_school_stats(cursor, current_user.school_id, **attendance_deltas('Present'))
         db.commit()
+        bump_dashboard_version(current_user.school_id, student_id)
         return {'success': True, 'student_name': student['full_name'], 'admission_no': admission_no}
 
     except Exception as e:
@@ -330,18 +341,40 @@ def mark_qr_attendance():
 @classrooms_bp.route('/classrooms/<int:classroom_id>/export')
 @login_required
 def export_excel(classroom_id):
+    """Queue the classroom's grades workbook; the job page offers the download."""
     redir = _require_staff()
     if redir:
         return redir
 
-    db = get_db()
+    with db_cursor(get_db(readonly=True)) as cursor:
+        cursor.execute("SELECT id FROM classrooms WHERE id = %s AND school_id = %s", (classroom_id, current_user.school_id))
+        if not cursor.fetchone():
+            flash("Classroom not found", "error")
+            return redirect(url_for('classrooms.index'))
+    return job_response('classroom_excel', {'classroom_id': classroom_id, 'school_id': current_user.school_id})
+
+
+@job_kind('classroom_excel')
+def classroom_excel_job(payload, output):
+    filename = write_classroom_workbook(get_db(readonly=True), payload['classroom_id'], payload['school_id'], output)
+    if filename is None:
+        raise LookupError(f"classroom {payload['classroom_id']} not found")
+    return filename
+
+
+def write_classroom_workbook(db, classroom_id, school_id, output):
+    """
+    Write one classroom's grades workbook to `output` in constant memory:
+    student rows stream from one grouped query straight into a write-only
+    worksheet. Returns the download filename, or None if there is no such
+    classroom in the school.
+    """
     with db_cursor(db) as cursor:
         # 1. Fetch classroom info
-        cursor.execute("SELECT name, section, academic_year FROM classrooms WHERE id = %s AND school_id = %s", (classroom_id, current_user.school_id))
+        cursor.execute("SELECT name, section, academic_year FROM classrooms WHERE id = %s AND school_id = %s", (classroom_id, school_id))
         classroom = cursor.fetchone()
         if not classroom:
-            flash("Classroom not found", "error")
-            return redirect(url_for('classrooms.index'))
+            return None
 
         # 2. Fetch relevant courses for this classroom
         cursor.execute('''
@@ -351,125 +384,103 @@ def export_excel(classroom_id):
             JOIN student_details sd ON e.student_id = sd.user_id
             WHERE sd.classroom_id = %s AND c.school_id = %s
             ORDER BY c.name
-        ''', (classroom_id, current_user.school_id))
-        courses = cursor.fetchall()
-        course_list = [dict(c) for c in courses]
+        ''', (classroom_id, school_id))
+        course_list = [dict(c) for c in cursor.fetchall()]
 
-        # 3. Fetch students with detailed grades
+        # 3. Roster size and the widest name/admission number: a write-only sheet
+        #    needs its column widths before the first row is written.
         cursor.execute('''
-            SELECT u.id, sd.full_name, sd.admission_number
+            SELECT COUNT(*), MAX(LENGTH(sd.full_name)), MAX(LENGTH(sd.admission_number))
             FROM student_details sd
-            JOIN users u ON sd.user_id = u.id
             WHERE sd.classroom_id = %s AND sd.school_id = %s
-            ORDER BY sd.full_name
-        ''', (classroom_id, current_user.school_id))
-        students_raw = cursor.fetchall()
-        
-        student_data = []
-        for s in students_raw:
-            s_dict = dict(s)
-            s_dict['grades'] = {}
-            for c in course_list:
-                cursor.execute('''
-                    SELECT COALESCE(ROUND(AVG(score), 1), 0) FROM grades 
-                    WHERE student_id = %s AND course_id = %s AND school_id = %s
-                ''', (s['id'], c['id'], current_user.school_id))
-                s_dict['grades'][c['id']] = cursor.fetchone()[0]
-            student_data.append(s_dict)
+        ''', (classroom_id, school_id))
+        total_students, name_width, admission_width = cursor.fetchone()
 
     from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
     from openpyxl.utils import get_column_letter
 
     # 4. Create Excel Workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Grades Report"
-
-    # Define Styles
-    title_font = Font(size=16, bold=True, color="1E1B4B")
-    label_font = Font(bold=True, size=10, color="6B7280")
-    value_font = Font(bold=True, size=11, color="111827")
-    header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Grades Report")
+
+    # Define Styles: registered once as named styles, so each cell only takes
+    # a name instead of looking its Font/Border up in the style tables.
     center_align = Alignment(horizontal="center", vertical="center")
     border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    for style in [
+        NamedStyle("Report Title", font=Font(size=16, bold=True, color="1E1B4B"), alignment=center_align),
+        NamedStyle("Report Label", font=Font(bold=True, size=10, color="6B7280")),
+        NamedStyle("Report Value", font=Font(bold=True, size=11, color="111827")),
+        NamedStyle("Grades Header", font=Font(color="FFFFFF", bold=True, size=11),
+                   fill=PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid"),
+                   alignment=center_align, border=border),
+        NamedStyle("Grades Cell", border=border),
+        NamedStyle("Grades Score", alignment=center_align, border=border),
+        NamedStyle("Grades Average", font=Font(bold=True), alignment=center_align, border=border),
+    ]:
+        wb.add_named_style(style)
+
+    def cell(value, style):
+        c = WriteOnlyCell(ws, value=value)
+        c.style = style
+        return c
 
-    # Professional Header Section
-    ws.merge_cells(f'A1:{get_column_letter(len(course_list) + 3)}1')
-    ws['A1'] = "Classroom Academic Intelligence Report"
-    ws['A1'].font = title_font
-    ws['A1'].alignment = center_align
-    
-    ws['A3'] = "Classroom:"
-    ws['A3'].font = label_font
-    ws['B3'] = f"{classroom['name']} ({classroom['section'] or 'General'})"
-    ws['B3'].font = value_font
+    # Header
+    headers = ["Admission No", "Student Name"]
+    for c in course_list:
+        headers.append(c['name'])
+    headers.append("Overall Average")
 
-    ws['A4'] = "Academic Year:"
-    ws['A4'].font = label_font
-    ws['B4'] = classroom['academic_year']
-    ws['B4'].font = value_font
+    # Column Widths: the header text or the widest value, whichever is longer
+    value_widths = [admission_width or 0, name_width or 0] + [len("100.0")] * (len(course_list) + 1)
+    for col_num, (header, value_width) in enumerate(zip(headers, value_widths), 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = min(max(20, len(header), value_width) + 2, 60)
 
+    # Professional Header Section
+    ws.merged_cells.add(f'A1:{get_column_letter(len(course_list) + 3)}1')
+    ws.append([cell("Classroom Academic Intelligence Report", "Report Title")])
+    ws.append([])
     # Summary Stats
-    total_students = len(student_data)
-    ws['F3'] = "Total Students:"
-    ws['F3'].font = label_font
-    ws['G3'] = total_students
-    ws['G3'].font = value_font
+    ws.append([cell("Classroom:", "Report Label"), cell(f"{classroom['name']} ({classroom['section'] or 'General'})", "Report Value"),
+               None, None, None, cell("Total Students:", "Report Label"), cell(total_students, "Report Value")])
+    ws.append([cell("Academic Year:", "Report Label"), cell(classroom['academic_year'], "Report Value")])
+    ws.append([])
+    ws.append([])
 
     # Main Data Table
     start_row = 7
-    
-    # Header
-    headers = ["Admission No", "Student Name"]
-    for c in course_list:
-        headers.append(c['name'])
-    headers.append("Overall Average")
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-        cell.border = border
-
-    # Data Rows
-    for row_num, s in enumerate(student_data, start_row + 1):
-        ws.cell(row=row_num, column=1, value=s['admission_number']).border = border
-        ws.cell(row=row_num, column=2, value=s['full_name']).border = border
-        
-        last_course_col = 2
-        for i, c in enumerate(course_list):
-            val = s['grades'][c['id']]
-            cell = ws.cell(row=row_num, column=3+i, value=val)
-            cell.border = border
-            cell.alignment = center_align
-            last_course_col = 3 + i
-            
-        # Add Excel formula for Average
-        avg_col = last_course_col + 1
-        start_col_letter = get_column_letter(3)
-        end_col_letter = get_column_letter(last_course_col)
-        # Using AVERAGE formula in Excel
-        formula = f"=IFERROR(ROUND(AVERAGE({start_col_letter}{row_num}:{end_col_letter}{row_num}), 1), 0)"
-        avg_cell = ws.cell(row=row_num, column=avg_col, value=formula)
-        avg_cell.font = Font(bold=True)
-        avg_cell.border = border
-        avg_cell.alignment = center_align
-
-    # Column Widths
-    for col in ws.columns:
-        ws.column_dimensions[get_column_letter(col[0].column)].width = 20
-
-    from io import BytesIO
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    ws.append([cell(header, "Grades Header") for header in headers])
 
-    from flask import send_file
-    filename = f"Grades_{classroom['name']}_{classroom['academic_year']}.xlsx"
-    return send_file(output, as_attachment=True, download_name=filename, mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    # Data Rows: one row per (student, course) with grades, grouped per student in order
+    from itertools import groupby
+    start_col_letter = get_column_letter(3)
+    end_col_letter = get_column_letter(2 + len(course_list))
+    with db_cursor(db, stream=True) as cursor:
+        cursor.execute('''
+            SELECT u.id, sd.full_name, sd.admission_number, g.course_id,
+                   ROUND(CAST(AVG(g.score) AS NUMERIC), 1) AS avg_score
+            FROM student_details sd
+            JOIN users u ON sd.user_id = u.id
+            LEFT JOIN grades g ON g.student_id = u.id AND g.school_id = sd.school_id
+            WHERE sd.classroom_id = %s AND sd.school_id = %s
+            GROUP BY u.id, sd.full_name, sd.admission_number, g.course_id
+            ORDER BY sd.full_name, u.id
+        ''', (classroom_id, school_id))
+        for row_num, (_student_id, rows) in enumerate(groupby(cursor, key=lambda r: r['id']), start_row + 1):
+            rows = list(rows)
+            grades = {r['course_id']: float(r['avg_score']) for r in rows if r['course_id'] is not None}
+            line = [cell(rows[0]['admission_number'], "Grades Cell"), cell(rows[0]['full_name'], "Grades Cell")]
+            for c in course_list:
+                line.append(cell(grades.get(c['id'], 0), "Grades Score"))
+            # Add Excel formula for Average
+            formula = f"=IFERROR(ROUND(AVERAGE({start_col_letter}{row_num}:{end_col_letter}{row_num}), 1), 0)"
+            line.append(cell(formula, "Grades Average"))
+            ws.append(line)
+
+    wb.save(output)
+    return f"Grades_{classroom['name']}_{classroom['academic_year']}.xlsx"
 
 
 # ── Create classroom (admin only) ────────────────────────────────────────────
@@ -545,9 +556,12 @@ def delete(classroom_id):
     try:
         with db_cursor(db) as cursor:
             # Unlink students first
+            cursor.execute('SELECT user_id FROM student_details WHERE classroom_id = %s AND school_id = %s', (classroom_id, current_user.school_id))
+            student_ids = [row[0] for row in cursor.fetchall()]
             cursor.execute('UPDATE student_details SET classroom_id = NULL WHERE classroom_id = %s AND school_id = %s', (classroom_id, current_user.school_id))
             cursor.execute('DELETE FROM classrooms WHERE id = %s AND school_id = %s', (classroom_id, current_user.school_id))
         db.commit()
+        bump_dashboard_version(current_user.school_id, user_ids=student_ids, school_wide=False)
         flash('Classroom deleted.', 'success')
     except Exception as e:
         db.rollback()
@@ -3,10 +3,18 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from db import get_db
 from helpers import save_upload, add_notification
+from dashboard_cache import bump_dashboard_version
 
 
 courses_bp = Blueprint('courses', __name__)
 
+
+def _enrolled_ids(cursor, course_id):
+    """Students enrolled in a course, whose dashboards list its grades and assignments."""
+    cursor.execute('SELECT student_id FROM enrollments WHERE course_id = %s AND school_id = %s', (course_id, current_user.school_id))
+    return [row[0] for row in cursor.fetchall()]
+
+
 @courses_bp.route('/courses')
 @login_required
 def courses():
@@ -134,6 +142,7 @@ def new_course():
             cursor.execute('INSERT INTO courses (name, teacher_id, schedule, school_id) VALUES (%s, %s, %s, %s)',
                        (name, current_user.id, schedule, current_user.school_id))
         db.commit()
+        bump_dashboard_version(current_user.school_id)
         flash('Course created!', 'success')
         return redirect(url_for('courses.courses'))
     return render_template('course_form.html', user=current_user, course=None)
@@ -154,6 +163,7 @@ def edit_course(course_id):
             cursor.execute('UPDATE courses SET name = %s, schedule = %s WHERE id = %s AND school_id = %s',
                        (request.form.get('name'), request.form.get('schedule'), course_id, current_user.school_id))
             db.commit()
+            bump_dashboard_version(current_user.school_id, user_ids=_enrolled_ids(cursor, course_id))
             flash('Course updated!', 'success')
             return redirect(url_for('courses.courses'))
         return render_template('course_form.html', user=current_user, course=course)
@@ -170,8 +180,10 @@ def delete_course(course_id):
             flash('Access denied.', 'error')
             return redirect(url_for('courses.courses'))
             
+        student_ids = _enrolled_ids(cursor, course_id)
         cursor.execute('DELETE FROM courses WHERE id = %s AND school_id = %s', (course_id, current_user.school_id))
         db.commit()
+    bump_dashboard_version(current_user.school_id, user_ids=student_ids)
     flash('Course deleted.', 'success')
     return redirect(url_for('courses.courses'))
 
@@ -195,6 +207,7 @@ def enroll_student(course_id):
         cursor.execute('INSERT INTO enrollments (student_id, course_id, school_id) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
                    (student['id'], course_id, current_user.school_id))
         db.commit()
+    bump_dashboard_version(current_user.school_id, student['id'])
     flash(f'{username} enrolled!', 'success')
     return redirect(url_for('courses.course_details', course_id=course_id))
 
@@ -211,7 +224,9 @@ def new_assignment(course_id):
         with db_cursor(db) as cursor:
             cursor.execute('INSERT INTO assignments (course_id, title, description, due_date, attachment_path, school_id) VALUES (%s, %s, %s, %s, %s, %s)',
                        (course_id, request.form.get('title'), request.form.get('description'), request.form.get('due_date'), path, current_user.school_id))
+            student_ids = _enrolled_ids(cursor, course_id)
         db.commit()
+        bump_dashboard_version(current_user.school_id, user_ids=student_ids, school_wide=False)
         flash('Assignment posted!', 'success')
         return redirect(url_for('courses.course_details', course_id=course_id))
     return render_template('assignment_form.html', course_id=course_id, user=current_user)
@@ -241,6 +256,8 @@ def submit_assignment(course_id, assignment_id):
             add_notification(db, course['teacher_id'], f"New submission from {current_user.username} for {assign['title']}", 'info', current_user.school_id)
             
             db.commit()
+        # The teacher's recent submissions
+        bump_dashboard_version(current_user.school_id, course['teacher_id'], school_wide=False)
         flash('Work submitted!', 'success')
         return redirect(url_for('courses.course_details', course_id=course_id))
 
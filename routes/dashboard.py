@@ -1,17 +1,92 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from flask_login import login_required, current_user
-from flask_babel import _
+from flask_babel import _, get_locale
 from db import get_db, db_cursor
-from helpers import calculate_gpa, get_account_email, link_email_and_send_verification, send_verification_email
+from helpers import get_account_email, link_email_and_send_verification, send_verification_email
+from school_stats import get_school_stats
+from dashboard_cache import get_dashboard
 
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-@dashboard_bp.route('/dashboard')
-@login_required
-def dashboard():
-    db = get_db()
-    
+# Everything the student dashboard shows, in one round trip. Each row is tagged
+# with its section; `pos` keeps the per-section order through the UNION. GPA is
+# the mean of the per-course grade points (90/80/70/60 -> 4/3/2/1). Plain CTEs,
+# window functions and CAST AS NUMERIC run unchanged on PostgreSQL and SQLite.
+# Placeholder NULLs are cast to their column's type: PostgreSQL resolves the
+# UNION branch by branch, and a bare NULL would make `ts` text, which then
+# cannot be matched with the timestamps of the notification branch.
+STUDENT_DASHBOARD_QUERY = '''
+    WITH course_avgs AS (
+        SELECT c.id, c.name, ROUND(CAST(AVG(g.score) AS NUMERIC), 1) AS avg_score
+        FROM grades g
+        JOIN courses c ON g.course_id = c.id
+        WHERE g.student_id = %s AND g.school_id = %s
+        GROUP BY c.id, c.name
+    )
+    SELECT 'grade' AS section, name AS label, CAST(NULL AS TEXT) AS detail, avg_score AS num,
+           CAST(NULL AS TIMESTAMP) AS ts,
+           ROW_NUMBER() OVER (ORDER BY id) AS pos
+    FROM course_avgs
+    UNION ALL
+    SELECT 'gpa', CAST(NULL AS TEXT), CAST(NULL AS TEXT), ROUND(CAST(AVG(CASE WHEN avg_score >= 90 THEN 4.0
+                                                   WHEN avg_score >= 80 THEN 3.0
+                                                   WHEN avg_score >= 70 THEN 2.0
+                                                   WHEN avg_score >= 60 THEN 1.0
+                                                   ELSE 0.0 END) AS NUMERIC), 2), CAST(NULL AS TIMESTAMP), 1
+    FROM course_avgs
+    UNION ALL
+    SELECT 'attendance', status, CAST(NULL AS TEXT), COUNT(*), CAST(NULL AS TIMESTAMP), 1
+    FROM attendance WHERE student_id = %s AND school_id = %s GROUP BY status
+    UNION ALL
+    SELECT 'classroom', cl.name, CAST(NULL AS TEXT), CAST(NULL AS NUMERIC), CAST(NULL AS TIMESTAMP), 1
+    FROM classrooms cl
+    JOIN student_details sd ON sd.classroom_id = cl.id
+    WHERE sd.user_id = %s AND sd.school_id = %s
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'notification' AS section, message AS label, type AS detail, CAST(NULL AS NUMERIC) AS num, created_at AS ts,
+               ROW_NUMBER() OVER (ORDER BY created_at DESC) AS pos
+        FROM notifications WHERE user_id = %s AND school_id = %s
+        ORDER BY created_at DESC LIMIT 5
+    ) recent_notifications
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'activity' AS section, a.title AS label, c.name AS detail, CAST(NULL AS NUMERIC) AS num, a.due_date AS ts,
+               ROW_NUMBER() OVER (ORDER BY a.created_at DESC) AS pos
+        FROM assignments a
+        JOIN courses c ON a.course_id = c.id
+        JOIN enrollments e ON c.id = e.course_id
+        WHERE e.student_id = %s AND a.school_id = %s
+        ORDER BY a.created_at DESC LIMIT 5
+    ) recent_assignments
+    ORDER BY section, pos
+'''
+
+
+def student_dashboard_payload(cursor, student_id, school_id):
+    """Grades, GPA, attendance, classroom, notifications and assignments for one student, in one query."""
+    cursor.execute(STUDENT_DASHBOARD_QUERY, (student_id, school_id) * 5)
+    payload = {'grades': [], 'gpa': 0.0, 'attendance': {}, 'classroom_name': None,
+               'notifications': [], 'recent_activity': []}
+    for section, label, detail, num, ts, _pos in cursor.fetchall():
+        if section == 'grade':
+            payload['grades'].append((label, float(num)))
+        elif section == 'gpa':
+            payload['gpa'] = float(num) if num is not None else 0.0
+        elif section == 'attendance':
+            payload['attendance'][label] = int(num)
+        elif section == 'classroom':
+            payload['classroom_name'] = label
+        elif section == 'notification':
+            payload['notifications'].append({'message': label, 'type': detail, 'created_at': ts})
+        else:
+            payload['recent_activity'].append({'title': label, 'course_name': detail, 'due_date': ts})
+    return payload
+
+
+def build_dashboard(db):
+    """Chart data, stat cards, activity and notifications for current_user's dashboard."""
     chart_data = {
         'grade_labels': [],
         'grade_values': [],
@@ -23,77 +98,40 @@ def dashboard():
     recent_activity = []
     notifications = []
     
-    from db import db_cursor
     with db_cursor(db) as cursor:
-        # Fetch Notifications
-        cursor.execute('''
-            SELECT * FROM notifications 
-            WHERE user_id = %s AND school_id = %s
-            ORDER BY created_at DESC LIMIT 5
-        ''', (current_user.id, current_user.school_id))
-        notifications = cursor.fetchall()
-
-        
-        if current_user.role == 'student':
-            # Grade performance
+        # Fetch Notifications (students get theirs in the dashboard payload)
+        if current_user.role != 'student':
             cursor.execute('''
-                SELECT c.name, AVG(g.score) as avg_score 
-                FROM grades g 
-                JOIN courses c ON g.course_id = c.id 
-                WHERE g.student_id = %s AND g.school_id = %s
-                GROUP BY c.id, c.name
+                SELECT * FROM notifications 
+                WHERE user_id = %s AND school_id = %s
+                ORDER BY created_at DESC LIMIT 5
             ''', (current_user.id, current_user.school_id))
-            grades = cursor.fetchall()
+            notifications = [dict(row) for row in cursor.fetchall()]
 
-            # Classroom Info
-            cursor.execute('''
-                SELECT cl.name 
-                FROM classrooms cl
-                JOIN student_details sd ON sd.classroom_id = cl.id
-                WHERE sd.user_id = %s AND sd.school_id = %s
-            ''', (current_user.id, current_user.school_id))
-            classroom_row = cursor.fetchone()
-            stats['classroom_name'] = classroom_row['name'] if classroom_row else "Not Assigned"
-            
-            for g in grades:
-                chart_data['grade_labels'].append(g['name'])
-                chart_data['grade_values'].append(round(g['avg_score'], 1))
-                
-            # Attendance
-            cursor.execute('''
-                SELECT status, COUNT(*) as count 
-                FROM attendance WHERE student_id = %s AND school_id = %s GROUP BY status
-            ''', (current_user.id, current_user.school_id))
-            attendance = cursor.fetchall()
-            
-            att_dict = {row['status']: row['count'] for row in attendance}
+        if current_user.role == 'student':
+            payload = student_dashboard_payload(cursor, current_user.id, current_user.school_id)
+            notifications = payload['notifications']
+            recent_activity = payload['recent_activity']
+
+            for name, avg_score in payload['grades']:
+                chart_data['grade_labels'].append(name)
+                chart_data['grade_values'].append(avg_score)
+
+            att_dict = payload['attendance']
             chart_data['attendance_values'] = [att_dict.get('Present', 0), att_dict.get('Absent', 0), att_dict.get('Late', 0)]
 
             # Student Stats
             total_att = sum(chart_data['attendance_values'])
             att_rate = f"{int((chart_data['attendance_values'][0]/total_att)*100)}%" if total_att > 0 else "0%"
-            
-            # Calculate Cumulative GPA
-            total_points = sum([calculate_gpa(v) for v in chart_data['grade_values']])
-            avg_gpa = round(total_points / len(chart_data['grade_values']), 2) if chart_data['grade_values'] else 0.0
+            avg_gpa = payload['gpa']
 
             stats = {
                 'card1_label': _('Current GPA'), 'card1_value': f"{avg_gpa} / 4.0",
                 'card2_label': _('Total Courses'), 'card2_value': len(chart_data['grade_labels']),
                 'card3_label': _('Attendance Rate'), 'card3_value': att_rate,
-                'card4_label': _('Status'), 'card4_value': _('Academic Honor') if avg_gpa >= 3.5 else _('Active')
+                'card4_label': _('Status'), 'card4_value': _('Academic Honor') if avg_gpa >= 3.5 else _('Active'),
+                'classroom_name': payload['classroom_name'] or "Not Assigned"
             }
-
-            cursor.execute('''
-                SELECT a.title, c.name as course_name, a.due_date 
-                FROM assignments a
-                JOIN courses c ON a.course_id = c.id
-                JOIN enrollments e ON c.id = e.course_id
-                WHERE e.student_id = %s AND a.school_id = %s
-                ORDER BY a.created_at DESC LIMIT 5
-            ''', (current_user.id, current_user.school_id))
-            recent_activity = cursor.fetchall()
-
         elif current_user.role == 'teacher':
             cursor.execute('''
                 SELECT c.name, AVG(g.score) as avg_score 
@@ -143,53 +181,37 @@ def dashboard():
                 WHERE c.teacher_id = %s AND c.school_id = %s
                 ORDER BY s.submission_date DESC LIMIT 5
             ''', (current_user.id, current_user.school_id))
-            recent_activity = cursor.fetchall()
+            recent_activity = [dict(row) for row in cursor.fetchall()]
 
         elif current_user.role == 'principal':
-            # 1. School-wide grade average
-            cursor.execute('''
-                SELECT AVG(score) FROM grades WHERE school_id = %s
-            ''', (current_user.school_id,))
-            avg_score = cursor.fetchone()[0] or 0
-            
-            # 2. School-wide attendance distribution
-            cursor.execute('''
-                SELECT status, COUNT(*) as count 
-                FROM attendance WHERE school_id = %s GROUP BY status
-            ''', (current_user.school_id,))
-            attendance = cursor.fetchall()
-            att_dict = {row['status']: row['count'] for row in attendance}
-            chart_data['attendance_values'] = [att_dict.get('Present', 0), att_dict.get('Absent', 0), att_dict.get('Late', 0)]
-            
-            # 3. Faculty count
-            cursor.execute('''
-                SELECT COUNT(*) FROM users WHERE school_id = %s AND role = 'teacher'
-            ''', (current_user.school_id,))
-            teacher_count = cursor.fetchone()[0]
-            
-            # 4. Student count
-            cursor.execute('''
-                SELECT COUNT(*) FROM users WHERE school_id = %s AND role = 'student'
-            ''', (current_user.school_id,))
-            student_count = cursor.fetchone()[0]
+            # School-wide averages and counts come from the school_stats rollup (one row)
+            summary = get_school_stats(cursor, current_user.school_id)
+            avg_score = summary['grade_total'] / summary['grade_count'] if summary['grade_count'] else 0
+            chart_data['attendance_values'] = [summary['present_count'], summary['absent_count'], summary['late_count']]
 
             stats = {
                 'card1_label': _('School Average'), 'card1_value': f"{round(avg_score, 1)}%",
-                'card2_label': _('Total Faculty'), 'card2_value': teacher_count,
-                'card3_label': _('Total Students'), 'card3_value': student_count,
+                'card2_label': _('Total Faculty'), 'card2_value': summary['teacher_count'],
+                'card3_label': _('Total Students'), 'card3_value': summary['student_count'],
                 'card4_label': _('Status'), 'card4_value': _('Active Monitoring')
             }
             
-            # Recent school activity
+            # Recent school activity: each branch reads the newest 5 off its index
             cursor.execute('''
-                SELECT 'New Admission' as type, full_name as detail, created_at as ts
-                FROM student_details WHERE school_id = %s
+                SELECT type, detail, ts FROM (
+                    SELECT 'New Admission' as type, full_name as detail, created_at as ts
+                    FROM student_details WHERE school_id = %s
+                    ORDER BY created_at DESC LIMIT 5
+                ) admissions
                 UNION ALL
-                SELECT 'Grade Posted' as type, 'Classwide' as detail, date_recorded as ts
-                FROM grades WHERE school_id = %s
+                SELECT type, detail, ts FROM (
+                    SELECT 'Grade Posted' as type, 'Classwide' as detail, date_recorded as ts
+                    FROM grades WHERE school_id = %s
+                    ORDER BY date_recorded DESC LIMIT 5
+                ) grades_posted
                 ORDER BY ts DESC LIMIT 5
             ''', (current_user.school_id, current_user.school_id))
-            recent_activity = cursor.fetchall()
+            recent_activity = [dict(row) for row in cursor.fetchall()]
 
         else:
             cursor.execute('SELECT COUNT(*) FROM users WHERE school_id = %s', (current_user.school_id,))
@@ -203,8 +225,16 @@ def dashboard():
                 'card4_label': _('Role'), 'card4_value': _(current_user.role.capitalize())
             }
 
-    return render_template('dashboard.html', user=current_user, chart_data=chart_data, stats=stats, 
-                           recent_activity=recent_activity, notifications=notifications)
+    return {'chart_data': chart_data, 'stats': stats,
+            'recent_activity': recent_activity, 'notifications': notifications}
+
+
+@dashboard_bp.route('/dashboard')
+@login_required
+def dashboard():
+    data = get_dashboard(current_user.school_id, current_user.role, current_user.id, str(get_locale()),
+                         lambda: build_dashboard(get_db()))
+    return render_template('dashboard.html', user=current_user, **data)
 
 
 @dashboard_bp.route('/profile')
@@ -1,7 +1,7 @@
 import os
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
-from db import get_db
+from db import get_db, advisory_xact_lock, LOCK_EXAM_ANALYSIS
 from werkzeug.utils import secure_filename
 from utils.ai_engine import ExamAIEngine
 from datetime import datetime
@@ -12,7 +12,7 @@ ai_engine = ExamAIEngine()
 @exam_predictor_bp.route('/exam-predictor')
 @login_required
 def dashboard():
-    db = get_db()
+    db = get_db(readonly=True)
     from db import db_cursor
     with db_cursor(db) as cursor:
         # Fetch uploaded docs
@@ -125,37 +125,35 @@ def run_analysis(student_id, school_id):
             
             print(f"DEBUG: Detected {len(topics)} topics. Updating database...")
 
+            # Two workers analysing the same student would otherwise interleave
+            # their delete-and-insert and leave duplicate predictions.
+            advisory_xact_lock(cursor, LOCK_EXAM_ANALYSIS, student_id)
+
             # Clear old predictions for this student
             cursor.execute('DELETE FROM predicted_topics WHERE student_id = %s AND school_id = %s', (student_id, school_id))
             
-            # Insert new predictions
-            for t in topics:
-                cursor.execute('''
-                    INSERT INTO predicted_topics (student_id, topic_name, probability, importance_level, school_id)
-                    VALUES (%s, %s, %s, %s, %s) RETURNING id
-                ''', (student_id, t['topic'], t['probability'], t['importance'], school_id))
-                topic_id = cursor.fetchone()[0]
-                
-                # Generate and insert questions for this topic
-                questions = ai_engine.generate_questions([t])
-                for q in questions:
-                    cursor.execute('''
-                        INSERT INTO predicted_questions (topic_id, question_text, school_id)
-                        VALUES (%s, %s, %s)
-                    ''', (topic_id, q['question'], school_id))
+            # Insert new predictions (ids come back in the same order as topics)
+            topic_ids = cursor.bulk_insert(
+                'predicted_topics', ('student_id', 'topic_name', 'probability', 'importance_level', 'school_id'),
+                [(student_id, t['topic'], t['probability'], t['importance'], school_id) for t in topics],
+                returning='id'
+            )
+            topic_id_by_name = {t['topic']: topic_id for t, topic_id in zip(topics, topic_ids)}
+
+            # Generate and insert questions for each topic
+            question_rows = []
+            for t, topic_id in zip(topics, topic_ids):
+                for q in ai_engine.generate_questions([t]):
+                    question_rows.append((topic_id, q['question'], school_id))
+            cursor.bulk_insert('predicted_questions', ('topic_id', 'question_text', 'school_id'), question_rows)
             
             # Generate Revision Plan (default 7 days)
             plan = ai_engine.generate_revision_plan(topics, 7)
             cursor.execute('DELETE FROM revision_plans WHERE student_id = %s AND school_id = %s', (student_id, school_id))
-            for p in plan:
-                # Find the topic_id for this topic name
-                cursor.execute('SELECT id FROM predicted_topics WHERE student_id = %s AND topic_name = %s AND school_id = %s', (student_id, p['topic'], school_id))
-                row = cursor.fetchone()
-                if row:
-                    cursor.execute('''
-                        INSERT INTO revision_plans (student_id, topic_id, scheduled_date, school_id)
-                        VALUES (%s, %s, %s, %s)
-                    ''', (student_id, row[0], p['date'], school_id))
+            cursor.bulk_insert(
+                'revision_plans', ('student_id', 'topic_id', 'scheduled_date', 'school_id'),
+                [(student_id, topic_id_by_name[p['topic']], p['date'], school_id) for p in plan if p['topic'] in topic_id_by_name]
+            )
             
             db.commit()
             print("DEBUG: Analysis completed successfully.")
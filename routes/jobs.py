@@ -0,0 +1,58 @@
+import os
+from flask import Blueprint, render_template, redirect, url_for, request, current_app, send_file, abort
+from flask_login import login_required, current_user
+from db import get_db
+from jobs import enqueue, get_job, artifact_path
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+def job_response(kind, payload):
+    """
+    Queue a job for the current user and answer at once: JSON clients get
+    202 with the job id, browsers are sent to the job's status page.
+    """
+    job_id = enqueue(get_db(), kind, payload, current_user.id, current_user.school_id)
+    if request.accept_mimetypes.best == 'application/json':
+        return {'job_id': job_id, 'status_url': url_for('jobs.status', job_id=job_id)}, 202
+    return redirect(url_for('jobs.view', job_id=job_id))
+
+
+def _own_job(job_id):
+    # Artifacts hold whole-school data: only the user who asked can see them.
+    job = get_job(get_db(), job_id)
+    if not job or job['user_id'] != current_user.id:
+        abort(404)
+    return job
+
+
+@jobs_bp.route('/jobs/<int:job_id>')
+@login_required
+def view(job_id):
+    return render_template('job_status.html', job=_own_job(job_id), user=current_user)
+
+
+@jobs_bp.route('/jobs/<int:job_id>/status')
+@login_required
+def status(job_id):
+    job = _own_job(job_id)
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'error': job['error'] if job['status'] == 'failed' else None,
+        'download_url': url_for('jobs.download', job_id=job_id) if job['status'] == 'done' else None,
+    }
+
+
+@jobs_bp.route('/jobs/<int:job_id>/download')
+@login_required
+def download(job_id):
+    job = _own_job(job_id)
+    path = artifact_path(current_app, job_id)
+    # A worker on another host writes to its own disk; see "Background jobs" in the README.
+    if job['status'] != 'done' or not os.path.exists(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=job['download_name'])
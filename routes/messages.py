@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from db import get_db
+from helpers import add_unread, remove_unread, get_unread_count
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -32,9 +33,7 @@ def inbox():
         ''', (current_user.id, current_user.id, current_user.id, current_user.id, current_user.school_id, current_user.id))
         conversations = cursor.fetchall()
 
-        # Get unread count
-        cursor.execute('SELECT COUNT(*) FROM messages WHERE recipient_id = %s AND is_read = 0 AND school_id = %s', (current_user.id, current_user.school_id))
-        unread_total = cursor.fetchone()[0]
+        unread_total = get_unread_count(cursor, current_user.id, current_user.school_id)
 
     return render_template('messages/inbox.html', conversations=conversations, unread_total=unread_total, user=current_user)
 
@@ -66,8 +65,10 @@ def chat(other_user_id):
                 flash('User not found.', 'error')
                 return redirect(url_for('messages.inbox'))
 
-            # Mark as read
-            cursor.execute('UPDATE messages SET is_read = 1 WHERE sender_id = %s AND recipient_id = %s AND school_id = %s', (other_user_id, current_user.id, current_user.school_id))
+            # Mark as read (only unread rows, so rowcount is what the counter drops by)
+            cursor.execute('UPDATE messages SET is_read = %s WHERE sender_id = %s AND recipient_id = %s AND school_id = %s AND is_read = %s',
+                           (True, other_user_id, current_user.id, current_user.school_id, False))
+            remove_unread(cursor, current_user.id, current_user.school_id, cursor.rowcount)
             db.commit()
 
             # Fetch history
@@ -106,6 +107,7 @@ def send_message():
 
         cursor.execute('INSERT INTO messages (sender_id, recipient_id, content, school_id) VALUES (%s, %s, %s, %s)',
                    (current_user.id, recipient_id, content, current_user.school_id))
+        add_unread(cursor, recipient_id, current_user.school_id)
     db.commit()
     
     return redirect(url_for('messages.chat', other_user_id=recipient_id))
@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 import os
 from flask_login import login_required, current_user
 from db import get_db, db_cursor
+from helpers import invalidate_school
+from jobs import job_kind
+from routes.jobs import job_response
 
 schools_bp = Blueprint('schools', __name__)
 
@@ -25,6 +28,19 @@ def list_schools():
         
     return render_template('superadmin_schools.html', schools=schools, user=current_user)
 
+@schools_bp.route('/superadmin/stats')
+@login_required
+def runtime_stats():
+    """This worker's connection pool and cache counters."""
+    redir = _require_superadmin()
+    if redir: return redir
+
+    from db import pool_stats
+    from dashboard_cache import dashboard_cache_stats
+    from extensions import cache
+    return {"db_pool": pool_stats(), "db_read_pool": pool_stats(readonly=True),
+            "cache": cache.stats(), "dashboard_cache": dashboard_cache_stats()}, 200
+
 @schools_bp.route('/superadmin/schools/add', methods=['POST'])
 @login_required
 def add_school():
@@ -47,6 +63,7 @@ def add_school():
                 (name, slug, primary_color)
             )
         db.commit()
+        invalidate_school(slug=slug)
         flash(f'School "{name}" created successfully!', 'success')
     except Exception as e:
         db.rollback()
@@ -101,16 +118,16 @@ def school_details(school_id):
 def export_school_data(school_id):
     redir = _require_superadmin()
     if redir: return redir
+    return job_response('school_excel', {'school_id': school_id})
 
+
+@job_kind('school_excel')
+def school_excel_job(payload, output):
     from utils.reports import generate_school_excel
-    from flask import send_file
-    
-    filepath = generate_school_excel(school_id)
-    if not filepath:
-        flash('Failed to generate report.', 'error')
-        return redirect(url_for('schools.list_schools'))
-    
-    return send_file(filepath, as_attachment=True)
+    filename = generate_school_excel(payload['school_id'], output)
+    if not filename:
+        raise LookupError(f"school {payload['school_id']} not found")
+    return filename
 
 @schools_bp.route('/settings/school', methods=['GET', 'POST'])
 @login_required
@@ -172,6 +189,7 @@ def school_settings():
                         (name, academic_session, support_email, submitted_school_id)
                     )
         db.commit()
+        invalidate_school(submitted_school_id)
         flash('School settings updated successfully!', 'success')
         return redirect(url_for('schools.school_settings', school_id=submitted_school_id))
 
@@ -3,8 +3,12 @@ from flask_login import login_required, current_user
 from flask_mail import Message
 from werkzeug.security import generate_password_hash
 from db import get_db, db_cursor
+from dashboard_cache import bump_dashboard_version
 from extensions import mail
 from helpers import generate_credentials
+from jobs import delete_user_jobs, remove_artifacts
+from models import invalidate_user
+from school_stats import adjust_school_stats, refresh_school_stats
 import io
 import csv
 
@@ -106,7 +110,10 @@ def add_teacher():
                    VALUES (%s, %s, %s, %s, %s, %s)''',
                 (user_id, full_name, email, mobile, department, target_school_id)
             )
+            if role == 'teacher':
+                adjust_school_stats(cursor, target_school_id, teacher_count=1)
         db.commit()
+        bump_dashboard_version(target_school_id)
 
         # Auto-link this email to the account and send a verification link.
         try:
@@ -162,8 +169,15 @@ def delete_teacher(user_id):
             # Unlink from classrooms first (ensure school isolation)
             cursor.execute('UPDATE classrooms SET teacher_id = NULL WHERE teacher_id = %s AND school_id = %s', (user_id, current_user.school_id))
             cursor.execute('DELETE FROM teacher_details WHERE user_id = %s AND school_id = %s', (user_id, current_user.school_id))
+            # Counter and job rows reference users and would block the delete on PostgreSQL
+            cursor.execute('DELETE FROM unread_counters WHERE user_id = %s AND school_id = %s', (user_id, current_user.school_id))
+            job_ids = delete_user_jobs(cursor, user_id, current_user.school_id)
             cursor.execute('DELETE FROM users WHERE id = %s AND school_id = %s', (user_id, current_user.school_id))
+            refresh_school_stats(cursor, current_user.school_id)
         db.commit()
+        remove_artifacts(current_app, job_ids)
+        invalidate_user(user_id)
+        bump_dashboard_version(current_user.school_id)
         flash('Staff member removed successfully.', 'success')
     except Exception as e:
         db.rollback()
@@ -193,62 +207,63 @@ def import_teachers():
     
     stream = io.StringIO(content, newline=None)
     csv_input = csv.DictReader(stream)
-    
+
+    pending = []
+    for row in csv_input:
+        full_name = row.get('full_name', '').strip()
+        email = row.get('email', '').strip()
+        if not full_name or not email:
+            continue
+
+        username, password = generate_credentials(full_name)
+        pending.append({
+            'full_name': full_name,
+            'email': email,
+            'department': row.get('department', 'General').strip(),
+            'mobile': row.get('mobile', '').strip() or None,
+            'status': row.get('status', 'Active').strip(),
+            'username': username,
+            'password': password,
+        })
+
+    if not pending:
+        flash('No valid rows found. Each row needs full_name and email.', 'warning')
+        return redirect(url_for('staff.list_staff', school_id=target_school_id))
+
     db = get_db()
-    count = 0
-    errors = []
-    
     try:
-        from db import db_cursor
         with db_cursor(db) as cursor:
-            for row in csv_input:
-                full_name = row.get('full_name', '').strip()
-                email = row.get('email', '').strip()
-                department = row.get('department', 'General').strip()
-                mobile = row.get('mobile', '').strip()
-                status = row.get('status', 'Active').strip()
-                
-                if not full_name or not email:
-                    continue
-                
-                username, password = generate_credentials(full_name)
-                hashed_password = generate_password_hash(password)
-                
-                try:
-                    # 1. Create User
-                    cursor.execute(
-                        'INSERT INTO users (username, password_hash, role, school_id) VALUES (%s, %s, %s, %s) RETURNING id',
-                        (username, hashed_password, 'teacher', target_school_id)
-                    )
-                    user_id = cursor.fetchone()[0]
-                    
-                    # 2. Create Teacher Details
-                    cursor.execute(
-                        'INSERT INTO teacher_details (user_id, full_name, email, mobile, department, status, school_id) VALUES (%s, %s, %s, %s, %s, %s, %s)',
-                        (user_id, full_name, email, mobile or None, department, status, target_school_id)
-                    )
-                    
-                    # 3. Send Credentials Email
-                    msg = Message('Student OS - Faculty Credentials', recipients=[email])
-                    msg.body = f"Welcome Professor {full_name}!\n\nYour faculty account is ready.\nUsername: {username}\nPassword: {password}\n\nLogin: {request.host_url}"
-                    try:
-                        mail.send(msg)
-                    except: pass
-                    
-                    count += 1
-                except Exception as e:
-                    errors.append(f"Row {count+2}: {str(e)}")
-                    
+            # 1. Create Users (ids come back in CSV order)
+            user_ids = cursor.bulk_insert(
+                'users', ('username', 'password_hash', 'role', 'school_id'),
+                [(p['username'], generate_password_hash(p['password']), 'teacher', target_school_id) for p in pending],
+                returning='id'
+            )
+
+            # 2. Create Teacher Details
+            cursor.bulk_insert(
+                'teacher_details',
+                ('user_id', 'full_name', 'email', 'mobile', 'department', 'status', 'school_id'),
+                [(user_id, p['full_name'], p['email'], p['mobile'], p['department'], p['status'], target_school_id)
+                 for p, user_id in zip(pending, user_ids)]
+            )
+            adjust_school_stats(cursor, target_school_id, teacher_count=len(user_ids))
         db.commit()
-        if errors:
-            flash(f'Imported {count} teachers with {len(errors)} errors.', 'warning')
-        else:
-            flash(f'Successfully imported {count} teachers!', 'success')
-            
+        bump_dashboard_version(target_school_id)
     except Exception as e:
         db.rollback()
         flash(f'Import failed: {str(e)}', 'error')
-        
+        return redirect(url_for('staff.list_staff', school_id=target_school_id))
+
+    # 3. Send Credentials Emails (only once the accounts are committed)
+    for p in pending:
+        msg = Message('Student OS - Faculty Credentials', recipients=[p['email']])
+        msg.body = f"Welcome Professor {p['full_name']}!\n\nYour faculty account is ready.\nUsername: {p['username']}\nPassword: {p['password']}\n\nLogin: {request.host_url}"
+        try:
+            mail.send(msg)
+        except: pass
+
+    flash(f'Successfully imported {len(pending)} teachers!', 'success')
     return redirect(url_for('staff.list_staff', school_id=target_school_id))
 
 @staff_bp.route('/admin/staff/update/<int:user_id>', methods=['POST'])
@@ -273,7 +288,11 @@ def update_staff(user_id):
                 UPDATE teacher_details SET full_name = %s, email = %s, mobile = %s, department = %s, status = %s
                 WHERE user_id = %s AND school_id = %s
             ''', (full_name, email, mobile, department, status, user_id, target_school_id))
+            # A role change moves the user between the faculty/student counts
+            refresh_school_stats(cursor, target_school_id)
         db.commit()
+        invalidate_user(user_id)
+        bump_dashboard_version(target_school_id)
         flash('Staff details updated successfully.', 'success')
     except Exception as e:
         db.rollback()
@@ -225,3 +225,30 @@ CREATE TABLE IF NOT EXISTS teacher_details (
     FOREIGN KEY (user_id) REFERENCES users (id),
     FOREIGN KEY (school_id) REFERENCES schools (id)
 );
+
+-- Indexes for the school_id-scoped access patterns (kept in sync with migrations.SCHOOL_SCOPED_INDEXES)
+CREATE INDEX IF NOT EXISTS idx_users_school_role ON users (school_id, role);
+CREATE INDEX IF NOT EXISTS idx_classrooms_teacher ON classrooms (teacher_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_courses_teacher ON courses (teacher_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_courses_school ON courses (school_id);
+CREATE INDEX IF NOT EXISTS idx_enrollments_course ON enrollments (course_id, student_id);
+CREATE INDEX IF NOT EXISTS idx_grades_student_course ON grades (student_id, course_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_grades_course ON grades (course_id);
+CREATE INDEX IF NOT EXISTS idx_grades_school_recorded ON grades (school_id, date_recorded);
+CREATE INDEX IF NOT EXISTS idx_attendance_student_course_date ON attendance (student_id, course_id, date, school_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_course ON attendance (course_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_school_status ON attendance (school_id, status);
+CREATE INDEX IF NOT EXISTS idx_assignments_course ON assignments (course_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_assignment ON submissions (assignment_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_student ON submissions (student_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id, school_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_messages_recipient_unread ON messages (recipient_id, is_read, school_id);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (sender_id, recipient_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_remarks_student ON remarks (student_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_student_details_classroom ON student_details (classroom_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_student_details_school ON student_details (school_id);
+CREATE INDEX IF NOT EXISTS idx_teacher_details_school ON teacher_details (school_id);
+CREATE INDEX IF NOT EXISTS idx_exam_assets_student ON exam_assets (student_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_predicted_topics_student ON predicted_topics (student_id, school_id);
+CREATE INDEX IF NOT EXISTS idx_predicted_questions_topic ON predicted_questions (topic_id);
+CREATE INDEX IF NOT EXISTS idx_revision_plans_student ON revision_plans (student_id, school_id);
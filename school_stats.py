@@ -0,0 +1,99 @@
+"""
+school_stats: one pre-aggregated row per school for the principal dashboard.
+
+Writers keep it current in the same transaction as the base-table write via
+adjust_school_stats(); anything that can't express a cheap delta (role
+changes, bulk SQL, seed scripts) calls refresh_school_stats() instead, and
+`flask --app app refresh-stats` recomputes every school on a schedule.
+"""
+
+ATTENDANCE_COLUMNS = {'Present': 'present_count', 'Absent': 'absent_count', 'Late': 'late_count'}
+
+COUNTER_COLUMNS = ('grade_count', 'grade_total', 'present_count', 'absent_count', 'late_count',
+                   'teacher_count', 'student_count')
+
+
+def compute_school_stats(cursor, school_id):
+    """The rollup for one school, computed from the base tables."""
+    cursor.execute('SELECT COUNT(*), COALESCE(SUM(score), 0) FROM grades WHERE school_id = %s', (school_id,))
+    grade_count, grade_total = cursor.fetchone()
+    stats = {'school_id': school_id, 'grade_count': grade_count, 'grade_total': float(grade_total),
+             'present_count': 0, 'absent_count': 0, 'late_count': 0, 'teacher_count': 0, 'student_count': 0}
+
+    cursor.execute('SELECT status, COUNT(*) FROM attendance WHERE school_id = %s GROUP BY status', (school_id,))
+    for status, count in cursor.fetchall():
+        if status in ATTENDANCE_COLUMNS:
+            stats[ATTENDANCE_COLUMNS[status]] = count
+
+    cursor.execute("SELECT role, COUNT(*) FROM users WHERE school_id = %s AND role IN ('teacher', 'student') GROUP BY role",
+                   (school_id,))
+    for role, count in cursor.fetchall():
+        stats[f'{role}_count'] = count
+    return stats
+
+
+def refresh_school_stats(cursor, school_id):
+    """Recompute and store one school's row. Returns the stats dict."""
+    stats = compute_school_stats(cursor, school_id)
+    columns = ', '.join(COUNTER_COLUMNS)
+    updates = ', '.join(f'{c} = excluded.{c}' for c in COUNTER_COLUMNS)
+    cursor.execute(f'''
+        INSERT INTO school_stats (school_id, {columns}, refreshed_at)
+        VALUES (%s, {', '.join(['%s'] * len(COUNTER_COLUMNS))}, CURRENT_TIMESTAMP)
+        ON CONFLICT (school_id) DO UPDATE SET {updates}, refreshed_at = CURRENT_TIMESTAMP
+    ''', (school_id, *[stats[c] for c in COUNTER_COLUMNS]))
+    return stats
+
+
+def refresh_all_school_stats(db):
+    """Recompute every school's row (the scheduled job). Returns the number of schools."""
+    from db import db_cursor
+    with db_cursor(db) as cursor:
+        cursor.execute('SELECT id FROM schools')
+        school_ids = [row[0] for row in cursor.fetchall()]
+        for school_id in school_ids:
+            refresh_school_stats(cursor, school_id)
+    db.commit()
+    return len(school_ids)
+
+
+def adjust_school_stats(cursor, school_id, **deltas):
+    """
+    Add deltas (e.g. grade_count=1, grade_total=87.5) to a school's row. A
+    school without a row yet is computed from scratch instead, which already
+    includes the caller's uncommitted write.
+    """
+    deltas = {c: d for c, d in deltas.items() if d}
+    if not deltas:
+        return
+    unknown = set(deltas) - set(COUNTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown school_stats columns: {sorted(unknown)}")
+    assignments = ', '.join(f'{c} = {c} + %s' for c in deltas)
+    cursor.execute(f'UPDATE school_stats SET {assignments} WHERE school_id = %s', (*deltas.values(), school_id))
+    if cursor.rowcount == 0:
+        refresh_school_stats(cursor, school_id)
+
+
+def attendance_deltas(status, old_status=None):
+    """adjust_school_stats() kwargs for a new attendance row, or a status change."""
+    deltas = {}
+    if status in ATTENDANCE_COLUMNS:
+        deltas[ATTENDANCE_COLUMNS[status]] = 1
+    if old_status in ATTENDANCE_COLUMNS:
+        column = ATTENDANCE_COLUMNS[old_status]
+        deltas[column] = deltas.get(column, 0) - 1
+    return deltas
+
+
+def get_school_stats(cursor, school_id):
+    """
+    The stored row as a dict. A school with no row yet (nothing written
+    since the last refresh) is computed on the fly without storing, so this
+    stays safe on a read-only replica connection.
+    """
+    cursor.execute(f'SELECT school_id, {", ".join(COUNTER_COLUMNS)} FROM school_stats WHERE school_id = %s', (school_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return compute_school_stats(cursor, school_id)
+    return dict(zip(('school_id',) + COUNTER_COLUMNS, row))
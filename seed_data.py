@@ -36,6 +36,7 @@ def seed():
         cursor.execute('DELETE FROM submissions')
         cursor.execute('DELETE FROM notifications')
         cursor.execute('DELETE FROM messages')
+        cursor.execute('DELETE FROM unread_counters')
         cursor.execute('DELETE FROM remarks')
         cursor.execute('DELETE FROM student_details')
         cursor.execute('DELETE FROM courses')
@@ -127,6 +128,8 @@ def seed():
                                (student['id'], course_id, date, status))
 
         db.commit()
+    from school_stats import refresh_all_school_stats
+    refresh_all_school_stats(db)
     print("Database seeded successfully!")
     db.close()
 
@@ -0,0 +1,105 @@
+import io
+import zipfile
+
+import pytest
+
+import reports
+from conftest import login_client
+from db import db_cursor, get_db
+
+
+def build_roster(app, students):
+    with app.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (1, 'head', 'x', 'principal', 1)")
+            ids = range(100, 100 + students)
+            cursor.bulk_insert('users', ('id', 'username', 'password_hash', 'role', 'school_id'),
+                               [(i, f's{i}', 'x', 'student', 1) for i in ids])
+            cursor.execute("INSERT INTO courses (id, name, teacher_id, school_id) VALUES (1, 'Physics', 1, 1)")
+            cursor.bulk_insert('grades', ('student_id', 'course_id', 'score', 'grade_type', 'school_id'),
+                               [(i, 1, score, 'Exam', 1) for i in ids for score in (60, 80)])
+            cursor.bulk_insert('attendance', ('student_id', 'course_id', 'date', 'status', 'school_id'),
+                               [(i, 1, f'2026-01-0{d}', status, 1) for i in ids for d, status in ((1, 'Present'), (2, 'Absent'))])
+            cursor.execute("INSERT INTO remarks (student_id, teacher_id, term, remarks, school_id, created_at) "
+                           "VALUES (100, 1, 'Term 1', 'old', 1, '2026-01-01 00:00:00')")
+            cursor.execute("INSERT INTO remarks (student_id, teacher_id, term, remarks, school_id, created_at) "
+                           "VALUES (100, 1, 'Term 2', 'new', 1, '2026-03-01 00:00:00')")
+        db.commit()
+
+
+def batch_download(app):
+    import jobs
+
+    client = login_client(app, 1)
+    response = client.get('/report/batch', headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    assert jobs.work_once(app)
+    response = client.get(f"/jobs/{response.get_json()['job_id']}/download")
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize('students', [3, 30])
+def test_batch_reports_query_count_is_constant(school, students):
+    from db import query_stats
+    from routes.academic import load_report_cards
+
+    build_roster(school, students)
+    with school.app_context():
+        assert len(load_report_cards(get_db(), 1)) == students
+        # students, grades, attendance, remarks
+        assert query_stats()['count'] == 4
+
+
+def test_batch_reports_job_builds_zip(school):
+    build_roster(school, 5)
+    archive = zipfile.ZipFile(io.BytesIO(batch_download(school).data))
+    assert sorted(archive.namelist()) == [f'Report_Card_s{i}.pdf' for i in range(100, 105)]
+    assert archive.testzip() is None
+    assert all(archive.read(name).startswith(b'%PDF') for name in archive.namelist())
+
+
+def test_load_report_cards_groups_per_student(school):
+    from routes.academic import load_report_cards
+
+    build_roster(school, 2)
+    with school.app_context():
+        cards = load_report_cards(get_db(), 1)
+    assert [c['student']['username'] for c in cards] == ['s100', 's101']
+    first = cards[0]
+    assert [(g['name'], g['avg_score']) for g in first['grades']] == [('Physics', 70)]
+    assert sorted((a['status'], a['count']) for a in first['attendance']) == [('Absent', 1), ('Present', 1)]
+    assert first['remarks']['remarks'] == 'new'
+    assert cards[1]['remarks'] == {}
+
+
+def test_render_report_cards_in_process_pool(school, monkeypatch):
+    from routes.academic import load_report_cards
+
+    build_roster(school, 4)
+    with school.app_context():
+        cards = load_report_cards(get_db(), 1)
+    monkeypatch.setattr(reports, 'REPORT_POOL_MIN_CARDS', 1)
+    rendered = dict(reports.render_report_cards('Test University', cards, workers=2))
+    assert sorted(rendered) == [f'Report_Card_s{i}.pdf' for i in range(100, 104)]
+    assert all(pdf.startswith(b'%PDF') for pdf in rendered.values())
+
+
+def test_reused_renderer_matches_a_fresh_one(monkeypatch):
+    from reportlab import rl_config
+
+    # Invariant mode drops timestamps and random ids, so equal layouts give equal bytes.
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+    student = {'username': 's1', 'role': 'student'}
+    grades = [{'name': 'Physics', 'avg_score': 72.5}, {'name': 'History', 'avg_score': 41.0}]
+    attendance = [{'status': 'Present', 'count': 9}, {'status': 'Absent', 'count': 1}]
+    remarks = {'term': 'Term 2', 'remarks': 'Steady progress.'}
+
+    renderer = reports.get_renderer('Test University')
+    assert reports.get_renderer('Test University') is renderer
+    renderer.render({'username': 'other', 'role': 'student'}, [], [], {})
+    reused = renderer.render(student, grades, attendance, remarks).getvalue()
+    fresh = reports.ReportCardRenderer('Test University').render(student, grades, attendance, remarks).getvalue()
+    assert reused == fresh
+    assert reports.generate_student_report_card('Test University', student, grades, attendance, remarks).getvalue() == fresh
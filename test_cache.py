@@ -0,0 +1,100 @@
+import os
+import time
+
+import pytest
+from flask import Flask
+
+from cache import Cache, TTLCache, dumps, loads
+
+
+def make_cache(**config):
+    app = Flask(__name__)
+    app.config.update(CACHE_URL=None, CACHE_KEY_PREFIX='test', **config)
+    return Cache(app)
+
+
+def test_memory_backend_by_default():
+    cache = make_cache()
+    assert not cache.shared
+    assert isinstance(cache.backend, TTLCache)
+
+
+def test_get_set_delete_with_school_namespaces():
+    cache = make_cache()
+    cache.set('settings', {'theme': 'dark'}, school_id=1)
+    cache.set('settings', {'theme': 'light'}, school_id=2)
+    assert cache.get('settings', school_id=1) == {'theme': 'dark'}
+    assert cache.get('settings', school_id=2) == {'theme': 'light'}
+    assert cache.get('settings') is None
+
+    cache.delete('settings', school_id=1)
+    assert cache.get('settings', 'gone', school_id=1) == 'gone'
+    assert cache.get('settings', school_id=2) == {'theme': 'light'}
+
+
+def test_clear_one_school():
+    cache = make_cache()
+    cache.set('a', 1, school_id=1)
+    cache.set('a', 2, school_id=12)
+    cache.set('global', 3)
+    cache.clear(school_id=1)
+    assert cache.get('a', school_id=1) is None
+    assert cache.get('a', school_id=12) == 2
+    assert cache.get('global') == 3
+
+
+def test_ttl_expiry():
+    cache = make_cache()
+    cache.set('short', 'x', ttl=0.05)
+    cache.set('long', 'y', ttl=60)
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.get('long') == 'y'
+
+
+def test_incr_counts_and_expires_from_creation():
+    cache = make_cache()
+    assert cache.incr('hits', ttl=0.1, school_id=1) == 1
+    assert cache.incr('hits', 4, school_id=1) == 5
+    assert cache.get('hits', school_id=1) == 5
+    time.sleep(0.15)
+    assert cache.incr('hits', school_id=1) == 1
+
+
+def test_lru_bound():
+    cache = make_cache(CACHE_MAXSIZE=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
+def test_shared_values_round_trip_through_json():
+    from datetime import date, datetime
+    from decimal import Decimal
+
+    payload = {'created_at': datetime(2026, 3, 1, 9, 30), 'due_date': date(2026, 3, 2),
+               'avg': Decimal('87.5'), 'labels': ['Physics'], 'count': 3, 'empty': None}
+    assert loads(dumps(payload)) == payload
+    assert loads(dumps((1, 'asha', 'student', 1))) == [1, 'asha', 'student', 1]
+    # incr() counters are stored as bare integers by the server.
+    assert loads(b'-4') == -4
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+@pytest.mark.skipif(not os.getenv('CACHE_TEST_URL'), reason='set CACHE_TEST_URL to a disposable Redis-compatible server')
+def test_shared_backend_round_trip():
+    pytest.importorskip('redis')
+    cache = make_cache(CACHE_URL=os.environ['CACHE_TEST_URL'], CACHE_KEY_PREFIX='student_os_test')
+    assert cache.shared
+    cache.clear()
+    cache.set('row', {'id': 1}, school_id=1)
+    assert cache.get('row', school_id=1) == {'id': 1}
+    assert cache.incr('n', ttl=30) == 1
+    assert cache.incr('n', 2) == 3
+    assert cache.get('n') == 3
+    cache.clear(school_id=1)
+    assert cache.get('row', school_id=1) is None
+    cache.clear()
@@ -0,0 +1,108 @@
+import pytest
+
+from conftest import login_client
+from db import db_cursor, get_db
+
+COURSES = 8
+
+
+def build_classroom(app, students):
+    with app.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (1, 'head', 'x', 'principal', 1)")
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'mr_rao', 'x', 'teacher', 1)")
+            cursor.execute("INSERT INTO classrooms (id, name, teacher_id, school_id) VALUES (1, 'Grade 9 A', 2, 1)")
+            ids = range(100, 100 + students)
+            cursor.bulk_insert('users', ('id', 'username', 'password_hash', 'role', 'school_id'),
+                               [(i, f's{i}', 'x', 'student', 1) for i in ids])
+            cursor.bulk_insert('student_details', ('user_id', 'full_name', 'admission_number', 'classroom_id', 'school_id'),
+                               [(i, f'Student {i}', f'ADM{i}', 1, 1) for i in ids])
+            cursor.bulk_insert('courses', ('id', 'name', 'teacher_id', 'school_id'),
+                               [(c, f'Course {c}', 2, 1) for c in range(1, COURSES + 1)])
+            cursor.bulk_insert('enrollments', ('student_id', 'course_id', 'school_id'),
+                               [(i, c, 1) for i in ids for c in range(1, COURSES + 1)])
+            # Two grades per cell averaging (student + course) % 100, except course 1 which stays empty.
+            cursor.bulk_insert('grades', ('student_id', 'course_id', 'score', 'grade_type', 'school_id'),
+                               [(i, c, (i + c) % 100 + delta, 'Exam', 1)
+                                for i in ids for c in range(2, COURSES + 1) for delta in (-0.5, 0.5)])
+        db.commit()
+
+
+def detail_page(app):
+    response = login_client(app, 1).get('/classrooms/1')
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize('students', [3, 60])
+def test_grades_matrix_query_count_is_constant(school, students):
+    build_classroom(school, students)
+    response = detail_page(school)
+    # user_loader + tenant + unread badge + classroom, roster, available students, courses, matrix
+    assert response.headers['Server-Timing'].endswith('desc="8 queries"')
+
+
+def test_grades_matrix_values(school):
+    build_classroom(school, 2)
+    html = detail_page(school).get_data(as_text=True)
+    row = html[html.index('>Student 101</td>'):]
+    row = row[:row.index('</tr>')]
+    cells = [cell.split('>', 1)[1].split('</span>')[0].strip() for cell in row.split('score-pill')[1:]]
+    # Course 1 has no grades; course c averages (101 + c) % 100.
+    assert cells == ['0%'] + [f'{float((101 + c) % 100)}%' for c in range(2, COURSES + 1)]
+
+
+def export(app):
+    import jobs
+
+    client = login_client(app, 1)
+    response = client.get('/classrooms/1/export', headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    assert jobs.work_once(app)
+    response = client.get(f"/jobs/{response.get_json()['job_id']}/download")
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize('students', [3, 60])
+def test_excel_export_query_count_is_constant(school, students):
+    import io
+    from db import query_stats
+    from routes.classrooms import write_classroom_workbook
+
+    build_classroom(school, students)
+    with school.app_context():
+        assert write_classroom_workbook(get_db(), 1, 1, io.BytesIO()).endswith('.xlsx')
+        # classroom, courses, roster summary, grouped grades
+        assert query_stats()['count'] == 4
+
+
+def test_excel_export_contents(school):
+    import io
+    from openpyxl import load_workbook
+
+    build_classroom(school, 12)
+    with school.app_context():
+        with db_cursor(get_db()) as cursor:
+            cursor.execute("UPDATE student_details SET full_name = %s WHERE user_id = 105", ('A' * 40,))
+        get_db().commit()
+
+    ws = load_workbook(io.BytesIO(export(school).data))['Grades Report']
+    assert [str(r) for r in ws.merged_cells.ranges] == ['A1:K1']
+    assert ws['G3'].value == 12
+    header = [c.value for c in ws[7]]
+    assert header == ['Admission No', 'Student Name'] + [f'Course {c}' for c in range(1, COURSES + 1)] + ['Overall Average']
+    rows = list(ws.iter_rows(min_row=8, values_only=True))
+    assert len(rows) == 12
+    assert rows[0][:2] == ('ADM105', 'A' * 40)  # ordered by name
+    first_named = next(r for r in rows if r[1] == 'Student 100')
+    assert list(first_named[2:10]) == [0] + [float((100 + c) % 100) for c in range(2, COURSES + 1)]
+    assert first_named[10].startswith('=IFERROR(ROUND(AVERAGE(C')
+    assert ws.column_dimensions['B'].width == 42
+    assert ws.column_dimensions['C'].width == 22
+    assert ws['A1'].font.size == 16 and ws['A1'].alignment.horizontal == 'center'
+    assert ws['C7'].style == 'Grades Header' and ws['C7'].fill.fgColor.rgb == '004F46E5'
+    assert ws['C7'].font.color.rgb == '00FFFFFF' and ws['C7'].border.left.style == 'thin'
+    assert ws['K8'].style == 'Grades Average' and ws['K8'].font.bold
+    assert ws['B8'].border.bottom.style == 'thin' and not ws['B8'].font.bold
@@ -0,0 +1,34 @@
+import os
+
+from cpu_limits import available_cpus, cgroup_cpu_quota
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_cgroup_v2_quota(tmp_path):
+    write(tmp_path / 'cpu.max', '150000 100000\n')
+    assert cgroup_cpu_quota(str(tmp_path)) == 1.5
+    write(tmp_path / 'cpu.max', 'max 100000\n')
+    assert cgroup_cpu_quota(str(tmp_path)) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    write(tmp_path / 'cpu' / 'cpu.cfs_quota_us', '50000\n')
+    write(tmp_path / 'cpu' / 'cpu.cfs_period_us', '100000\n')
+    assert cgroup_cpu_quota(str(tmp_path)) == 0.5
+    write(tmp_path / 'cpu' / 'cpu.cfs_quota_us', '-1\n')
+    assert cgroup_cpu_quota(str(tmp_path)) is None
+
+
+def test_quota_caps_the_cpu_count(tmp_path):
+    unlimited = available_cpus(str(tmp_path))
+    assert unlimited >= 1
+    # A fractional quota still gets one CPU.
+    write(tmp_path / 'cpu.max', '10000 100000\n')
+    assert available_cpus(str(tmp_path)) == 1
+    write(tmp_path / 'cpu.max', f'{unlimited * 400000} 100000\n')
+    assert available_cpus(str(tmp_path)) == unlimited
@@ -0,0 +1,142 @@
+import pytest
+
+from conftest import login_client
+from dashboard_cache import bump_dashboard_version, dashboard_cache_stats, get_dashboard
+from db import db_cursor, get_db
+from extensions import cache
+
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'build': self.calls}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache.clear()
+
+
+def test_hit_until_the_users_version_is_bumped():
+    build = Builder()
+    before = dashboard_cache_stats()
+    assert get_dashboard(1, 'student', 5, 'en', build) == {'build': 1}
+    assert get_dashboard(1, 'student', 5, 'en', build) == {'build': 1}
+    stats = dashboard_cache_stats()
+    assert (stats['hits'] - before['hits'], stats['misses'] - before['misses']) == (1, 1)
+
+    bump_dashboard_version(1, 5)
+    assert get_dashboard(1, 'student', 5, 'en', build) == {'build': 2}
+    assert dashboard_cache_stats()['invalidations'] == before['invalidations'] + 1
+
+
+def test_school_writes_invalidate_staff_but_not_other_students():
+    student, other, teacher = Builder(), Builder(), Builder()
+    for build, role, user_id in [(student, 'student', 5), (other, 'student', 6), (teacher, 'teacher', 2)]:
+        get_dashboard(1, role, user_id, 'en', build)
+
+    bump_dashboard_version(1, 5)  # a grade for student 5
+    for build, role, user_id in [(student, 'student', 5), (other, 'student', 6), (teacher, 'teacher', 2)]:
+        get_dashboard(1, role, user_id, 'en', build)
+    assert (student.calls, other.calls, teacher.calls) == (2, 1, 2)
+
+    bump_dashboard_version(1, 5, school_wide=False)  # a notification for student 5
+    get_dashboard(1, 'teacher', 2, 'en', teacher)
+    assert teacher.calls == 2
+
+
+def test_keys_are_scoped_by_school_and_locale():
+    build = Builder()
+    get_dashboard(1, 'principal', 3, 'en', build)
+    get_dashboard(1, 'principal', 3, 'hi', build)
+    get_dashboard(2, 'principal', 3, 'en', build)
+    bump_dashboard_version(2)
+    get_dashboard(1, 'principal', 3, 'en', build)
+    assert build.calls == 3
+
+
+@pytest.fixture
+def physics(school):
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'mr_rao', 'x', 'teacher', 1)")
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (5, 'asha', 'x', 'student', 1)")
+            cursor.execute("INSERT INTO courses (id, name, teacher_id, school_id) VALUES (1, 'Physics', 2, 1)")
+            cursor.execute("INSERT INTO grades (student_id, course_id, score, grade_type, school_id) VALUES (5, 1, 50, 'Exam', 1)")
+        db.commit()
+    return school
+
+
+def test_grade_write_refreshes_the_cached_student_dashboard(physics):
+    student = login_client(physics, 5)
+    first = student.get('/dashboard')
+    assert b'0.0 / 4.0' in first.data
+    cached = student.get('/dashboard')
+    assert b'0.0 / 4.0' in cached.data
+    # The dashboard payload query is skipped on a hit.
+    assert cached.headers['Server-Timing'].endswith('desc="1 queries"')
+
+    response = login_client(physics, 2).post('/grades', data={'student_id': '5', 'course_id': '1', 'score': '100', 'grade_type': 'Exam'})
+    assert response.status_code == 302
+    assert b'2.0 / 4.0' in student.get('/dashboard').data
+
+
+def test_enrollment_and_new_assignment_refresh_the_student_dashboard(physics):
+    student, teacher = login_client(physics, 5), login_client(physics, 2)
+    student.get('/dashboard')
+    assert teacher.post('/course/1/enroll', data={'username': 'asha'}).status_code == 302
+    assert b'Lab report' not in student.get('/dashboard').data
+
+    response = teacher.post('/course/1/assignment/new', data={'title': 'Lab report', 'description': '', 'due_date': '2026-12-01'})
+    assert response.status_code == 302
+    assert b'Lab report' in student.get('/dashboard').data
+
+
+def test_classroom_assignment_refreshes_the_student_dashboard(physics):
+    with physics.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (1, 'head', 'x', 'admin', 1)")
+            cursor.execute("INSERT INTO classrooms (id, name, school_id) VALUES (1, 'Grade 9 A', 1)")
+            cursor.execute("INSERT INTO student_details (user_id, full_name, admission_number, school_id) VALUES (5, 'Asha', 'ADM0005', 1)")
+        db.commit()
+    student = login_client(physics, 5)
+    assert b'Grade 9 A' not in student.get('/dashboard').data
+
+    assert login_client(physics, 1).post('/classrooms/1/add-students', data={'student_ids': ['5']}).status_code == 302
+    assert b'Grade 9 A' in student.get('/dashboard').data
+
+
+def test_cached_dashboard_is_not_built_from_a_lagging_replica(physics, monkeypatch, tmp_path):
+    import os
+    import db as db_module
+    from db import connect_sqlite
+
+    # A replica that stopped replicating before the grade below.
+    replica_path = str(tmp_path / 'replica.db')
+    with physics.app_context():
+        source, replica = connect_sqlite(physics.config['DATABASE']), connect_sqlite(replica_path)
+        source.backup(replica)
+        source.close()
+        replica.close()
+
+    class LaggingReplica:
+        pid = os.getpid()
+
+        def getconn(self):
+            return connect_sqlite(replica_path)
+
+        def putconn(self, conn):
+            conn.close()
+
+    monkeypatch.setattr(db_module, '_replica_url', lambda: 'postgresql://replica/db')
+    monkeypatch.setitem(db_module._pools, True, LaggingReplica())
+
+    student = login_client(physics, 5)
+    assert b'0.0 / 4.0' in student.get('/dashboard').data
+    login_client(physics, 2).post('/grades', data={'student_id': '5', 'course_id': '1', 'score': '100', 'grade_type': 'Exam'})
+    assert b'2.0 / 4.0' in student.get('/dashboard').data
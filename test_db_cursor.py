@@ -0,0 +1,71 @@
+import sqlite3
+
+from db import db_cursor, translate_for_sqlite
+
+
+def make_db():
+    db = sqlite3.connect(':memory:')
+    db.row_factory = sqlite3.Row
+    db.execute('CREATE TABLE courses (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, school_id INTEGER)')
+    return db
+
+
+def test_translation_is_cached_per_query_string():
+    translate_for_sqlite.cache_clear()
+    query = 'SELECT id FROM courses WHERE name ILIKE %s AND school_id = %s'
+    for _ in range(3):
+        assert translate_for_sqlite(query, True) == ('SELECT id FROM courses WHERE name LIKE ? AND school_id = ?', False)
+    info = translate_for_sqlite.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+
+
+def test_placeholders_left_alone_without_params():
+    assert translate_for_sqlite("SELECT '%s' AS literal", False) == ("SELECT '%s' AS literal", False)
+
+
+def test_returning_id_on_sqlite():
+    db = make_db()
+    with db_cursor(db) as cursor:
+        cursor.execute('INSERT INTO courses (name, school_id) VALUES (%s, %s) RETURNING id', ('Maths', 1))
+        new_id = cursor.fetchone()[0]
+        cursor.execute('SELECT name FROM courses WHERE id = %s', (new_id,))
+        assert cursor.fetchone()['name'] == 'Maths'
+
+
+def test_bulk_insert_returns_ids_in_row_order():
+    db = make_db()
+    names = ['Physics', 'Chemistry', 'Biology']
+    with db_cursor(db) as cursor:
+        ids = cursor.bulk_insert('courses', ('name', 'school_id'), [(n, 1) for n in names], returning='id')
+        assert len(ids) == 3
+        for course_id, name in zip(ids, names):
+            cursor.execute('SELECT name FROM courses WHERE id = %s', (course_id,))
+            assert cursor.fetchone()['name'] == name
+
+
+def test_bulk_insert_without_returning_and_empty_rows():
+    db = make_db()
+    with db_cursor(db) as cursor:
+        assert cursor.bulk_insert('courses', ('name', 'school_id'), []) == []
+        assert cursor.bulk_insert('courses', ('name', 'school_id'), [('A', 1), ('B', 2)]) == []
+        cursor.execute('SELECT COUNT(*) FROM courses')
+        assert cursor.fetchone()[0] == 2
+
+
+def test_executemany_translates_placeholders():
+    db = make_db()
+    with db_cursor(db) as cursor:
+        cursor.bulk_insert('courses', ('name', 'school_id'), [('A', 1), ('B', 1)])
+        cursor.executemany('UPDATE courses SET school_id = %s WHERE name = %s', [(7, 'A'), (8, 'B')])
+        cursor.execute('SELECT name, school_id FROM courses ORDER BY name')
+        assert [tuple(r) for r in cursor.fetchall()] == [('A', 7), ('B', 8)]
+
+
+def test_stream_cursor_yields_every_row_in_chunks():
+    db = make_db()
+    with db_cursor(db) as cursor:
+        cursor.bulk_insert('courses', ('name', 'school_id'), [(f'C{i}', 1) for i in range(25)])
+    with db_cursor(db, stream=True, itersize=4) as cursor:
+        cursor.execute('SELECT name FROM courses WHERE school_id = %s ORDER BY id', (1,))
+        names = [row['name'] for row in cursor]
+    assert names == [f'C{i}' for i in range(25)]
@@ -0,0 +1,160 @@
+import threading
+import time
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise Exception("server closed the connection unexpectedly")
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), created
+
+
+def test_connections_are_reused():
+    pool, created = make_pool(minconn=1, maxconn=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert len(created) == 1
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    pool, _ = make_pool()
+    conn = pool.getconn()
+    conn.status = TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_recycled_after_max_uses():
+    pool, created = make_pool(max_uses=2)
+    first = pool.getconn()
+    pool.putconn(first)
+    again = pool.getconn()
+    pool.putconn(again)
+    assert first.closed
+    assert pool.getconn() is not first
+    assert pool.stats()['recycled'] == 1
+
+
+def test_dead_connection_replaced_on_checkout():
+    pool, created = make_pool(ping_after=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    fresh = pool.getconn()
+    assert fresh is not conn
+    assert pool.stats()['failed_health_checks'] == 1
+
+
+def test_checkout_blocks_until_max_then_times_out():
+    pool, _ = make_pool(minconn=0, maxconn=1, timeout=0.2)
+    held = pool.getconn()
+    start = time.time()
+    try:
+        pool.getconn()
+        assert False, "expected PoolTimeout"
+    except PoolTimeout:
+        pass
+    assert time.time() - start >= 0.2
+
+    threading.Timer(0.05, pool.putconn, args=(held,)).start()
+    assert pool.getconn() is held
+
+
+def test_pool_never_exceeds_max_under_threads():
+    pool, created = make_pool(minconn=0, maxconn=4, timeout=5)
+    peak = []
+
+    def worker():
+        for _ in range(20):
+            conn = pool.getconn()
+            peak.append(pool.stats()['in_use'])
+            pool.putconn(conn)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) <= 4
+    assert len(created) <= 4
+    assert pool.stats()['in_use'] == 0
+
+
+def test_counters_add_up_under_threads():
+    pool, created = make_pool(minconn=0, maxconn=4, max_uses=3, timeout=5)
+
+    def worker():
+        for _ in range(50):
+            pool.putconn(pool.getconn())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = pool.stats()
+    assert stats['checkouts'] == 400
+    assert stats['created'] == len(created)
+    # Every connection but the idle ones was recycled after its third use.
+    assert stats['recycled'] == len(created) - stats['idle']
+
+
+def test_pool_counters_are_superadmin_only(school):
+    from conftest import login_client
+    from db import db_cursor, get_db
+
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (1, 'head', 'x', 'admin', 1)")
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'mr_rao', 'x', 'teacher', 1)")
+        db.commit()
+
+    assert sorted(school.test_client().get('/keep-alive').get_json()) == ['status', 'timestamp']
+    assert login_client(school, 2).get('/superadmin/stats').status_code == 302
+    stats = login_client(school, 1).get('/superadmin/stats').get_json()
+    assert sorted(stats) == ['cache', 'dashboard_cache', 'db_pool', 'db_read_pool']
@@ -0,0 +1,71 @@
+import pytest
+from flask import g
+
+from conftest import login_client
+from db import db_cursor, get_db, query_stats
+from models import User, identity_cache, invalidate_user
+
+
+@pytest.fixture
+def staff(school):
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (1, 'principal', 'x', 'admin', 1)")
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'ms_rao', 'x', 'teacher', 1)")
+            cursor.execute("INSERT INTO teacher_details (user_id, full_name, email, school_id) VALUES (2, 'Ms Rao', 'rao@example.com', 1)")
+        db.commit()
+    return school
+
+
+def test_loader_hits_the_database_once(staff):
+    with staff.test_request_context():
+        assert User.get_cached(2).role == 'teacher'
+        first = User.get_cached(2)
+        assert first is not User.get_cached(2)
+        assert query_stats()['count'] == 1
+        assert User.get_cached(99) is None
+
+
+def test_update_staff_invalidates_the_cached_role(staff):
+    with staff.test_request_context():
+        assert User.get_cached(2).role == 'teacher'
+
+    response = login_client(staff, 1).post('/admin/staff/update/2', data={'role': 'admin', 'full_name': 'Ms Rao', 'email': 'rao@example.com', 'school_id': '1'})
+    assert response.status_code == 302
+
+    with staff.test_request_context():
+        assert User.get_cached(2).role == 'admin'
+
+
+def test_invalidate_user_drops_the_entry(staff):
+    with staff.test_request_context():
+        User.get_cached(2)
+        invalidate_user(2)
+        g.pop('_db_stats', None)
+        User.get_cached('2')
+        assert query_stats()['count'] == 1
+
+
+def test_shared_cache_holds_identities_when_configured(staff, monkeypatch):
+    from cache import Cache
+    from extensions import cache
+
+    # The in-process backend stands in for a CACHE_URL server.
+    monkeypatch.setattr(Cache, 'shared', property(lambda self: True))
+    with staff.test_request_context():
+        assert User.get_cached(2).role == 'teacher'
+        assert cache.get('user:2') == (2, 'ms_rao', 'teacher', 1)
+        assert identity_cache.get('2') is None
+        # What another worker's write would do: change the row, evict the shared entry.
+        with db_cursor(get_db()) as cursor:
+            cursor.execute("UPDATE users SET role = 'admin' WHERE id = 2")
+        invalidate_user(2)
+        assert User.get_cached('2').role == 'admin'
+
+
+def test_cached_users_carry_no_password_hash(staff):
+    with staff.test_request_context():
+        User.get_cached(2)
+        assert User.get_cached(2).password_hash is None
+        assert User.get_by_username('ms_rao').password_hash == 'x'
@@ -0,0 +1,49 @@
+from db import get_db, db_cursor
+from migrations import MIGRATIONS
+
+# Hot, school-scoped queries that must be served by an index.
+HOT_QUERIES = [
+    ('SELECT id FROM attendance WHERE student_id = %s AND course_id = %s AND date = %s AND school_id = %s',
+     (1, 1, '2026-01-01', 1)),
+    ('SELECT COUNT(*) FROM messages WHERE recipient_id = %s AND is_read = 0 AND school_id = %s', (1, 1)),
+    ('SELECT unread FROM unread_counters WHERE user_id = %s AND school_id = %s', (1, 1)),
+    ('SELECT COALESCE(ROUND(AVG(score), 1), 0) FROM grades WHERE student_id = %s AND course_id = %s AND school_id = %s',
+     (1, 1, 1)),
+    ('SELECT * FROM notifications WHERE user_id = %s AND school_id = %s ORDER BY created_at DESC LIMIT 5', (1, 1)),
+    ("SELECT COUNT(*) FROM users WHERE school_id = %s AND role = 'student'", (1,)),
+    ('SELECT full_name FROM student_details WHERE classroom_id = %s AND school_id = %s', (1, 1)),
+    ('SELECT * FROM courses WHERE teacher_id = %s AND school_id = %s', (1, 1)),
+    ('SELECT status, COUNT(*) FROM attendance WHERE student_id = %s AND school_id = %s GROUP BY status', (1, 1)),
+    ('SELECT * FROM remarks WHERE student_id = %s AND school_id = %s ORDER BY created_at DESC', (1, 1)),
+    ('SELECT * FROM schools WHERE slug = %s', ('genesis',)),
+    ('SELECT * FROM school_stats WHERE school_id = %s', (1,)),
+    ("SELECT full_name, created_at FROM student_details WHERE school_id = %s ORDER BY created_at DESC LIMIT 5", (1,)),
+    ("SELECT date_recorded FROM grades WHERE school_id = %s ORDER BY date_recorded DESC LIMIT 5", (1,)),
+    ('DELETE FROM login_attempts WHERE first_attempt_at < %s', (0,)),
+]
+
+
+def full_table_scans(cursor, query, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + query, params)
+    # SQLite reports "SCAN <table>" for a full scan and "SEARCH ... USING INDEX" otherwise;
+    # a "SCAN ... USING (COVERING) INDEX" walks a whole index and is just as bad here.
+    return [row['detail'] for row in cursor.fetchall() if row['detail'].startswith('SCAN')]
+
+
+def test_hot_queries_use_indexes(app_db):
+    with app_db.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            for query, params in HOT_QUERIES:
+                assert full_table_scans(cursor, query, params) == [], query
+
+
+def test_index_migration_is_recorded_once(app_db):
+    from db import init_db
+    init_db(app_db)
+    with app_db.app_context():
+        with db_cursor(get_db()) as cursor:
+            cursor.execute('SELECT version, name FROM schema_migrations ORDER BY version')
+            recorded = [tuple(r) for r in cursor.fetchall()]
+    assert recorded[:2] == [(0, 'baseline_schema'), (1, 'school_scoped_indexes')]
+    assert recorded == [(version, name) for version, name, _ in MIGRATIONS]
@@ -0,0 +1,205 @@
+import os
+import time
+
+import pytest
+
+import jobs
+from conftest import login_client
+from db import db_cursor, get_db
+
+
+@pytest.fixture
+def queue(school, monkeypatch):
+    """A school with an admin (id 1) and a teacher (id 2), plus a 'test' job kind."""
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (1, 'admin', 'x', 'admin', 1)")
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (2, 'mr_rao', 'x', 'teacher', 1)")
+        db.commit()
+
+    calls = []
+
+    def handler(payload, output):
+        calls.append(payload)
+        if payload.get('fail_times', 0) >= len(calls):
+            raise RuntimeError('boom')
+        if payload.get('sleep'):
+            time.sleep(payload['sleep'])
+        output.write(b'artifact')
+        return 'result.txt'
+
+    monkeypatch.setitem(jobs.JOB_KINDS, 'test', (handler, 1))
+    monkeypatch.setattr(jobs, 'JOB_RETRY_DELAY', 0)
+    school.calls = calls
+    return school
+
+
+def enqueue(app, payload, user_id=1):
+    with app.app_context():
+        return jobs.enqueue(get_db(), 'test', payload, user_id, 1)
+
+
+def job(app, job_id):
+    with app.app_context():
+        return jobs.get_job(get_db(), job_id)
+
+
+def test_job_runs_and_stores_artifact(queue):
+    job_id = enqueue(queue, {'n': 1})
+    assert jobs.work_once(queue)
+    assert not jobs.work_once(queue)
+    row = job(queue, job_id)
+    assert (row['status'], row['attempts'], row['download_name']) == ('done', 1, 'result.txt')
+    with open(jobs.artifact_path(queue, job_id), 'rb') as f:
+        assert f.read() == b'artifact'
+
+
+def test_failed_job_is_retried_then_succeeds(queue):
+    job_id = enqueue(queue, {'fail_times': 1})
+    assert jobs.work_once(queue)
+    row = job(queue, job_id)
+    assert (row['status'], row['attempts']) == ('queued', 1)
+    assert 'boom' in row['error']
+    assert not os.path.exists(jobs.artifact_path(queue, job_id) + '.part')
+    assert jobs.work_once(queue)
+    assert job(queue, job_id)['status'] == 'done'
+
+
+def test_retries_back_off(queue, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_RETRY_DELAY', 60)
+    job_id = enqueue(queue, {'fail_times': 1})
+    assert jobs.work_once(queue)
+    assert job(queue, job_id)['run_after'] > time.time() + 50
+    assert not jobs.work_once(queue)
+
+
+def test_job_fails_after_max_attempts(queue):
+    job_id = enqueue(queue, {'fail_times': 99})
+    while jobs.work_once(queue):
+        pass
+    row = job(queue, job_id)
+    assert (row['status'], row['attempts']) == ('failed', jobs.JOB_MAX_ATTEMPTS)
+    assert len(queue.calls) == jobs.JOB_MAX_ATTEMPTS
+
+
+def test_job_timeout(queue, monkeypatch):
+    monkeypatch.setitem(jobs.JOB_KINDS, 'test', (jobs.JOB_KINDS['test'][0], 0.2))
+    with queue.app_context():
+        job_id = jobs.enqueue(get_db(), 'test', {'sleep': 5}, 1, 1, max_attempts=1)
+    started = time.time()
+    assert jobs.work_once(queue)
+    assert time.time() - started < 2
+    row = job(queue, job_id)
+    assert row['status'] == 'failed'
+    assert 'JobTimeout' in row['error']
+
+
+def test_expired_lease_is_reclaimed(queue):
+    job_id = enqueue(queue, {})
+    with queue.app_context():
+        db = get_db()
+        claimed = jobs.claim_job(db, 'dead-worker')
+        assert claimed['id'] == job_id
+        # The lease holds while the first worker might still be running it...
+        assert jobs.claim_job(db, 'other', now=time.time() + 30) is None
+        # ...and once it runs out, another worker takes the job over.
+        reclaimed = jobs.claim_job(db, 'other', now=claimed['run_after'] + 1)
+    assert (reclaimed['id'], reclaimed['attempts'], reclaimed['worker']) == (job_id, 2, 'other')
+
+
+def test_reclaimed_job_without_attempts_left_fails(queue):
+    with queue.app_context():
+        db = get_db()
+        job_id = jobs.enqueue(db, 'test', {}, 1, 1, max_attempts=1)
+        first = jobs.claim_job(db, 'dead-worker')
+        second = jobs.claim_job(db, 'other', now=first['run_after'] + 1)
+        assert not jobs.run_job(queue, db, second)
+    assert job(queue, job_id)['status'] == 'failed'
+    assert queue.calls == []
+
+
+def test_sweep_removes_old_jobs_and_files(queue):
+    job_id = enqueue(queue, {})
+    assert jobs.work_once(queue)
+    with queue.app_context():
+        assert jobs.sweep_jobs(queue, get_db()) == 0
+        assert jobs.sweep_jobs(queue, get_db(), now=time.time() + jobs.JOB_ARTIFACT_TTL + 1) == 1
+    assert job(queue, job_id) is None
+    assert not os.path.exists(jobs.artifact_path(queue, job_id))
+
+
+def test_status_and_download_are_owner_only(queue):
+    job_id = enqueue(queue, {}, user_id=2)
+    owner = login_client(queue, 2)
+    status = owner.get(f'/jobs/{job_id}/status').get_json()
+    assert (status['status'], status['download_url']) == ('queued', None)
+    assert owner.get(f'/jobs/{job_id}/download').status_code == 404
+    assert owner.get(f'/jobs/{job_id}').status_code == 200
+
+    assert jobs.work_once(queue)
+    status = owner.get(f'/jobs/{job_id}/status').get_json()
+    assert status['status'] == 'done'
+    response = owner.get(status['download_url'])
+    assert response.data == b'artifact'
+    assert 'result.txt' in response.headers['Content-Disposition']
+
+    other = login_client(queue, 1)
+    assert other.get(f'/jobs/{job_id}/status').status_code == 404
+    assert other.get(f'/jobs/{job_id}/download').status_code == 404
+
+
+def test_school_export_is_queued(queue):
+    import io
+    from openpyxl import load_workbook
+
+    client = login_client(queue, 1)
+    response = client.get('/superadmin/schools/export/1')
+    assert response.status_code == 302
+    job_id = int(response.headers['Location'].rstrip('/').rsplit('/', 1)[1])
+    assert jobs.work_once(queue)
+    download = client.get(f'/jobs/{job_id}/download')
+    assert download.status_code == 200
+    wb = load_workbook(io.BytesIO(download.data))
+    assert wb.sheetnames == ['Overview', 'Students', 'Teachers']
+    assert wb['Overview']['B2'].value == 'Greenwood'
+
+
+def test_deleting_a_user_deletes_their_jobs(queue):
+    job_id = enqueue(queue, {}, user_id=2)
+    other_id = enqueue(queue, {}, user_id=1)
+    while jobs.work_once(queue):
+        pass
+    assert os.path.exists(jobs.artifact_path(queue, job_id))
+
+    assert login_client(queue, 1).post('/admin/staff/delete/2').status_code == 302
+    assert job(queue, job_id) is None
+    assert not os.path.exists(jobs.artifact_path(queue, job_id))
+    assert job(queue, other_id)['status'] == 'done'
+
+
+def test_failed_user_delete_keeps_their_job_files(queue, monkeypatch):
+    import routes.staff
+
+    def fail(cursor, school_id):
+        raise RuntimeError('boom')
+
+    job_id = enqueue(queue, {}, user_id=2)
+    assert jobs.work_once(queue)
+    monkeypatch.setattr(routes.staff, 'refresh_school_stats', fail)
+    assert login_client(queue, 1).post('/admin/staff/delete/2').status_code == 302
+    # Rolled back: the row survives, so its file must too.
+    assert job(queue, job_id)['status'] == 'done'
+    assert os.path.exists(jobs.artifact_path(queue, job_id))
+
+
+def test_job_deleted_while_running_leaves_no_file(queue):
+    job_id = enqueue(queue, {})
+    with queue.app_context():
+        db = get_db()
+        claimed = jobs.claim_job(db, 'w')
+        with db_cursor(db) as cursor:
+            assert jobs.delete_user_jobs(cursor, 1, 1) == [job_id]
+        db.commit()
+        assert not jobs.run_job(queue, db, claimed)
+    assert not os.path.exists(jobs.artifact_path(queue, job_id))
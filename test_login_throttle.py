@@ -0,0 +1,60 @@
+import multiprocessing
+
+from db import connect_sqlite, db_cursor, get_db
+from login_throttle import LOCKOUT_SECONDS, MAX_ATTEMPTS, clear_attempts, reserve_attempt
+
+
+def test_locks_out_after_max_attempts_until_the_window_ends(app_db):
+    with app_db.app_context():
+        db = get_db()
+        results = [reserve_attempt(db, 'asha:10.0.0.1', now=1000 + i) for i in range(MAX_ATTEMPTS + 2)]
+        assert results == [True] * MAX_ATTEMPTS + [False, False]
+        assert reserve_attempt(db, 'asha:10.0.0.2', now=1010)  # other keys are unaffected
+        assert reserve_attempt(db, 'asha:10.0.0.1', now=1000 + LOCKOUT_SECONDS + 1)
+
+
+def test_success_clears_the_key(app_db):
+    with app_db.app_context():
+        db = get_db()
+        for i in range(MAX_ATTEMPTS):
+            reserve_attempt(db, 'asha:10.0.0.1', now=1000 + i)
+        clear_attempts(db, 'asha:10.0.0.1')
+        assert reserve_attempt(db, 'asha:10.0.0.1', now=1010)
+
+
+def test_expired_windows_are_swept(app_db):
+    with app_db.app_context():
+        db = get_db()
+        for i in range(50):
+            reserve_attempt(db, f'user{i}:10.0.0.1', now=1000)
+        reserve_attempt(db, 'late:10.0.0.1', now=1000 + LOCKOUT_SECONDS + 1)
+        with db_cursor(db) as cursor:
+            cursor.execute('SELECT attempt_key FROM login_attempts')
+            assert [row[0] for row in cursor.fetchall()] == ['late:10.0.0.1']
+
+
+def _hammer(db_path, attempts, allowed):
+    db = connect_sqlite(db_path)
+    allowed.put(sum(reserve_attempt(db, 'target:10.0.0.1') for _ in range(attempts)))
+    db.close()
+
+
+def test_limit_holds_across_worker_processes(app_db):
+    ctx = multiprocessing.get_context('fork')
+    allowed = ctx.Queue()
+    workers = [ctx.Process(target=_hammer, args=(app_db.config['DATABASE'], 10, allowed)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(30)
+    assert all(w.exitcode == 0 for w in workers)
+    assert sum(allowed.get(timeout=1) for _ in workers) == MAX_ATTEMPTS
+
+
+def test_login_route_returns_429_once_locked(app_db, monkeypatch):
+    monkeypatch.setitem(app_db.config, 'SECRET_KEY', 'test')
+    monkeypatch.setitem(app_db.config, 'WTF_CSRF_ENABLED', False)
+    client = app_db.test_client()
+    form = {'username': 'nobody', 'password': 'wrong', 'role': 'student'}
+    statuses = [client.post('/login', data=form).status_code for _ in range(MAX_ATTEMPTS + 1)]
+    assert statuses == [200] * MAX_ATTEMPTS + [429]
@@ -0,0 +1,40 @@
+from flask import Response
+
+import app as app_module
+from db import db_cursor, get_db, query_fingerprint, query_stats
+
+
+def test_fingerprint_collapses_literals_and_in_lists():
+    a = query_fingerprint("SELECT * FROM grades WHERE student_id IN (%s, %s, %s) AND score > 50")
+    b = query_fingerprint("SELECT *  FROM grades\n WHERE student_id IN (%s) AND score > 75")
+    assert a == b == 'SELECT * FROM grades WHERE student_id IN (...) AND score > ?'
+    assert query_fingerprint("SELECT id FROM users WHERE role = 'student'") == 'SELECT id FROM users WHERE role = ?'
+
+
+def test_queries_counted_per_request(initialized_app):
+    with initialized_app.test_request_context():
+        with db_cursor(get_db()) as cursor:
+            for school_id in (1, 2, 3):
+                cursor.execute('SELECT * FROM schools WHERE id = %s', (school_id,))
+            cursor.bulk_insert('notifications', ('user_id', 'message', 'school_id'), [(1, 'hi', 1)])
+        stats = query_stats()
+        assert stats['count'] == 4
+        assert stats['shapes']['SELECT * FROM schools WHERE id = %s'] == 3
+        assert stats['time'] > 0
+        get_db().rollback()
+
+    with initialized_app.test_request_context():
+        assert query_stats()['count'] == 0
+
+
+def test_server_timing_header_and_repeat_warning(initialized_app, monkeypatch, capsys):
+    monkeypatch.setattr(app_module, 'QUERY_REPEAT_WARN', 2)
+    with initialized_app.test_request_context('/classrooms/1'):
+        with db_cursor(get_db()) as cursor:
+            for student_id in range(3):
+                cursor.execute('SELECT AVG(score) FROM grades WHERE student_id = %s', (student_id,))
+        response = app_module.report_query_stats(Response())
+
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert response.headers['Server-Timing'].endswith(';desc="3 queries"')
+    assert 'ran 3x -> SELECT AVG(score) FROM grades WHERE student_id = %s' in capsys.readouterr().out
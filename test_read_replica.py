@@ -0,0 +1,84 @@
+import pytest
+
+import db as db_module
+from db import ConnectionPool, close_connection, db_cursor, get_db, is_write_query
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, role):
+        self.role = role
+        self.closed = 0
+        self.queries = []
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return 0
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def replica(monkeypatch, initialized_app):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://primary/db')
+    monkeypatch.setenv('DATABASE_READ_URL', 'postgresql://replica/db')
+    pools = {False: ConnectionPool(lambda: FakeConnection('primary'), minconn=0),
+             True: ConnectionPool(lambda: FakeConnection('replica'), minconn=0)}
+    monkeypatch.setattr(db_module, '_pools', pools)
+    with initialized_app.test_request_context():
+        yield pools
+
+
+def test_readonly_requests_use_the_replica(replica):
+    assert get_db(readonly=True).role == 'replica'
+    assert get_db(readonly=True) is get_db(readonly=True)
+    assert get_db().role == 'primary'
+    with db_cursor(readonly=True) as cursor:
+        cursor.execute('SELECT 1')
+    assert get_db(readonly=True).queries == ['SELECT 1']
+
+
+def test_request_sticks_to_primary_after_a_write(replica):
+    with db_cursor(get_db()) as cursor:
+        cursor.execute('SELECT * FROM users')
+    assert get_db(readonly=True).role == 'replica'
+
+    with db_cursor(get_db()) as cursor:
+        cursor.execute('UPDATE users SET role = %s WHERE id = %s', ('teacher', 1))
+    assert get_db(readonly=True) is get_db()
+
+
+def test_both_connections_returned_on_teardown(replica):
+    get_db()
+    get_db(readonly=True)
+    close_connection(None)
+    assert replica[False].stats()['idle'] == 1
+    assert replica[True].stats()['idle'] == 1
+
+
+def test_replica_ignored_without_postgres_primary(monkeypatch, initialized_app):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setenv('DATABASE_READ_URL', 'postgresql://replica/db')
+    with initialized_app.test_request_context():
+        assert get_db(readonly=True) is get_db()
+        close_connection(None)
+
+
+def test_write_detection():
+    assert not is_write_query('  select * from users')
+    assert not is_write_query('WITH x AS (SELECT 1) SELECT * FROM x')
+    assert is_write_query('INSERT INTO users (id) VALUES (1)')
+    assert is_write_query('DELETE FROM grades WHERE id = %s')
@@ -0,0 +1,65 @@
+import pytest
+
+from flask import g
+
+from cache import TTLCache
+from db import query_stats
+from helpers import get_school, get_school_by_slug, invalidate_school, school_cache, subdomain_slug
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(ttl=10, maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # evicts the least recently used key, 'b'
+    assert cache.get('b') is None
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 2}
+
+
+def test_subdomain_slug():
+    assert subdomain_slug('greenwood.studentos.com') == 'greenwood'
+    assert subdomain_slug('greenwood.localhost:5000') == 'greenwood'
+    assert subdomain_slug('www.studentos.com') is None
+    assert subdomain_slug('localhost:5000') is None
+
+
+@pytest.fixture
+def school_ctx(app_db):
+    from db import db_cursor, get_db
+    school_cache.clear()
+    with app_db.test_request_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute('INSERT INTO schools (id, name, slug) VALUES (%s, %s, %s)', (1, 'Greenwood', 'greenwood'))
+        db.commit()
+        g.pop('_db_stats', None)  # count only the lookups below
+        yield app_db
+    school_cache.clear()
+
+
+def test_school_lookups_hit_the_database_once(school_ctx):
+    assert get_school(1)['name'] == 'Greenwood'
+    assert get_school(1)['name'] == 'Greenwood'
+    assert get_school_by_slug('greenwood')['id'] == 1
+    assert get_school_by_slug('greenwood')['id'] == 1
+    assert get_school_by_slug('no-such-school') is None
+    assert get_school_by_slug('no-such-school') is None
+    # id 1 once, the slug once, the missing slug once
+    assert query_stats()['count'] == 3
+
+
+def test_invalidation_reloads_the_row(school_ctx):
+    from db import db_cursor, get_db
+    assert get_school(1)['name'] != 'Renamed'
+    db = get_db()
+    with db_cursor(db) as cursor:
+        cursor.execute('UPDATE schools SET name = %s WHERE id = %s', ('Renamed', 1))
+    db.commit()
+    assert get_school(1)['name'] != 'Renamed'
+    invalidate_school('1')
+    assert get_school(1)['name'] == 'Renamed'
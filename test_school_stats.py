@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import login_client
+from db import db_cursor, get_db
+from school_stats import compute_school_stats, get_school_stats, refresh_all_school_stats
+
+
+@pytest.fixture
+def rollup_school(school):
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            for user_id, name, role in ((1, 'head', 'principal'), (2, 'ms_rao', 'teacher'), (3, 'asha', 'student')):
+                cursor.execute('INSERT INTO users (id, username, password_hash, role, school_id) VALUES (%s, %s, %s, %s, 1)',
+                               (user_id, name, 'x', role))
+            cursor.execute("INSERT INTO courses (id, name, teacher_id, school_id) VALUES (1, 'Maths', 2, 1)")
+            cursor.execute("INSERT INTO grades (student_id, course_id, score, grade_type, school_id) VALUES (3, 1, 60, 'Exam', 1)")
+        db.commit()
+        assert refresh_all_school_stats(db) == 1
+    return school
+
+
+def stored(app):
+    with app.app_context():
+        with db_cursor(get_db()) as cursor:
+            return get_school_stats(cursor, 1), compute_school_stats(cursor, 1)
+
+
+def test_writes_keep_the_rollup_in_step(rollup_school):
+    app = rollup_school
+    teacher = login_client(app, 2)
+    teacher.post('/grades', data={'student_id': '3', 'course_id': '1', 'score': '90', 'grade_type': 'Exam'})
+    for status in ('Present', 'Late', 'Absent'):
+        teacher.post('/attendance', data={'student_id': '3', 'course_id': '1', 'date': '2026-01-05', 'status': status})
+
+    rollup, actual = stored(app)
+    assert rollup == actual
+    assert (rollup['grade_count'], rollup['grade_total']) == (2, 150)
+    assert (rollup['present_count'], rollup['absent_count'], rollup['late_count']) == (1, 1, 1)
+    assert (rollup['teacher_count'], rollup['student_count']) == (1, 1)
+
+
+def test_principal_dashboard_reads_the_rollup(rollup_school):
+    app = rollup_school
+    response = login_client(app, 1).get('/dashboard')
+    assert response.status_code == 200
+    assert b'60.0%' in response.data
+
+
+def test_missing_row_is_computed_without_storing(rollup_school):
+    app = rollup_school
+    with app.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute('DELETE FROM school_stats')
+            assert get_school_stats(cursor, 1)['grade_count'] == 1
+            cursor.execute('SELECT COUNT(*) FROM school_stats')
+            assert cursor.fetchone()[0] == 0
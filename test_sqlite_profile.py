@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db import connect_sqlite, sqlite_pragmas
+
+
+def test_production_profile_applies_pragmas(tmp_path):
+    db = connect_sqlite(str(tmp_path / 'p.db'), 'production')
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert db.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert db.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    assert db.execute('PRAGMA temp_store').fetchone()[0] == 2  # MEMORY
+    assert db.execute('PRAGMA cache_size').fetchone()[0] == -20000
+
+
+def test_pragmas_overridable_from_env(monkeypatch):
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT', '250')
+    assert ('busy_timeout', '250') in sqlite_pragmas('production')
+    assert sqlite_pragmas('default') == []
+    with pytest.raises(ValueError):
+        sqlite_pragmas('turbo')
+
+
+def test_concurrent_writers_do_not_hit_locked_errors(tmp_path):
+    path = str(tmp_path / 'load.db')
+    db = connect_sqlite(path, 'production')
+    db.execute('CREATE TABLE grades (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, score REAL)')
+    db.commit()
+    db.close()
+    errors = []
+
+    def worker(n):
+        for i in range(50):
+            conn = connect_sqlite(path, 'production')
+            try:
+                conn.execute('INSERT INTO grades (student_id, score) VALUES (?, ?)', (n, i))
+                conn.commit()
+                conn.execute('SELECT COUNT(*) FROM grades WHERE student_id = ?', (n,)).fetchone()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert connect_sqlite(path).execute('SELECT COUNT(*) FROM grades').fetchone()[0] == 400
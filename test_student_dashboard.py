@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from conftest import login_client
+from db import db_cursor, get_db
+from helpers import calculate_gpa
+from routes.dashboard import student_dashboard_payload
+
+# course id -> scores; averages 95, 85, 72.5, 50 -> grade points 4, 3, 2, 0
+SCORES = {1: [94, 96], 2: [80, 90], 3: [70, 75], 4: [50]}
+
+
+@pytest.fixture
+def student(school):
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (5, 'asha', 'x', 'student', 1)")
+            cursor.execute("INSERT INTO classrooms (id, name, school_id) VALUES (1, 'Grade 9 A', 1)")
+            cursor.execute("INSERT INTO student_details (user_id, full_name, admission_number, classroom_id, school_id) "
+                           "VALUES (5, 'Asha', 'ADM0005', 1, 1)")
+            for course_id, scores in SCORES.items():
+                cursor.execute('INSERT INTO courses (id, name, teacher_id, school_id) VALUES (%s, %s, 2, 1)', (course_id, f'Course {course_id}'))
+                cursor.execute('INSERT INTO enrollments (student_id, course_id, school_id) VALUES (5, %s, 1)', (course_id,))
+                for score in scores:
+                    cursor.execute("INSERT INTO grades (student_id, course_id, score, grade_type, school_id) VALUES (5, %s, %s, 'Exam', 1)",
+                                   (course_id, score))
+            for i, status in enumerate(['Present'] * 6 + ['Absent'] * 3 + ['Late']):
+                cursor.execute('INSERT INTO attendance (student_id, course_id, date, status, school_id) VALUES (5, 1, %s, %s, 1)',
+                               (f'2026-01-{i + 1:02d}', status))
+            for i in range(7):
+                cursor.execute("INSERT INTO notifications (user_id, message, school_id, created_at) VALUES (5, %s, 1, %s)",
+                               (f'note {i}', f'2026-02-{i + 1:02d} 09:00:00'))
+                cursor.execute("INSERT INTO assignments (course_id, title, due_date, school_id, created_at) VALUES (2, %s, %s, 1, %s)",
+                               (f'HW {i}', f'2026-03-{i + 1:02d}', f'2026-02-{i + 1:02d} 10:00:00'))
+        db.commit()
+    return school
+
+
+def test_payload_matches_the_per_query_computation(student):
+    with student.app_context():
+        with db_cursor(get_db()) as cursor:
+            payload = student_dashboard_payload(cursor, 5, 1)
+
+    averages = [round(sum(s) / len(s), 1) for s in SCORES.values()]
+    assert payload['grades'] == [(f'Course {c}', avg) for c, avg in zip(SCORES, averages)]
+    assert payload['gpa'] == round(sum(calculate_gpa(a) for a in averages) / len(averages), 2) == 2.25
+    assert payload['attendance'] == {'Present': 6, 'Absent': 3, 'Late': 1}
+    assert payload['classroom_name'] == 'Grade 9 A'
+    assert [n['message'] for n in payload['notifications']] == ['note 6', 'note 5', 'note 4', 'note 3', 'note 2']
+    assert [a['title'] for a in payload['recent_activity']] == ['HW 6', 'HW 5', 'HW 4', 'HW 3', 'HW 2']
+
+
+def test_student_without_history(student):
+    with student.app_context():
+        with db_cursor(get_db()) as cursor:
+            payload = student_dashboard_payload(cursor, 999, 1)
+    assert payload == {'grades': [], 'gpa': 0.0, 'attendance': {}, 'classroom_name': None,
+                       'notifications': [], 'recent_activity': []}
+
+
+def test_dashboard_renders_from_one_query(student):
+    response = login_client(student, 5).get('/dashboard')
+    assert response.status_code == 200
+    assert b'2.25 / 4.0' in response.data
+    assert b'Grade 9 A' in response.data
+    # user_loader + tenant + unread badge + the payload
+    assert response.headers['Server-Timing'].endswith('desc="4 queries"')
+
+
+def test_placeholder_nulls_are_typed():
+    # PostgreSQL types a bare NULL in the first UNION branch as text, and the
+    # notification branch's timestamps then fail to match it.
+    import re
+    from routes.dashboard import STUDENT_DASHBOARD_QUERY
+    assert re.findall(r'(?<!CAST\()NULL\b', STUDENT_DASHBOARD_QUERY) == []
+
+
+@pytest.mark.skipif(not os.getenv('PG_TEST_URL'), reason='set PG_TEST_URL to a disposable PostgreSQL database')
+def test_query_runs_on_postgres():
+    import psycopg2
+
+    with open(os.path.join(os.path.dirname(__file__), 'schema.sql')) as f:
+        schema = f.read()
+    conn = psycopg2.connect(os.environ['PG_TEST_URL'])
+    try:
+        with conn.cursor() as cursor:
+            # A throwaway schema, rolled back at the end.
+            cursor.execute('CREATE SCHEMA student_os_test; SET LOCAL search_path TO student_os_test')
+            cursor.execute(schema)
+            cursor.execute("INSERT INTO schools (id, name, slug) VALUES (1, 'Greenwood', 'greenwood')")
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (5, 'asha', 'x', 'student', 1)")
+            cursor.execute("INSERT INTO courses (id, name, teacher_id, school_id) VALUES (1, 'Physics', 5, 1)")
+            cursor.execute('INSERT INTO enrollments (student_id, course_id, school_id) VALUES (5, 1, 1)')
+            cursor.execute("INSERT INTO grades (student_id, course_id, score, grade_type, school_id) VALUES (5, 1, 91, 'Exam', 1)")
+            cursor.execute("INSERT INTO notifications (user_id, message, school_id) VALUES (5, 'hello', 1)")
+            cursor.execute("INSERT INTO assignments (course_id, title, due_date, school_id) VALUES (1, 'HW', '2026-03-01', 1)")
+            payload = student_dashboard_payload(cursor, 5, 1)
+    finally:
+        conn.rollback()
+        conn.close()
+    assert payload['grades'] == [('Physics', 91.0)]
+    assert payload['gpa'] == 4.0
+    assert [n['message'] for n in payload['notifications']] == ['hello']
+    assert [a['title'] for a in payload['recent_activity']] == ['HW']
@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import login_client
+from db import db_cursor, get_db
+from helpers import get_unread_count, reconcile_unread_counters
+
+
+@pytest.fixture
+def chat(school):
+    with school.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            for user_id, name in ((1, 'alice'), (2, 'bob')):
+                cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (%s, %s, 'x', 'teacher', 1)",
+                               (user_id, name))
+        db.commit()
+    return school
+
+
+def unread(app, user_id):
+    with app.app_context():
+        with db_cursor(get_db()) as cursor:
+            return get_unread_count(cursor, user_id, 1)
+
+
+def test_send_and_read_keep_the_counter_in_step(chat):
+    app = chat
+    alice, bob = login_client(app, 1), login_client(app, 2)
+    for text in ('hi', 'are you there?'):
+        assert alice.post('/messages/send', data={'recipient_id': '2', 'content': text}).status_code == 302
+    alice.post('/messages/send', data={'recipient_id': '0', 'content': 'group hello'})
+    assert unread(app, 2) == 2
+    assert unread(app, 1) == 0
+
+    assert bob.get('/messages/chat/1').status_code == 200
+    assert unread(app, 2) == 0
+    bob.get('/messages/chat/1')
+    assert unread(app, 2) == 0
+
+
+def test_reconcile_repairs_drift(chat):
+    app = chat
+    login_client(app, 1).post('/messages/send', data={'recipient_id': '2', 'content': 'hi'})
+    with app.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute('UPDATE unread_counters SET unread = 7 WHERE user_id = 2')
+            cursor.execute("INSERT INTO unread_counters (user_id, school_id, unread) VALUES (1, 1, 3)")
+        db.commit()
+        assert reconcile_unread_counters(db) == 2
+        assert reconcile_unread_counters(db) == 0
+    assert (unread(app, 2), unread(app, 1)) == (1, 0)
+
+
+@pytest.mark.parametrize('role, delete_url', [('teacher', '/admin/staff/delete/3'), ('student', '/admissions/delete/3')])
+def test_deleting_a_user_drops_their_counter(chat, role, delete_url):
+    app = chat
+    with app.app_context():
+        db = get_db()
+        with db_cursor(db) as cursor:
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (3, 'carol', 'x', %s, 1)", (role,))
+            cursor.execute("INSERT INTO users (id, username, password_hash, role, school_id) VALUES (4, 'head', 'x', 'admin', 1)")
+        db.commit()
+    login_client(app, 1).post('/messages/send', data={'recipient_id': '3', 'content': 'hi'})
+    assert unread(app, 3) == 1
+
+    assert login_client(app, 4).post(delete_url).status_code == 302
+    with app.app_context():
+        with db_cursor(get_db()) as cursor:
+            cursor.execute('SELECT COUNT(*) FROM users WHERE id = 3')
+            assert cursor.fetchone()[0] == 0
+            cursor.execute('SELECT COUNT(*) FROM unread_counters WHERE user_id = 3')
+            assert cursor.fetchone()[0] == 0